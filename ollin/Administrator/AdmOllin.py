@@ -95,21 +95,22 @@ class AdmOllin:
     def LoadConst(self,case=None):
         """
         Load information from data base
-        for the Model (case)
+        for the Model (case). Raise KeyError
+        if a compound is not in the data base
         """
         
         if case == None:
-            for case in self.TheCase.keys():
-                if self.TheCase[case].Load !=1: 
-                    comp = self.TheCase[case].library
-                    for Var in self.TheCase[case].PublicVars:
-                        self.TheCase[case].Const[Var] = array( self.cur.Dates( Var, comp)[0] )   
-                    self.TheCase[case].Load = 1
+            cases = self.TheCase.keys()
         else:
-            if self.TheCase[case].Load !=1: 
+            cases = [case,]
+
+        for case in cases:
+            if self.TheCase[case].Load !=1:
                 comp = self.TheCase[case].library
-                for Var in self.TheCase[case].PublicVars:
-                    self.TheCase[case].Const[Var] = array( self.cur.Dates( Var, comp)[0] )
+                # one query for all the constants of the case
+                const = self.cur.Constants(self.TheCase[case].PublicVars, comp)
+                self.TheCase[case].Const.update(const)
+                self.TheCase[case].Const["KIJ"] = self.cur.Kij(comp)
                 self.TheCase[case].Load = 1
     
     def Connect(self,Model,Case):
@@ -123,6 +123,7 @@ class Model:
         
         A_i = ( a_i * P)/ pow( R * T,2)
         B_i = ( b_i * P )/( R * T)    
+        Kij = model.get("KIJ", 0) # binary interaction parameters
         case.Prop["A"] = A_i
         case.Prop["B"] = B_i
         
@@ -155,14 +156,14 @@ class Model:
         while k_i <=10:
             
             FrVap, xf, yf =  Flash(ki,xm)
-            A_vi = MixingRules.MolarK2( yf, A_i, k=0 )
-            A_li = MixingRules.MolarK2( xf, A_i,k=0)
+            A_vi = MixingRules.MolarK2( yf, A_i, k=Kij )
+            A_li = MixingRules.MolarK2( xf, A_i,k=Kij)
             
             B_v = MixingRules.Molar( yf, B_i)
-            A_v = MixingRules.MolarK( yf,A_i ,k=0 )
+            A_v = MixingRules.MolarK( yf,A_i ,k=Kij )
             
             B_l = MixingRules.Molar( xf, B_i)
-            A_l = MixingRules.MolarK( xf,A_i,k=0) 
+            A_l = MixingRules.MolarK( xf,A_i,k=Kij) 
             
             Z_v = self.EOS.ZG(A_v,B_v)
             Z_l = self.EOS.ZL(A_l,B_l)
@@ -262,6 +263,7 @@ class Model:
         T = case.Prop["T"]
         P = case.Prop["P"]
         A_i = case.Prop["A"] 
+        Kij = model.get("KIJ", 0) # binary interaction parameters
         B_i =case.Prop["B"]
         Fr_i = case.Prop["Fr_i"]
         Fu_i=case.Prop["Fu_i"]
@@ -286,14 +288,14 @@ class Model:
         while k_i <=1:
         
             FrVap, xf, yf =  Flash(ki,xm)
-            A_vi = MixingRules.MolarK2( yf, A_i, k=0 )
-            A_li = MixingRules.MolarK2( xf, A_i,k=0)
+            A_vi = MixingRules.MolarK2( yf, A_i, k=Kij )
+            A_li = MixingRules.MolarK2( xf, A_i,k=Kij)
             
             B_v = MixingRules.Molar( yf, B_i)
-            A_v = MixingRules.MolarK( yf,A_i ,k=0 )
+            A_v = MixingRules.MolarK( yf,A_i ,k=Kij )
             
             B_l = MixingRules.Molar( xf, B_i)
-            A_l = MixingRules.MolarK( xf,A_i,k=0) 
+            A_l = MixingRules.MolarK( xf,A_i,k=Kij) 
             
             Z_v = self.EOS.ZG(A_v,B_v)
             Z_l = self.EOS.ZL(A_l,B_l)
@@ -318,14 +320,14 @@ class Model:
                 
                 xf=case.Prop["xmin"] 
                 yf=case.Prop["ymin"] 
-                A_vi = MixingRules.MolarK2( yf, A_i, k=0 )
-                A_li = MixingRules.MolarK2( xf, A_i,k=0)
+                A_vi = MixingRules.MolarK2( yf, A_i, k=Kij )
+                A_li = MixingRules.MolarK2( xf, A_i,k=Kij)
                 
                 B_v = MixingRules.Molar( yf, B_i)
-                A_v = MixingRules.MolarK( yf,A_i ,k=0 )
+                A_v = MixingRules.MolarK( yf,A_i ,k=Kij )
                 
                 B_l = MixingRules.Molar( xf, B_i)
-                A_l = MixingRules.MolarK( xf,A_i,k=0) 
+                A_l = MixingRules.MolarK( xf,A_i,k=Kij) 
                 
                 Z_v = self.EOS.ZG(A_v,B_v)
                 Z_l = self.EOS.ZL(A_l,B_l)
@@ -110,6 +110,7 @@ class Model:
         
         A_i = ( a_i * P)/ pow( R * T,2)
         B_i = ( b_i * P )/( R * T)    
+        Kij = model.get("KIJ", 0) # binary interaction parameters
         case.Prop["A"] = A_i
         case.Prop["B"] = B_i
         
@@ -134,14 +135,14 @@ class Model:
         #Iteration to calculate the Fractio Vapor
         while k_i <=20:
 ##            print k_i 
-            A_vi = MixingRules.MolarK2( yf, A_i, k=0 )
-            A_li = MixingRules.MolarK2( xf, A_i,k=0)
+            A_vi = MixingRules.MolarK2( yf, A_i, k=Kij )
+            A_li = MixingRules.MolarK2( xf, A_i,k=Kij)
             
             B_v = MixingRules.Molar( yf, B_i)
-            A_v = MixingRules.MolarK( yf,A_i ,k=0 )
+            A_v = MixingRules.MolarK( yf,A_i ,k=Kij )
             
             B_l = MixingRules.Molar( xf, B_i)
-            A_l = MixingRules.MolarK( xf,A_i,k=0) 
+            A_l = MixingRules.MolarK( xf,A_i,k=Kij) 
             
             Z_v = self.EOS.ZG(A_v,B_v)
             Z_l = self.EOS.ZL(A_l,B_l)
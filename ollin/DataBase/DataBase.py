@@ -1,15 +1,26 @@
 ##import sys
 ##sys.path.append("/Users/jonathanxavier/Developer/sim42")
-from pysqlite2 import dbapi2 as sq
+try:
+    from pysqlite2 import dbapi2 as sq
+except ImportError:
+    # same DB-API, part of the standard library since python 2.5
+    import sqlite3 as sq
 from ollin.DataBase.SysData import DataBaseVars
-from numpy.oldnumeric import array
+from numpy.oldnumeric import array, zeros, Float
+
+# rows already read, per data base file and compound name
+RowCache = {}
+
+# sqlite default limit of host parameters in a statement
+MAX_SQL_VARS = 999
 
 class DataBase:
     """
     Fuction to acces to current data base"
     """
-    def __init__(self):
+    def __init__(self, verbose=1):
         """load dates"""
+        self.verbose = verbose
         self.SupportVars = DataBaseVars()
         self.CurrentPath = self.SupportVars["BasePath"]
         self.CurrentDataBase = self.SupportVars["DataBase"]
@@ -17,10 +28,12 @@ class DataBase:
 
     def LoadDataBase(self,Path,Name):
         SELECT = Path + Name
-        print "\nLoading Data Base %s"%(Name)
+        if self.verbose:
+            print "\nLoading Data Base %s"%(Name)
         con = sq.connect(SELECT)
         cur = con.cursor()
-        print "\.........."
+        if self.verbose:
+            print "\.........."
         del SELECT
         return cur
 
@@ -37,7 +50,8 @@ class DataBase:
 
     def Dates(self,items,key):
         """
-        Return a list of list items
+        Return a list of list items. Compounds that are not in the
+        data base are left out
         """
         if type(items) == (str):
             items = list((items,))
@@ -47,45 +61,97 @@ class DataBase:
             key   = list((key,))
         else:
             key   = list(key)
-        
+
+        rows = self.Rows(key)
+        found = [x_key for x_key in key if rows.has_key(x_key)]
+
         result = []
-        
         for x_items in items:
-            
-            #print x_items
-            temp= []
-            SELECT  = "SELECT " + self.SupportVars[x_items] + " FROM " + self.SupportVars["TableComp"]+" " + "WHERE" + " "+self.SupportVars["Name"]+"=:item;"
+            col = self.SupportVars[x_items]
+            temp = [rows[x_key][col] for x_key in found]
+            if temp !=[]:
+                result.append(temp)
 
-            for x_key in key:
-        
-                self.Cursor.execute(SELECT,{"item":x_key})
-                #print x_key
-                #print SELECT
-                temporal = self.Cursor.fetchone()
-                #print temporal
-
-                if temporal ==None:
-                    
-                    print "Any date in data base"
-                    print "Can be anyone of this"
-                    if self.find(x_key) == 0:
-                        print "Dont have reference of %s"%x_key
-                    key.remove(x_key)
-                    
-                else:
-                    
-                    temp.append(temporal[0])
-                    
-            if temp ==[]:
-                
-                print "Any date to  add"
-
-            else:
+        return result
 
-                result.append(temp)
-            
+    def Rows(self,key):
+        """
+        Return a dict name -> row (dict column -> value) for the
+        compounds in key. Rows come from the in-process cache; the
+        ones not cached yet are read with a single IN (...) query
+        """
+        cache = RowCache.setdefault(self.CurrentPath + self.CurrentDataBase, {})
+        missing = []
+        for x_key in key:
+            if not cache.has_key(x_key) and not x_key in missing:
+                missing.append(x_key)
+
+        name = self.SupportVars["Name"]
+        for i in range(0, len(missing), MAX_SQL_VARS):
+            chunk = missing[i:i + MAX_SQL_VARS]
+            SELECT = "SELECT * FROM %s WHERE %s IN (%s);"%(self.SupportVars["TableComp"], name,
+                                                          ",".join(["?"]*len(chunk)))
+            self.Cursor.execute(SELECT, chunk)
+            cols = [d[0] for d in self.Cursor.description]
+            for x in self.Cursor.fetchall():
+                row = dict(zip(cols, x))
+                cache[row[name]] = row
+
+        rows = {}
+        for x_key in key:
+            if cache.has_key(x_key):
+                rows[x_key] = cache[x_key]
+        return rows
+
+    def Constants(self,items,key):
+        """
+        Return a dict item -> array with the values of every compound
+        in key, in the same order. Raise KeyError with the names of the
+        compounds that are not in the data base
+        """
+        if type(items) == (str):
+            items = [items,]
+        if type(key) == (str):
+            key = [key,]
+
+        rows = self.Rows(key)
+        missing = [x_key for x_key in key if not rows.has_key(x_key)]
+        if missing:
+            raise KeyError("Dont have reference of %s"%", ".join(missing))
+
+        result = {}
+        for x_items in items:
+            col = self.SupportVars[x_items]
+            result[x_items] = array([rows[x_key][col] for x_key in key])
         return result
 
+    def Kij(self,key):
+        """
+        Return the matrix of binary interaction parameters of the
+        compounds in key. Pairs that are not in the data base are 0
+        """
+        n = len(key)
+        kij = zeros((n, n), Float)
+        table = self.SupportVars["TableKij"]
+        self.Cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?;", (table,))
+        if self.Cursor.fetchone() == None:
+            return kij
+
+        pos = {}
+        for i in range(n):
+            pos[key[i]] = i
+        marks = ",".join(["?"]*n)
+        SELECT = "SELECT NAME1, NAME2, KIJ FROM %s WHERE NAME1 IN (%s) AND NAME2 IN (%s);"%(table, marks, marks)
+        self.Cursor.execute(SELECT, list(key) + list(key))
+        for x in self.Cursor.fetchall():
+            i, j = pos[x[0]], pos[x[1]]
+            kij[i, j] = kij[j, i] = x[2]
+        return kij
+
+    def ClearCache(self):
+        """Forget the cached rows of the current data base"""
+        RowCache.pop(self.CurrentPath + self.CurrentDataBase, None)
+
     def find(self,key):
         
         SysDic = self.SupportVars
@@ -1,4 +1,5 @@
 #database system files
+import os
 
 def DataBaseVars():
     """
@@ -7,11 +8,13 @@ def DataBaseVars():
     SysDic = {}
 
     #database file path
-    SysDic["BasePath"] = "/Users/jonathanxavier/Developer/sim42/ollin/DataBase/"
+    SysDic["BasePath"] = os.path.dirname(os.path.abspath(__file__)) + os.sep
     #Name of file database
     SysDic["DataBase"] = "data.db"
     #Name of table componets
     SysDic["TableComp"] = "compo"
+    #Name of table of binary interaction parameters (NAME1, NAME2, KIJ)
+    SysDic["TableKij"] = "kij"
     # Column Id key in database
     SysDic["IdKey"]= "NUMERO"
     #Column of componets name
@@ -0,0 +1,268 @@
+"""
+Array first cubic equations of state
+
+Every function works on m rows at the same time: T and P are arrays of
+length m and x is a (m, n) matrix with one composition per row, so the
+stages of a column or the segments of a pipe are evaluated with one call.
+The cubic is written as in ollin.EOS.eos, V^2 + u*b*V + w*b^2
+
+Compound constants come in a dict of arrays with the keys of
+ollin.DataBase.SysData (TC, PC, OMEGA, CP_A..CP_D, DELHF, ...)
+"""
+import numpy
+from numpy import asarray, sqrt, log, exp, cos, arccos, where, clip
+from numpy import absolute, maximum, minimum, sign, pi, newaxis
+from ollin.Thermodinamics.Constans import R, P_std
+from ollin.Tools import MixingRules
+
+# reference temperature of the ideal gas enthalpy (formation basis)
+T_REF = 298.15
+
+# phase selectors for the root of the cubic
+VAPOUR_ROOT = 1
+LIQUID_ROOT = -1
+STABLE_ROOT = 0
+
+class Cubic:
+    """
+    Generic two parameter cubic equation of state
+    """
+    def __init__(self, name, u, w, omegaA, omegaB):
+        self.name = name
+        self.u = u
+        self.w = w
+        self.omegaA = omegaA
+        self.omegaB = omegaB
+        # roots of V^2 + u*V + w, the d1 and d2 of the departure functions
+        delta = sqrt(u*u - 4.0*w)
+        self.d1 = (u + delta)/2.0
+        self.d2 = (u - delta)/2.0
+
+    def M(self, omega):
+        """slope of the alpha function"""
+        return 0.480 + 1.574*omega - 0.176*omega**2
+
+    def SqrtAlpha(self, T, Tc, omega):
+        """
+        sqrt(alpha) and its first and second derivatives with T
+        T is a column (m, 1), Tc and omega rows (n,)
+        """
+        m = self.M(omega)
+        rt = sqrt(T/Tc)
+        sa = 1.0 + m*(1.0 - rt)
+        dsa = -m*rt/(2.0*T)
+        d2sa = m*rt/(4.0*T*T)
+        return sa, dsa, d2sa
+
+    def Params(self, T, c):
+        """
+        sqrt(a) of every compound at the m temperatures, with its T
+        derivatives (matrices (m, n)), and b (n,)
+        """
+        Tc, Pc = c["TC"], c["PC"]
+        T = asarray(T, 'd')[:, newaxis]
+        sac = sqrt(self.omegaA)*R*Tc/sqrt(Pc)
+        sa, dsa, d2sa = self.SqrtAlpha(T, Tc, c["OMEGA"])
+        b = self.omegaB*R*Tc/Pc
+        return sac*sa, sac*dsa, sac*d2sa, b
+
+    def Mix(self, T, P, x, c, kij):
+        """
+        Quadratic mixing rule, row by row
+        Return a dict with a, da/dT, d2a/dT2, b, A, B and the pieces
+        that the fugacity coefficients need
+        """
+        T = asarray(T, 'd')
+        P = asarray(P, 'd')
+        x = asarray(x, 'd')
+        sqa, dsqa, d2sqa, b = self.Params(T, c)
+        # sqrt(ai) changes with the T of every row, so it goes with the
+        # fractions and the matrix of MixingRules is only (1-kij)
+        ones = numpy.ones(sqa.shape[-1], 'd')
+        s = x*sqa
+        ds = x*dsqa
+        Ks = MixingRules.MolarK2(s, ones, kij)
+        Kds = MixingRules.MolarK2(ds, ones, kij)
+        a = MixingRules.Molar(s, Ks)
+        da = 2.0*MixingRules.Molar(ds, Ks)
+        d2a = 2.0*(MixingRules.Molar(x*d2sqa, Ks) + MixingRules.Molar(ds, Kds))
+        bm = MixingRules.Molar(x, b)
+        RT = R*T
+        mix = {}
+        mix["a"], mix["da"], mix["d2a"], mix["b"] = a, da, d2a, bm
+        mix["A"] = a*P/(RT*RT)
+        mix["B"] = bm*P/RT
+        # sum_j xj*aij for every i
+        mix["xa"] = sqa*Ks
+        mix["bi"] = b
+        return mix
+
+    def Roots(self, A, B):
+        """
+        Smallest and largest real roots of the cubic in Z, row by row.
+        Rows with a single real root return it twice
+        """
+        d1, d2 = self.d1, self.d2
+        c2 = (d1 + d2 - 1.0)*B - 1.0
+        c1 = A + d1*d2*B*B - (d1 + d2)*B*(B + 1.0)
+        c0 = -(A*B + d1*d2*B*B*(B + 1.0))
+
+        p = c1 - c2*c2/3.0
+        q = 2.0*c2**3/27.0 - c2*c1/3.0 + c0
+        disc = q*q/4.0 + p**3/27.0
+
+        # one real root
+        sd = sqrt(maximum(disc, 0.0))
+        u = -q/2.0 + sd
+        v = -q/2.0 - sd
+        t1 = sign(u)*absolute(u)**(1.0/3.0) + sign(v)*absolute(v)**(1.0/3.0)
+
+        # three real roots
+        r = sqrt(maximum(-p/3.0, 0.0))
+        arg = clip(-q/(2.0*where(r > 0.0, r, 1.0)**3), -1.0, 1.0)
+        phi = arccos(arg)
+        tMax = 2.0*r*cos(phi/3.0)
+        tMin = 2.0*r*cos((phi + 2.0*pi)/3.0)
+        tMid = 2.0*r*cos((phi + 4.0*pi)/3.0)
+        tMin = minimum(tMin, tMid)
+
+        three = disc < 0.0
+        zV = where(three, tMax, t1) - c2/3.0
+        zL = where(three, tMin, t1) - c2/3.0
+        # the liquid root must be above B
+        zL = where(zL > B, zL, zV)
+
+        # polish with a couple of Newton steps
+        for z in (zL, zV):
+            for i in range(2):
+                f = ((z + c2)*z + c1)*z + c0
+                df = (3.0*z + 2.0*c2)*z + c1
+                z -= where(absolute(df) > 1e-300, f/where(df == 0.0, 1.0, df), 0.0)
+        return zL, zV
+
+    def LogTerm(self, Z, B):
+        """ln((Z + d1*B)/(Z + d2*B))/(d1 - d2), the integral of the attractive term"""
+        return log((Z + self.d1*B)/(Z + self.d2*B))/(self.d1 - self.d2)
+
+    def GibbsRes(self, Z, A, B):
+        """Residual gibbs energy over RT"""
+        return Z - 1.0 - log(Z - B) - A/B*self.LogTerm(Z, B)
+
+    def Z(self, mix, phase):
+        """
+        Z factor of every row; phase is VAPOUR_ROOT, LIQUID_ROOT or
+        STABLE_ROOT (the root with the lowest gibbs energy), scalar or array
+        """
+        A, B = mix["A"], mix["B"]
+        zL, zV = self.Roots(A, B)
+        phase = asarray(phase)
+        zS = where(self.GibbsRes(zL, A, B) < self.GibbsRes(zV, A, B), zL, zV)
+        return where(phase > 0, zV, where(phase < 0, zL, zS))
+
+    def LnPhi(self, Z, mix):
+        """ln of the fugacity coefficients, a (m, n) matrix"""
+        A, B, b = mix["A"], mix["B"], mix["b"]
+        bb = mix["bi"]/b[:, newaxis]
+        L = self.LogTerm(Z, B)
+        return bb*(Z - 1.0)[:, newaxis] - log(Z - B)[:, newaxis] - \
+               (A/B*L)[:, newaxis]*(2.0*mix["xa"]/mix["a"][:, newaxis] - bb)
+
+    def Residual(self, T, P, Z, mix):
+        """
+        Residual (departure) properties of every row
+        Return a dict with Hres, Sres, Cvres, Cpres, dPdV, dPdT and V
+        """
+        a, da, d2a, b, B = mix["a"], mix["da"], mix["d2a"], mix["b"], mix["B"]
+        d1, d2 = self.d1, self.d2
+        V = Z*R*T/P
+        L = self.LogTerm(Z, B)/b
+        res = {}
+        res["V"] = V
+        res["Hres"] = R*T*(Z - 1.0) + (T*da - a)*L
+        res["Sres"] = R*log(Z - B) + da*L
+        res["Cvres"] = T*d2a*L
+        VpB = (V + d1*b)*(V + d2*b)
+        res["dPdT"] = R/(V - b) - da/VpB
+        res["dPdV"] = -R*T/(V - b)**2 + a*(2.0*V + (d1 + d2)*b)/(VpB*VpB)
+        res["Cpres"] = res["Cvres"] - T*res["dPdT"]**2/res["dPdV"] - R
+        return res
+
+    def Properties(self, T, P, x, c, kij, phase=STABLE_ROOT):
+        """
+        Everything the simulator asks for a phase, for m rows
+        Return a dict of arrays (see Residual and Ideal) plus Z, lnPhi
+        """
+        T = asarray(T, 'd')
+        P = asarray(P, 'd')
+        x = asarray(x, 'd')
+        mix = self.Mix(T, P, x, c, kij)
+        Z = self.Z(mix, phase)
+        props = self.Residual(T, P, Z, mix)
+        props.update(Ideal(T, P, x, c))
+        props["Z"] = Z
+        props["lnPhi"] = self.LnPhi(Z, mix)
+        props["H"] = props["Hig"] + props["Hres"]
+        props["S"] = props["Sig"] + props["Sres"]
+        props["Cp"] = props["Cpig"] + props["Cpres"]
+        props["Cv"] = props["Cpig"] - R + props["Cvres"]
+        return props
+
+    def LnPhiOnly(self, T, P, x, c, kij, phase):
+        """ln of the fugacity coefficients and Z, the inner loop of the flash"""
+        mix = self.Mix(T, P, x, c, kij)
+        Z = self.Z(mix, phase)
+        return self.LnPhi(Z, mix), Z
+
+
+class PengRobinson(Cubic):
+    def __init__(self):
+        Cubic.__init__(self, "PengRobinson", 2.0, -1.0, 0.45724, 0.07780)
+
+    def M(self, omega):
+        return where(omega <= 0.49, 0.37464 + 1.54226*omega - 0.26992*omega**2,
+                     0.379642 + 1.48503*omega - 0.164423*omega**2 + 0.016666*omega**3)
+
+
+class SoaveRK(Cubic):
+    def __init__(self):
+        Cubic.__init__(self, "SoaveRK", 1.0, 0.0, 0.42748, 0.08664)
+
+
+class RedlichKwong(Cubic):
+    def __init__(self):
+        Cubic.__init__(self, "RedlichKwong", 1.0, 0.0, 0.42748, 0.08664)
+
+    def SqrtAlpha(self, T, Tc, omega):
+        """alpha = Tr^-0.5"""
+        sa = (T/Tc)**-0.25
+        return sa, -0.25*sa/T, 0.3125*sa/(T*T)
+
+
+def Ideal(T, P, x, c):
+    """
+    Ideal gas H (formation basis at T_REF), S (P_std basis) and Cp of
+    every row; T and P arrays (m,), x matrix (m, n)
+    """
+    T = asarray(T, 'd')[:, newaxis]
+    P = asarray(P, 'd')
+    x = asarray(x, 'd')
+    A, B, C, D = c["CP_A"], c["CP_B"], c["CP_C"], c["CP_D"]
+    T0 = T_REF
+    cp = A + B*T + C*T**2 + D*T**3
+    h = c["DELHF"] + A*(T - T0) + B/2.0*(T**2 - T0**2) + C/3.0*(T**3 - T0**3) + D/4.0*(T**4 - T0**4)
+    s = A*log(T/T0) + B*(T - T0) + C/2.0*(T**2 - T0**2) + D/3.0*(T**3 - T0**3)
+    xlx = where(x > 0.0, x*log(where(x > 0.0, x, 1.0)), 0.0).sum(axis=-1)
+    ig = {}
+    ig["Cpig"] = (x*cp).sum(axis=-1)
+    ig["Hig"] = (x*h).sum(axis=-1)
+    ig["Sig"] = (x*s).sum(axis=-1) - R*log(P/P_std) - R*xlx
+    return ig
+
+def Wilson(T, P, c):
+    """Wilson K values, a (m, n) matrix"""
+    T = asarray(T, 'd')[:, newaxis]
+    P = asarray(P, 'd')[:, newaxis]
+    return c["PC"]/P*exp(5.373*(1.0 + c["OMEGA"])*(1.0 - c["TC"]/T))
+
+# models by name
+Models = {"PengRobinson": PengRobinson, "SoaveRK": SoaveRK, "RedlichKwong": RedlichKwong}
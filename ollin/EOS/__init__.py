@@ -1 +1 @@
-__all__=["eos","zfi"]
+__all__=["eos","zfi","Cubic"]
@@ -0,0 +1,290 @@
+"""
+Array first vapour liquid flash
+
+All the flashes solve m rows at the same time (T, P, H, ... arrays of
+length m and a (m, n) matrix of compositions), with successive
+substitution on the K values for the phase split and a bracketing
+secant (Illinois) on T or ln(P) when T or P are unknown.
+"""
+import numpy
+from numpy import asarray, array, exp, log, where, absolute, maximum, minimum
+from numpy import clip, ones, zeros, newaxis, dot, sign
+from ollin.EOS.Cubic import Wilson, VAPOUR_ROOT, LIQUID_ROOT, STABLE_ROOT
+from ollin.Thermodinamics.Constans import R
+
+# properties that are mole averages of the phases
+BULK_KEYS = ("H", "S", "V", "Cp", "Cv", "Hig", "Sig", "Cpig", "Hres", "Sres", "Cpres", "Cvres")
+
+# limits of the unknowns
+T_MIN, T_MAX = 20.0, 3000.0
+P_MIN, P_MAX = 1.0e-4, 1.0e5
+
+def RachfordRice(z, K, tol=1e-12, maxIter=60):
+    """
+    Vapour fraction of every row, limited to [0, 1]
+    (0 when sum(z*K) <= 1, 1 when sum(z/K) <= 1)
+    """
+    z = asarray(z, 'd')
+    Km1 = asarray(K, 'd') - 1.0
+    f0 = (z*Km1).sum(axis=-1)
+    f1 = (z*Km1/(Km1 + 1.0)).sum(axis=-1)
+    lo = zeros(f0.shape, 'd')
+    hi = ones(f0.shape, 'd')
+    beta = 0.5*ones(f0.shape, 'd')
+    active = (f0 > 0.0) & (f1 < 0.0)
+    for i in range(maxIter):
+        if not active.any():
+            break
+        den = 1.0 + beta[:, newaxis]*Km1
+        f = (z*Km1/den).sum(axis=-1)
+        df = -(z*Km1*Km1/(den*den)).sum(axis=-1)
+        active = active & (absolute(f) > tol)
+        lo = where(f > 0.0, beta, lo)
+        hi = where(f > 0.0, hi, beta)
+        new = beta - f/where(df == 0.0, -1.0, df)
+        new = where((new > lo) & (new < hi), new, (lo + hi)/2.0)
+        beta = where(active, new, beta)
+        active = active & (hi - lo > tol)
+    beta = where(f0 <= 0.0, 0.0, beta)
+    beta = where(f1 >= 0.0, 1.0, beta)
+    return beta
+
+def Split(z, K, beta):
+    """Normalized liquid and vapour compositions for a vapour fraction"""
+    z = asarray(z, 'd')
+    x = z/(1.0 + beta[:, newaxis]*(K - 1.0))
+    y = K*x
+    x = x/x.sum(axis=-1)[:, newaxis]
+    y = y/y.sum(axis=-1)[:, newaxis]
+    return x, y
+
+def SolveRows(func, u0, step, uMin, uMax, increasing=1, tol=1e-9, maxIter=60):
+    """
+    Solve func(u) = 0 for every row with a bracketing secant (Illinois)
+    func takes the array of unknowns and returns the array of residuals.
+    Return (a, fa, b, fb): the last bracket, b is the solution. A bracket
+    that ends tiny with a residual left means a jump in func (pure
+    compounds), the caller can use a lever rule between a and b
+    """
+    a = clip(asarray(u0, 'd'), uMin, uMax)
+    fa = func(a)
+    s = increasing and 1.0 or -1.0
+    dirn = where(fa*s < 0.0, 1.0, -1.0)
+    h = step*ones(a.shape, 'd')
+    b = clip(a + dirn*h, uMin, uMax)
+    fb = func(b)
+
+    # look for a change of sign
+    for i in range(40):
+        need = (fa*fb > 0.0) & (b > uMin) & (b < uMax)
+        if not need.any():
+            break
+        a = where(need, b, a)
+        fa = where(need, fb, fa)
+        h = where(need, 2.0*h, h)
+        b = where(need, clip(b + dirn*h, uMin, uMax), b)
+        fb = func(b)
+
+    bracket = fa*fb <= 0.0
+    for i in range(maxIter):
+        done = (fb == 0.0) | (absolute(b - a) <= tol*(1.0 + absolute(b)))
+        if done.all():
+            break
+        den = fb - fa
+        c = b - fb*(b - a)/where(den == 0.0, 1.0, den)
+        # stay inside the bracket, bisect otherwise
+        inside = (c - minimum(a, b))*(maximum(a, b) - c) > 0.0
+        c = where(bracket, where(inside, c, (a + b)/2.0), c)
+        c = where(done, b, clip(c, uMin, uMax))
+        fc = func(c)
+        swap = fc*fb < 0.0
+        a = where(done, a, where(swap, b, a))
+        fa = where(done, fa, where(swap, fb, fa/2.0))
+        b, fb = c, where(done, fb, fc)
+        bracket = fa*fb <= 0.0
+    return a, fa, b, fb
+
+
+class ArrayFlash:
+    """
+    Vapour liquid flashes of a cubic equation of state, m rows at a time
+    eos -- ollin.EOS.Cubic instance
+    c -- dict of compound constants
+    kij -- matrix of binary interaction parameters
+    """
+    def __init__(self, eos, c, kij, tol=1e-10, maxIter=100):
+        self.eos = eos
+        self.c = c
+        self.kij = kij
+        self.tol = tol
+        self.maxIter = maxIter
+        self.TLimits = (T_MIN, T_MAX)
+        self.PLimits = (P_MIN, P_MAX)
+
+    def Phases(self, T, P, z, K=None):
+        """
+        Successive substitution on the K values at fixed T and P
+        Return (beta, x, y, K)
+        """
+        eos, c, kij = self.eos, self.c, self.kij
+        T = asarray(T, 'd')
+        P = asarray(P, 'd')
+        z = asarray(z, 'd')
+        if K is None:
+            K = Wilson(T, P, c)
+        lnK = log(K)
+        for i in range(self.maxIter):
+            beta = RachfordRice(z, K)
+            x, y = Split(z, K, beta)
+            lnPhiL, zL = eos.LnPhiOnly(T, P, x, c, kij, LIQUID_ROOT)
+            lnPhiV, zV = eos.LnPhiOnly(T, P, y, c, kij, VAPOUR_ROOT)
+            new = lnPhiL - lnPhiV
+            err = absolute(new - lnK).max(axis=-1)
+            lnK = new
+            K = exp(lnK)
+            if err.max() < self.tol:
+                break
+
+        beta = RachfordRice(z, K)
+        # trivial solution, a single phase that is vapour above the
+        # pseudo critical temperature
+        trivial = absolute(lnK).max(axis=-1) < 1e-4
+        Tpc = dot(z, c["TC"])
+        beta = where(trivial, where(T > Tpc, 1.0, 0.0), beta)
+        x, y = Split(z, K, beta)
+        x = where((beta >= 1.0)[:, newaxis] & trivial[:, newaxis], z, x)
+        y = where((beta <= 0.0)[:, newaxis] & trivial[:, newaxis], z, y)
+        return beta, x, y, K
+
+    def PT(self, T, P, z, K=None):
+        """Flash at T and P, return a dict (see Results)"""
+        T = asarray(T, 'd')
+        P = asarray(P, 'd')
+        beta, x, y, K = self.Phases(T, P, z, K)
+        return self.Results(T, P, z, beta, x, y, K)
+
+    def Results(self, T, P, z, beta, x, y, K):
+        """
+        dict with T, P, VapFrac, x, y, K, the properties of the phases
+        ("vap", "liq") and the bulk ones ("bulk")
+        """
+        eos, c, kij = self.eos, self.c, self.kij
+        vap = eos.Properties(T, P, y, c, kij, VAPOUR_ROOT)
+        liq = eos.Properties(T, P, x, c, kij, LIQUID_ROOT)
+        bulk = {}
+        for key in BULK_KEYS:
+            bulk[key] = beta*vap[key] + (1.0 - beta)*liq[key]
+        bulk["Z"] = P*bulk["V"]/(R*T)
+        res = {"T": T, "P": P, "VapFrac": beta, "z": asarray(z, 'd'), "x": x, "y": y, "K": K,
+               "vap": vap, "liq": liq, "bulk": bulk}
+        return res
+
+    def Lever(self, res, resA, w):
+        """Mix the results at both sides of a jump with the weights w"""
+        w = clip(w, 0.0, 1.0)
+        beta = (1.0 - w)*resA["VapFrac"] + w*res["VapFrac"]
+        bulk = res["bulk"]
+        for key in BULK_KEYS:
+            bulk[key] = (1.0 - w)*resA["bulk"][key] + w*bulk[key]
+        bulk["Z"] = res["P"]*bulk["V"]/(R*res["T"])
+        res["VapFrac"] = beta
+        return res
+
+    def _Energy(self, P, z, spec, key, T0=None):
+        """Flash at P with a bulk H or S, T is the unknown"""
+        P = asarray(P, 'd')
+        spec = asarray(spec, 'd')
+        state = {"K": None}
+        def func(T):
+            res = self.PT(T, P, z, state["K"])
+            state["K"] = res["K"]
+            return res["bulk"][key] - spec
+        if T0 is None:
+            T0 = 300.0*ones(P.shape, 'd')
+        a, fa, b, fb = SolveRows(func, T0, 20.0, self.TLimits[0], self.TLimits[1], 1)
+        res = self.PT(b, P, z, state["K"])
+        resA = self.PT(a, P, z, state["K"])
+        jump = absolute(fb) > 1e-6*(1.0 + absolute(spec))
+        den = res["bulk"][key] - resA["bulk"][key]
+        w = where(jump, (spec - resA["bulk"][key])/where(den == 0.0, 1.0, den), 1.0)
+        return self.Lever(res, resA, w)
+
+    def PH(self, P, H, z, T0=None):
+        return self._Energy(P, z, H, "H", T0)
+
+    def PS(self, P, S, z, T0=None):
+        return self._Energy(P, z, S, "S", T0)
+
+    def TH(self, T, H, z, P0=None):
+        """Flash at T with a bulk H, P is the unknown"""
+        T = asarray(T, 'd')
+        H = asarray(H, 'd')
+        state = {"K": None}
+        def func(lnP):
+            res = self.PT(T, exp(lnP), z, state["K"])
+            state["K"] = res["K"]
+            return res["bulk"]["H"] - H
+        if P0 is None:
+            P0 = 101.325*ones(T.shape, 'd')
+        a, fa, b, fb = SolveRows(func, log(P0), 0.5, log(self.PLimits[0]), log(self.PLimits[1]), 0)
+        return self.PT(T, exp(b), z, state["K"])
+
+    def _Quality(self, fixed, beta, z, isT, u0):
+        """
+        Flash at fixed T (isT = 0, P unknown) or P (isT = 1, T unknown)
+        and a vapour fraction. The residual is sum(y) - sum(x) at the
+        given vapour fraction, with the K values of the last evaluation
+        """
+        eos, c, kij = self.eos, self.c, self.kij
+        fixed = asarray(fixed, 'd')
+        z = asarray(z, 'd')
+        beta = asarray(beta, 'd')*ones(fixed.shape, 'd')
+        state = {}
+        def TP(u):
+            if isT:
+                return u, fixed
+            return fixed, exp(u)
+        def wilson(u):
+            T, P = TP(u)
+            K = Wilson(T, P, c)
+            return (z*(K - 1.0)/(1.0 + beta[:, newaxis]*(K - 1.0))).sum(axis=-1)
+        def func(u):
+            T, P = TP(u)
+            K = state.get("K", None)
+            if K is None:
+                K = Wilson(T, P, c)
+            x, y = Split(z, K, beta)
+            lnPhiL, zL = eos.LnPhiOnly(T, P, x, c, kij, LIQUID_ROOT)
+            lnPhiV, zV = eos.LnPhiOnly(T, P, y, c, kij, VAPOUR_ROOT)
+            K = exp(lnPhiL - lnPhiV)
+            state["K"] = K
+            return (z*(K - 1.0)/(1.0 + beta[:, newaxis]*(K - 1.0))).sum(axis=-1)
+
+        if isT:
+            step, uMin, uMax, incr = 10.0, self.TLimits[0], self.TLimits[1], 1
+        else:
+            step, uMin, uMax, incr = 0.2, log(self.PLimits[0]), log(self.PLimits[1]), 0
+        if u0 is None:
+            if isT:
+                u0 = 300.0*ones(fixed.shape, 'd')
+            else:
+                u0 = log(101.325)*ones(fixed.shape, 'd')
+        # start from the ideal (Wilson) solution
+        a, fa, u, fu = SolveRows(wilson, u0, step, uMin, uMax, incr, 1e-6)
+        for i in range(3):
+            # the K values lag one evaluation, a few passes settle them
+            a, fa, u, fu = SolveRows(func, u, step/4.0, uMin, uMax, incr, self.tol)
+        T, P = TP(u)
+        K = state["K"]
+        x, y = Split(z, K, beta)
+        res = self.Results(T, P, z, beta, x, y, K)
+        res["Residual"] = fu
+        return res
+
+    def PV(self, P, beta, z, T0=None):
+        return self._Quality(P, beta, z, 1, T0)
+
+    def TV(self, T, beta, z, P0=None):
+        if P0 is not None:
+            P0 = log(P0)
+        return self._Quality(T, beta, z, 0, P0)
@@ -1 +1 @@
-__all__=["Flash"]
+__all__=["Flash","ArrayFlash"]
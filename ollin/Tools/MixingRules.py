@@ -1,34 +1,48 @@
 from numpy.oldnumeric import sqrt,array,power
+from numpy import asarray, multiply, dot
+
+# sqrt(ai*aj)*(1-kij) matrices already built, by the values of a and kij.
+# a only changes with T (and P for the reduced A), so the iterations of a
+# flash at fixed conditions reuse the same matrix
+_AijCache = {}
+MAX_AIJ_CACHE = 64
 
 def Molar(fraction, proper):
     """
     this fuction return sum(Xi*pi)
+    fraction can be a matrix with a composition per row
+    """
+    return (asarray(fraction)*proper).sum(axis=-1)
+
+def AijMatrix(a, k = 0):
     """
-    return sum(fraction*proper)
+    Return the matrix sqrt(ai*aj)*(1-kij)
+    k can be a scalar or the matrix of binary interaction parameters
+    """
+    a = asarray(a, 'd')
+    k = asarray(k, 'd')
+    key = (a.tostring(), k.shape, k.tostring())
+    Aij = _AijCache.get(key, None)
+    if Aij is None:
+        if len(_AijCache) >= MAX_AIJ_CACHE:
+            _AijCache.clear()
+        Aij = sqrt(multiply.outer(a, a))*(1-k)
+        _AijCache[key] = Aij
+    return Aij
 
 def MolarK(fraction, proper, k = 0):
     """
     This fuction return a
-    special property of mix
-    """
-    lo = len(proper)
-    temp = 0
-##    print fraction,proper
-    for i in range(lo):
-##            print i
-            temp += sum( ( 1-k )*sqrt( proper[i]*proper )*( fraction[i]*fraction) )
-    return temp
+    special property of mix, x*A*x
+    fraction can be a matrix with a composition per row
+    """
+    x = asarray(fraction)
+    return (dot(x, AijMatrix(proper, k))*x).sum(axis=-1)
 
 def MolarK2(x, a, k = 0):
     """
     This fuction return a
-    special property of mix
-    """
-    temp = []
-    for i in range( len(a) ):
-            Aij= sum(  x * sqrt(  a[i]*a )* (1-k)  )
-            temp.append(Aij)
-    
-    temp = array(temp) 
-    ##print "2k",fraction,proper,temp
-    return temp
+    special property of mix, sum(Aij*xj) for every i
+    x can be a matrix with a composition per row
+    """
+    return dot(asarray(x), AijMatrix(a, k))
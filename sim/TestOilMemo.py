@@ -0,0 +1,189 @@
+"""Checks of the oil memo of ThermoAdmin (CutAssay, BlendAssay, InstallOil)
+and of GetPseudoProperties
+
+The provider is a stand-in that records its calls, so no thermo package
+is needed. Run as python -m sim.TestOilMemo
+
+"""
+from sim.thermo import Oils
+from sim.thermo.ThermoAdmin import ThermoAdmin
+
+PROVIDER = 'Recorder'
+THCASE = 'myTh'
+
+
+class RecordingProvider(object):
+    """Oil methods of a provider that only keep a list of the calls"""
+    def __init__(self):
+        self.calls = []
+        self.cmps = ['METHANE']
+        self.pseudos = {}
+
+    def CutAssayData(self, thCase, oilName, assayName, data):
+        self.calls.append('cut ' + assayName)
+        return (0, '')
+
+    def BlendAssayData(self, thCase, oilName, blendName, assayNames):
+        self.calls.append('blend ' + blendName)
+        return (0, ''), {'Parameters': {}, 'Curves': {}, 'LightEnds': {}}
+
+    def PseudoList(self, thCase, assayObj):
+        return self.pseudos.get(assayObj.name, None)
+
+    def GetCompoundProperties(self, thCase, cmp, propNames):
+        self.calls.append('props ' + cmp)
+        return [len(propName) for propName in propNames]
+
+    def InstallOil(self, thCase, assayObj):
+        self.calls.append('install ' + assayObj.name)
+        names = ['%s_%d' % (assayObj.name, i) for i in range(3)]
+        self.pseudos[assayObj.name] = names
+        self.cmps.extend(names)
+        return (0, '')
+
+    def UpdateOil(self, thCase, assayObj):
+        self.calls.append('update ' + assayObj.name)
+        return (0, '')
+
+    def GetSelectedCompoundNames(self, thCase):
+        return list(self.cmps)
+
+    def DeleteCompound(self, thCase, cmp):
+        self.cmps.remove(cmp)
+
+    def DeleteOilObject(self, thCase, obj):
+        self.calls.append('delete ' + obj.name)
+
+    def SetAssayParameterValue(self, thCase, paramObj):
+        pass
+
+    def CustomCommand(self, thCase, cmd):
+        self.calls.append(cmd)
+        return (0, '')
+
+
+def SetUp():
+    """(thermoAdmin, provider, assays) with two assays of one oil"""
+    thAdmin = ThermoAdmin()
+    prov = thAdmin.thDict[PROVIDER] = RecordingProvider()
+    oil = Oils.Oil()
+    oil.name = 'Oil1'
+    assays = []
+    for name, x, y in (('A1', [0.0, 50.0, 100.0], [300.0, 450.0, 600.0]),
+                       ('A2', [0.0, 100.0], [350.0, 700.0])):
+        assay = Oils.Assay()
+        oil.AddObject(assay, name)
+        curve = Oils.OilExperiment(Oils.EXPERIMENT_DIST)
+        assay.AddObject(curve, Oils.EXPERIMENT_DIST)
+        curve.SetPoints(x, y)
+        assays.append(assay)
+    return thAdmin, prov, assays
+
+def Calls(prov):
+    """calls since the last time and forget them"""
+    calls = prov.calls
+    prov.calls = []
+    return calls
+
+def TestRepeatCut():
+    print 'Unchanged assays are cut and installed once'
+    thAdmin, prov, (a1, a2) = SetUp()
+    thAdmin.CutAssay(PROVIDER, THCASE, a1)
+    thAdmin.CutAssay(PROVIDER, THCASE, a1)
+    thAdmin.InstallOil(PROVIDER, THCASE, a1)
+    thAdmin.InstallOil(PROVIDER, THCASE, a1)
+    thAdmin.UpdateOil(PROVIDER, THCASE, a1)
+    calls = Calls(prov)
+    print calls
+    assert calls == ['cut A1', 'install A1']
+
+    blend = Oils.Blend('A1', 'A2')
+    blend.parentObj, blend.name, blend.assays = a1.parentObj, 'B1', [a1, a2]
+    thAdmin.CutAssay(PROVIDER, THCASE, a2)
+    thAdmin.BlendAssay(PROVIDER, THCASE, blend)
+    thAdmin.BlendAssay(PROVIDER, THCASE, blend)
+    calls = Calls(prov)
+    print calls
+    assert calls == ['cut A2', 'blend B1']
+
+def TestChangedCurve():
+    print 'A changed curve is cut and installed again'
+    thAdmin, prov, (a1, a2) = SetUp()
+    thAdmin.CutAssay(PROVIDER, THCASE, a1)
+    thAdmin.InstallOil(PROVIDER, THCASE, a1)
+    Calls(prov)
+    a1.distCurve.SetPoints([0.0, 50.0, 100.0], [300.0, 460.0, 600.0])
+    thAdmin.CutAssay(PROVIDER, THCASE, a1)
+    thAdmin.InstallOil(PROVIDER, THCASE, a1)
+    thAdmin.InstallOil(PROVIDER, THCASE, a1)
+    calls = Calls(prov)
+    print calls, prov.cmps
+    assert calls == ['cut A1', 'install A1']
+    assert prov.cmps == ['METHANE', 'A1_0', 'A1_1', 'A1_2']
+
+def TestInvalidation():
+    print 'Commands that change oils forget the memo'
+    thAdmin, prov, (a1, a2) = SetUp()
+    def CutBoth():
+        thAdmin.CutAssay(PROVIDER, THCASE, a1)
+        thAdmin.CutAssay(PROVIDER, THCASE, a2)
+    CutBoth()
+    Calls(prov)
+
+    #Queries keep it
+    thAdmin.CustomCommand(PROVIDER, THCASE, 'Oil.GetInputCurve.Oil1.A1')
+    CutBoth()
+    calls = Calls(prov)
+    print calls
+    assert calls == ['Oil.GetInputCurve.Oil1.A1']
+
+    thAdmin.CustomCommand(PROVIDER, THCASE, 'Oil.Cut.Oil1.A1')
+    CutBoth()
+    calls = Calls(prov)
+    print calls
+    assert calls == ['Oil.Cut.Oil1.A1', 'cut A1', 'cut A2']
+
+    thAdmin.DeleteOilObject(PROVIDER, THCASE, a2)
+    CutBoth()
+    calls = Calls(prov)
+    print calls
+    assert calls == ['delete A2', 'cut A1', 'cut A2']
+
+    #Only the assay of the parameter
+    param = Oils.OilParameter('Float', 0.9, a1, 'BULKDENSITY')
+    thAdmin.SetAssayParameterValue(PROVIDER, THCASE, param)
+    CutBoth()
+    calls = Calls(prov)
+    print calls
+    assert calls == ['cut A1']
+
+def TestPseudoProperties():
+    print 'Pseudo properties come from PseudoList when there is no table'
+    thAdmin, prov, (a1, a2) = SetUp()
+    assert thAdmin.GetPseudoProperties(PROVIDER, THCASE, a1, ['MolecularWeight']) == ([], [])
+    thAdmin.InstallOil(PROVIDER, THCASE, a1)
+    Calls(prov)
+    names, values = thAdmin.GetPseudoProperties(PROVIDER, THCASE, a1, ['MolecularWeight', 'Tc'])
+    calls = Calls(prov)
+    print names, values, calls
+    assert names == ['A1_0', 'A1_1', 'A1_2']
+    assert values == [[15, 2]] * 3
+    assert calls == ['props A1_0', 'props A1_1', 'props A1_2']
+
+    #A provider table is used as it comes
+    prov.GetPseudoPropertyTable = lambda thCase, oilName, assayName, propNames: (['%s.%s' % (oilName, assayName)], [propNames])
+    result = thAdmin.GetPseudoProperties(PROVIDER, THCASE, a1, ['Tc'])
+    print result
+    assert result == (['Oil1.A1'], [['Tc']])
+    assert Calls(prov) == []
+
+
+def RunTest():
+    TestRepeatCut()
+    TestChangedCurve()
+    TestInvalidation()
+    TestPseudoProperties()
+    print 'All oil memo checks passed'
+
+if __name__ == '__main__':
+    RunTest()
@@ -0,0 +1,129 @@
+"""Checks of the table surrogate behind ThermoAdmin.GetApproxProperties
+
+The grid is calculated with OllinThermo in the same layout as the full array
+of a PropertyTable and the interpolated values are compared against direct
+calls to the thermo. Run as python -m sim.TestSurrogate
+
+"""
+import numpy
+from numpy.oldnumeric import array, Float
+from sim.solver.Variables import *
+from sim.thermo.ThermoAdmin import ThermoAdmin
+from sim.unitop import Properties
+
+PROVIDER = 'OllinThermo'
+THCASE = 'myTh'
+CMPS = ['METHANE', 'ETHANE', 'PROPANE']
+FRACS = [0.8, 0.15, 0.05]
+ZPROPS = [Properties.MASSDEN_OPT, Properties.ENTHALPY_OPT]
+PROPLIST = [MASSDEN_VAR, H_VAR]
+TVALS = numpy.arange(280.0, 361.0, 10.0)
+PVALS = numpy.arange(1000.0, 3001.0, 250.0)
+
+
+class TableHolder(object):
+    """Stands in for the PropertyTable that registers the surrogate"""
+    def __init__(self, surrogate):
+        self.surrogate = surrogate
+
+    def GetSurrogate(self):
+        return self.surrogate
+
+
+def FullArray(func, nuZProps):
+    """T P Z0 ... Zn VapFrac Liq0Frac Liq1Frac as filled in by PropertyTable"""
+    rows = []
+    for t in TVALS:
+        for p in PVALS:
+            rows.append([t, p] + list(func(t, p)) + [1.0, 0.0, 0.0])
+    return array(rows, Float)
+
+def SetUp():
+    thAdmin = ThermoAdmin()
+    thAdmin.AddPkgFromName(PROVIDER, THCASE, 'Peng-Robinson')
+    for cmp in CMPS:
+        thAdmin.AddCompound(PROVIDER, THCASE, cmp)
+    return thAdmin
+
+def Exact(thAdmin, t, p, frac=FRACS):
+    return thAdmin.GetProperties(PROVIDER, THCASE, (T_VAR, t), (P_VAR, p), VAPOUR_PHASE, frac, PROPLIST)
+
+def MaxRelError(thAdmin, points, frac=FRACS):
+    err = 0.0
+    for t, p in points:
+        approx = thAdmin.GetApproxProperties(PROVIDER, THCASE, (T_VAR, t), (P_VAR, p),
+                                             VAPOUR_PHASE, frac, PROPLIST)
+        exact = Exact(thAdmin, t, p, frac)
+        for a, e in zip(approx, exact):
+            err = max(err, abs(a - e) / max(abs(e), 1.0))
+    return err
+
+def TestLinear():
+    print 'Both methods are exact on linear data, also next to the edges'
+    def Plane(t, p):
+        return (2.0 * t + 0.01 * p, -3.0 * t + p)
+    fullArray = FullArray(Plane, 2)
+    points = [(281.0, 1010.0), (355.0, 2990.0), (317.3, 1833.3), (360.0, 3000.0)]
+    for method in (Properties.BILINEAR_OPT, Properties.BICUBIC_OPT):
+        surrogate = Properties.TableSurrogate(fullArray, len(TVALS), len(PVALS), Properties.T_OPT,
+                                              Properties.P_OPT, ZPROPS, Properties.V_OPT, FRACS, method)
+        for t, p in points:
+            vals = surrogate.GetProperties((T_VAR, t), (P_VAR, p), VAPOUR_PHASE, FRACS, PROPLIST)
+            print method, t, p, vals
+            for a, e in zip(vals, Plane(t, p)):
+                assert abs(a - e) < 1.0e-8 * max(abs(e), 1.0)
+
+def TestAgainstThermo():
+    print 'Interpolated properties are close to the ones of the thermo'
+    thAdmin = SetUp()
+    fullArray = FullArray(lambda t, p: Exact(thAdmin, t, p), len(ZPROPS))
+    midPoints = [(t + 5.0, p + 125.0) for t in TVALS[:-1] for p in PVALS[:-1]]
+    errors = {}
+    for method in (Properties.BILINEAR_OPT, Properties.BICUBIC_OPT):
+        holder = TableHolder(Properties.TableSurrogate(fullArray, len(TVALS), len(PVALS),
+                                                       Properties.T_OPT, Properties.P_OPT, ZPROPS,
+                                                       Properties.V_OPT, FRACS, method))
+        thAdmin.RegisterSurrogate(PROVIDER, THCASE, holder)
+        errors[method] = MaxRelError(thAdmin, midPoints)
+        thAdmin.UnregisterSurrogate(PROVIDER, THCASE, holder)
+        print method, 'max relative error', errors[method]
+    assert errors[Properties.BILINEAR_OPT] < 1.0e-2
+    assert errors[Properties.BICUBIC_OPT] < 1.0e-3
+    assert errors[Properties.BICUBIC_OPT] < errors[Properties.BILINEAR_OPT]
+
+def TestFallBack():
+    print 'Anything outside of the grid goes to the thermo'
+    thAdmin = SetUp()
+    fullArray = FullArray(lambda t, p: Exact(thAdmin, t, p), len(ZPROPS))
+    surrogate = Properties.TableSurrogate(fullArray, len(TVALS), len(PVALS), Properties.T_OPT,
+                                          Properties.P_OPT, ZPROPS, Properties.V_OPT, FRACS)
+    holder = TableHolder(surrogate)
+    thAdmin.RegisterSurrogate(PROVIDER, THCASE, holder)
+
+    #Out of range, other composition, other phase and a property not in the grid
+    assert surrogate.GetProperties((T_VAR, 400.0), (P_VAR, 2000.0), VAPOUR_PHASE, FRACS, PROPLIST) == None
+    assert MaxRelError(thAdmin, [(400.0, 2000.0), (300.0, 500.0)]) == 0.0
+    otherFracs = [0.7, 0.2, 0.1]
+    assert surrogate.GetProperties((T_VAR, 300.0), (P_VAR, 2000.0), VAPOUR_PHASE, otherFracs, PROPLIST) == None
+    assert MaxRelError(thAdmin, [(300.0, 2000.0)], otherFracs) == 0.0
+    assert surrogate.GetProperties((T_VAR, 300.0), (P_VAR, 2000.0), LIQUID_PHASE, FRACS, PROPLIST) == None
+    assert surrogate.GetProperties((T_VAR, 300.0), (P_VAR, 2000.0), VAPOUR_PHASE, FRACS, [CP_VAR]) == None
+
+    #Arguments in the other order
+    vals = surrogate.GetProperties((P_VAR, 2000.0), (T_VAR, 300.0), VAPOUR_PHASE, FRACS, PROPLIST)
+    assert vals == surrogate.GetProperties((T_VAR, 300.0), (P_VAR, 2000.0), VAPOUR_PHASE, FRACS, PROPLIST)
+
+    #Nothing left registered
+    thAdmin.UnregisterSurrogate(PROVIDER, THCASE, holder)
+    assert not thAdmin._surrogates
+    print 'OK'
+
+
+def RunTest():
+    TestLinear()
+    TestAgainstThermo()
+    TestFallBack()
+    print 'All surrogate checks passed'
+
+if __name__ == '__main__':
+    RunTest()
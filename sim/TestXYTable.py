@@ -0,0 +1,59 @@
+"""Checks of the table lookups of sim.unitop.XYTable
+
+Linear and PCHIP interpolation must agree on the table points and treat
+values outside of the table the same way. Run as python -m sim.TestXYTable
+
+"""
+from sim.unitop import XYTable
+
+METHODS = (XYTable.LINEAR_INTERP, XYTable.PCHIP_INTERP)
+
+
+def MakeTable(x, y, tag=None):
+    table = XYTable.ATable()
+    table.SetSeriesCount(2)
+    table.GetSeries(0).SetValues(x)
+    table.GetSeries(1).SetValues(y)
+    if tag != None:
+        table.GetObject(XYTable.TABLETAG_VAR).SetValue(tag)
+    return table
+
+def TestTablePoints():
+    print 'Both methods go through the table points'
+    x, y = [1.0, 2.0, 4.0, 8.0], [10.0, 20.0, 25.0, 60.0]
+    for xVals in (x, x[::-1]):
+        yVals = [y[x.index(val)] for val in xVals]
+        table = MakeTable(xVals, yVals)
+        for method in METHODS:
+            result = table.Interpolate(0, 1, x, method)
+            print method, result
+            assert result == y
+
+def TestOutOfTable():
+    print 'Values out of the table return the end points with both methods'
+    x, y = [1.0, 2.0, 4.0, 8.0], [10.0, 20.0, 25.0, 60.0]
+    vals = [-5.0, 0.5, 1.0, 8.0, 9.0, 100.0]
+    expected = [10.0, 10.0, 10.0, 60.0, 60.0, 60.0]
+    for table in (MakeTable(x, y), MakeTable(x[::-1], y[::-1])):
+        for method in METHODS:
+            for allowExtrap in (0, 1):
+                result = table.Interpolate(0, 1, vals, method, allowExtrap)
+                print method, allowExtrap, result
+                assert result == expected
+            assert table.Interpolate(0, 1, 0.5, method) == 10.0
+
+    #A tag out of range uses the closest table in both methods
+    tables = [MakeTable(x, [val * f for val in y], f) for f in (1.0, 2.0, 3.0)]
+    for method in METHODS:
+        result = XYTable.InterpolateTables(tables, 5.0, 0, 1, [0.0, 2.0, 10.0], method)
+        print method, result
+        assert result == [30.0, 60.0, 180.0]
+
+
+def RunTest():
+    TestTablePoints()
+    TestOutOfTable()
+    print 'All XYTable checks passed'
+
+if __name__ == '__main__':
+    RunTest()
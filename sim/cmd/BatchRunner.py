@@ -0,0 +1,250 @@
+"""
+Batch runs of command scripts in a pool of processes
+
+Functions:
+RunCase -- Run one case in the current process
+RunBatch -- Run many cases in worker processes and write a summary
+CasesFromScripts -- A case for every script
+CasesFromReads -- A case for every script read by a script like testall.tst
+CasesFromSweep -- A case for a script followed by every line of a sweep file
+
+Remarks:
+A case is a tuple (name, script, extraCommands). The script is run from
+its own directory, so its read, store and recall commands work as usual,
+by a CommandInterface of its own, followed by the extra commands (each a
+command line). Every case writes what it prints to name.out in the output
+directory, and summary.txt gets a line per case with its status and wall
+time. Each case gets a fresh worker process, so no case sees what another
+one left in the module globals.
+
+Usage:
+python -m sim.cmd.BatchRunner [-j workers] [-o outDir] [-s sweepFile] [-x] [-t] script ...
+-j -- number of worker processes (default the number of cpus, 1 runs here)
+-o -- directory for the outputs and summary.txt (default batchout)
+-s -- run each script once for every line of sweepFile, after the script
+-x -- run the scripts read by each script as the cases (e.g. testall.tst)
+-t -- ignore the tower iteration messages
+"""
+
+import sys, os, time, getopt, traceback, StringIO
+import multiprocessing
+
+from sim.cmd import CommandInterface
+from sim.solver.Error import CallBackException
+
+SUMMARY_FILE = 'summary.txt'
+
+#Status of a case in the summary
+OK_STATUS = 'ok'
+ERROR_STATUS = 'error'
+
+
+def CaseName(script):
+    return os.path.splitext(os.path.basename(script))[0]
+
+def CasesFromScripts(scripts):
+    """A case for every script"""
+    return [(CaseName(script), script, []) for script in scripts]
+
+def CasesFromReads(script):
+    """A case for every script read by script (comments and clear are left out)"""
+    cases = []
+    baseDir = os.path.dirname(os.path.abspath(script))
+    for line in open(script).readlines():
+        words = line.split('#', 1)[0].split()
+        if len(words) == 2 and words[0] == 'read':
+            readScript = os.path.join(baseDir, words[1])
+            cases.append((CaseName(readScript), readScript, []))
+    return cases
+
+def CasesFromSweep(script, sweepFile):
+    """
+    A case for every line of sweepFile, with script followed by the
+    commands in the line (separated by ;). Empty and comment lines are skipped
+    """
+    cases = []
+    name = CaseName(script)
+    for line in open(sweepFile).readlines():
+        line = line.strip()
+        if not line or line[0] == '#':
+            continue
+        cmds = [cmd.strip() for cmd in line.split(';') if cmd.strip()]
+        cases.append(('%s_%d' % (name, len(cases)), script, cmds))
+    return cases
+
+def UniqueNames(cases):
+    """The cases with a number appended to repeated names"""
+    result = []
+    used = {}
+    for name, script, extraCommands in cases:
+        newName = name
+        while used.has_key(newName):
+            used[name] += 1
+            newName = '%s_%d' % (name, used[name])
+        used[newName] = 0
+        result.append((newName, script, extraCommands))
+    return result
+
+
+def RunCase(case, outDir):
+    """
+    run case writing its output to outDir
+    returns (name, status, seconds, output file name)
+    """
+    name, script, extraCommands = case
+    outName = os.path.join(outDir, name + '.out')
+    out = open(outName, 'w')
+    savedOut = sys.stdout
+    cwd = os.getcwd()
+    status = OK_STATUS
+    interface = None
+    start = time.time()
+    try:
+        try:
+            sys.stdout = out
+            os.chdir(os.path.dirname(os.path.abspath(script)))
+            lines = open(os.path.basename(script)).read()
+            if lines and lines[-1] != '\n':
+                lines += '\n'
+            for cmd in extraCommands:
+                lines += cmd + '\n'
+            interface = CommandInterface.CommandInterface()
+            inFile = StringIO.StringIO(lines)
+            #As CommandInterface.run, report the error and go on with the script
+            while 1:
+                try:
+                    interface.ProcessCommandStream(inFile, out, out)
+                    break
+                except CallBackException, e:
+                    status = ERROR_STATUS
+                    interface.infoCallBack.handleMessage('CMDCallBackException', str(e))
+                except Exception, e:
+                    status = ERROR_STATUS
+                    tb = ''.join(traceback.format_tb(sys.exc_info()[2]))
+                    interface.infoCallBack.handleMessage('CMDUnhandledError', (str(sys.exc_info()[0]), str(e), tb))
+        except Exception:
+            status = ERROR_STATUS
+            traceback.print_exc(file=out)
+    finally:
+        if interface:
+            try:
+                interface.CleanUp()
+            except Exception:
+                pass
+        seconds = time.time() - start
+        sys.stdout = savedOut
+        os.chdir(cwd)
+        out.close()
+    return (name, status, seconds, outName)
+
+def _RunCaseInWorker(args):
+    return RunCase(*args)
+
+def _InitWorker(quietTower):
+    CommandInterface.IgnoreRoutineMessages(quietTower)
+
+
+def RunBatch(cases, outDir, nuWorkers=None, quietTower=0, report=None):
+    """
+    run cases with nuWorkers processes (the number of cpus if None, in this
+    process if 1) and write the summary file. report, if given, is called
+    with the result of every case as it finishes
+    returns the list of (name, status, seconds, output file name)
+    """
+    outDir = os.path.abspath(outDir)
+    if not os.path.isdir(outDir):
+        os.makedirs(outDir)
+    cases = UniqueNames(cases)
+    if nuWorkers == None:
+        nuWorkers = multiprocessing.cpu_count()
+    nuWorkers = max(1, min(nuWorkers, len(cases)))
+
+    start = time.time()
+    results = []
+    if nuWorkers == 1:
+        _InitWorker(quietTower)
+        for case in cases:
+            result = RunCase(case, outDir)
+            results.append(result)
+            if report: report(result)
+    else:
+        pool = multiprocessing.Pool(nuWorkers, _InitWorker, (quietTower,), maxtasksperchild=1)
+        try:
+            args = [(case, outDir) for case in cases]
+            for result in pool.imap(_RunCaseInWorker, args):
+                results.append(result)
+                if report: report(result)
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    WriteSummary(os.path.join(outDir, SUMMARY_FILE), results, time.time() - start, nuWorkers)
+    return results
+
+def WriteSummary(fileName, results, seconds, nuWorkers):
+    f = open(fileName, 'w')
+    try:
+        f.write('%-30s %-6s %10s  %s\n' % ('case', 'status', 'seconds', 'output'))
+        total = 0.0
+        failed = 0
+        for name, status, caseSeconds, outName in results:
+            f.write('%-30s %-6s %10.2f  %s\n' % (name, status, caseSeconds, os.path.basename(outName)))
+            total += caseSeconds
+            if status != OK_STATUS:
+                failed += 1
+        f.write('\n%d cases, %d failed, %d workers\n' % (len(results), failed, nuWorkers))
+        f.write('%.2f seconds of cases in %.2f seconds of wall time\n' % (total, seconds))
+    finally:
+        f.close()
+
+
+def PrintResult(result):
+    name, status, seconds, outName = result
+    print '%-30s %-6s %10.2f' % (name, status, seconds)
+    sys.stdout.flush()
+
+def main(argv):
+    try:
+        opts, scripts = getopt.getopt(argv, 'j:o:s:xt')
+    except getopt.GetoptError, e:
+        print str(e)
+        print __doc__
+        return 2
+    nuWorkers = None
+    outDir = 'batchout'
+    sweepFile = None
+    expandReads = 0
+    quietTower = 0
+    for opt, value in opts:
+        if opt == '-j':
+            nuWorkers = int(value)
+        elif opt == '-o':
+            outDir = value
+        elif opt == '-s':
+            sweepFile = value
+        elif opt == '-x':
+            expandReads = 1
+        elif opt == '-t':
+            quietTower = 1
+    if not scripts:
+        print __doc__
+        return 2
+
+    cases = []
+    for script in scripts:
+        if sweepFile:
+            cases.extend(CasesFromSweep(script, sweepFile))
+        elif expandReads:
+            cases.extend(CasesFromReads(script))
+        else:
+            cases.extend(CasesFromScripts([script]))
+
+    results = RunBatch(cases, outDir, nuWorkers, quietTower, PrintResult)
+    for name, status, seconds, outName in results:
+        if status != OK_STATUS:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,341 @@
+"""
+Benchmarks of command scripts against a baseline
+
+Functions:
+MeasureCase -- Run one case and return its time and work counters
+RunBenchmark -- Measure many cases in worker processes
+LoadBaseline -- Measurements stored by SaveBaseline
+SaveBaseline -- Store measurements as a json baseline
+Compare -- Regressions of the measurements against a baseline
+MeasurePropertyAccess -- Throughput of property get and set in nested flowsheets
+MeasureBuild -- Time to build, look up and delete a large synthetic flowsheet
+
+Remarks:
+Every case is run as by sim.cmd.BatchRunner, in a process of its own, and
+measured by its wall time and the counters of sim.solver.Counters (unit op
+solves, ops forgotten and solved to forget, recycle iterations, thermo calls,
+flashes and the iterated flashes the thermo does not support). With repeats > 1 the fastest run is kept, the counters do
+not change from run to run.
+A measurement is a regression when it is more than the threshold (a
+fraction) over the baseline. Times under MIN_SECONDS apart are taken as
+noise.
+MeasurePropertyAccess is a micro benchmark of the solver alone, with the
+property of a port of an op nested depth levels deep in flowsheets.
+MeasureBuild times the structure edits of a chain of streams with no
+thermo, so it measures the bookkeeping of ops and ports only.
+
+Usage:
+python -m sim.cmd.Benchmark [-j workers] [-o outDir] [-b baseline] [-w] [-r repeats] [-f fraction] [-x] [-t] [-n] script ...
+python -m sim.cmd.Benchmark -p depth,depth,...
+python -m sim.cmd.Benchmark -s size,size,...
+-j -- number of worker processes (default 1, for steady timings)
+-o -- directory for the outputs of the scripts (default benchout)
+-b -- json baseline file to compare with (default benchmark.json)
+-w -- write the measurements to the baseline instead of comparing
+-r -- runs of every case, the fastest is kept (default 1)
+-f -- allowed fraction over the baseline (default 0.1)
+-x -- run the scripts read by each script as the cases (e.g. testall.tst)
+-t -- ignore the tower iteration messages
+-n -- solve every op on forget passes, even with nothing changed at its ports
+-p -- measure the property get and set throughput at every depth instead
+-s -- measure the build of a flowsheet with every number of ops instead
+"""
+
+import sys, os, time, getopt
+import json
+import multiprocessing
+
+from sim.cmd import BatchRunner
+from sim.solver import Counters
+from sim.solver import Flowsheet
+from sim.solver.Variables import MAT, IN, T_VAR, FIXED_V, IN_PORT, OUT_PORT
+from sim.unitop import UnitOperations, Stream
+
+BASELINE_FILE = 'benchmark.json'
+BASELINE_VERSION = 1
+
+SECONDS = 'Seconds'
+STATUS = 'Status'
+METRICS = (SECONDS,) + Counters.ALL_COUNTERS
+
+DEFAULT_THRESHOLD = 0.1
+MIN_SECONDS = 0.05
+
+
+def MeasureCase(case, outDir, repeats=1):
+    """
+    run case repeats times
+    returns (name, measurement) with measurement a dictionary of the metrics
+    and the status
+    """
+    best = None
+    for i in range(max(1, repeats)):
+        Counters.ResetCounts()
+        name, status, seconds, outName = BatchRunner.RunCase(case, outDir)
+        if best == None or seconds < best[SECONDS]:
+            best = Counters.GetCounts()
+            best[SECONDS] = seconds
+            best[STATUS] = status
+    return name, best
+
+def _MeasureCaseInWorker(args):
+    return MeasureCase(*args)
+
+def _InitWorker(quietTower, scopedForget):
+    BatchRunner._InitWorker(quietTower)
+    Flowsheet.SCOPED_FORGET = scopedForget
+
+
+def RunBenchmark(cases, outDir, nuWorkers=1, repeats=1, quietTower=0, report=None, scopedForget=True):
+    """
+    measure cases with nuWorkers processes (in this process if 1). report,
+    if given, is called with every (name, measurement) as it finishes.
+    scopedForget is set as Flowsheet.SCOPED_FORGET in every worker
+    returns a dictionary {name: measurement}
+    """
+    outDir = os.path.abspath(outDir)
+    if not os.path.isdir(outDir):
+        os.makedirs(outDir)
+    cases = BatchRunner.UniqueNames(cases)
+    nuWorkers = max(1, min(nuWorkers, len(cases)))
+
+    results = {}
+    if nuWorkers == 1:
+        _InitWorker(quietTower, scopedForget)
+        for case in cases:
+            name, measurement = MeasureCase(case, outDir, repeats)
+            results[name] = measurement
+            if report: report(name, measurement)
+    else:
+        pool = multiprocessing.Pool(nuWorkers, _InitWorker, (quietTower, scopedForget), maxtasksperchild=1)
+        try:
+            args = [(case, outDir, repeats) for case in cases]
+            for name, measurement in pool.imap(_MeasureCaseInWorker, args):
+                results[name] = measurement
+                if report: report(name, measurement)
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+    return results
+
+
+def LoadBaseline(fileName):
+    f = open(fileName, 'r')
+    try:
+        data = json.load(f)
+    finally:
+        f.close()
+    if data.get('version', None) != BASELINE_VERSION:
+        raise ValueError('%s is not a benchmark baseline' % fileName)
+    cases = {}
+    for name, measurement in data['cases'].items():
+        cases[str(name)] = measurement
+    return cases
+
+def SaveBaseline(fileName, results):
+    """Store results, keeping the cases of the old baseline that were not run"""
+    cases = {}
+    if os.path.isfile(fileName):
+        cases.update(LoadBaseline(fileName))
+    cases.update(results)
+    data = {'version': BASELINE_VERSION,
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'cases': cases}
+    f = open(fileName, 'w')
+    try:
+        json.dump(data, f, indent=1, sort_keys=True)
+    finally:
+        f.close()
+
+def Compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    returns a sorted list of regressions (name, metric, baseline value, new value).
+    A case that failed and did not in the baseline has the metric Status
+    """
+    regressions = []
+    for name, measurement in results.items():
+        base = baseline.get(name, None)
+        if base == None:
+            continue
+        if measurement[STATUS] != BatchRunner.OK_STATUS and base.get(STATUS, None) == BatchRunner.OK_STATUS:
+            regressions.append((name, STATUS, base[STATUS], measurement[STATUS]))
+        for metric in METRICS:
+            old = base.get(metric, None)
+            new = measurement.get(metric, None)
+            if old == None or new == None:
+                continue
+            if new <= old * (1.0 + threshold):
+                continue
+            if metric == SECONDS and new - old < MIN_SECONDS:
+                continue
+            regressions.append((name, metric, old, new))
+    regressions.sort()
+    return regressions
+
+
+def MeasurePropertyAccess(depth, nuCalls=20000):
+    """
+    get and set nuCalls times the temperature of the port of an op with
+    depth - 1 flowsheets between it and the root flowsheet
+    returns (gets per second, sets per second)
+    """
+    root = parent = Flowsheet.Flowsheet()
+    for i in range(depth - 1):
+        child = Flowsheet.Flowsheet()
+        parent.AddUnitOperation(child, 'Level%d' % (i + 1))
+        parent = child
+    op = UnitOperations.UnitOperation()
+    parent.AddUnitOperation(op, 'Op')
+    prop = op.CreatePort(MAT|IN, 'In').GetProperty(T_VAR)
+    try:
+        start = time.time()
+        for i in xrange(nuCalls):
+            prop.GetValue()
+        getSeconds = time.time() - start
+        start = time.time()
+        for i in xrange(nuCalls):
+            prop.SetValue(300.0 + i, FIXED_V)
+        setSeconds = time.time() - start
+    finally:
+        root.CleanUp()
+    return nuCalls/max(getSeconds, 1.0e-9), nuCalls/max(setSeconds, 1.0e-9)
+
+
+def MeasureBuild(nuOps):
+    """
+    build a flowsheet on hold with a sub flowsheet of nuOps connected
+    streams, then find the path of every port and the name of every
+    stream, and delete them one by one
+    returns (build seconds, lookup seconds, delete seconds)
+    """
+    root = Flowsheet.Flowsheet()
+    root.hold = 1
+    try:
+        start = time.time()
+        sub = Flowsheet.Flowsheet()
+        root.AddUnitOperation(sub, 'Sub')
+        streams = []
+        for i in range(nuOps):
+            stream = Stream.Stream_Material()
+            sub.AddUnitOperation(stream, 'S%d' % i)
+            if streams:
+                streams[-1].GetPort(OUT_PORT).ConnectTo(stream.GetPort(IN_PORT))
+            streams.append(stream)
+        buildSeconds = time.time() - start
+
+        start = time.time()
+        for stream in streams:
+            sub.ShortestPortPath(stream.GetPort(IN_PORT))
+            sub.GetChildName(stream)
+        lookupSeconds = time.time() - start
+
+        start = time.time()
+        for i in range(nuOps):
+            sub.DelUnitOperation('S%d' % i)
+        deleteSeconds = time.time() - start
+    finally:
+        root.CleanUp()
+    return buildSeconds, lookupSeconds, deleteSeconds
+
+
+def PrintMeasurement(name, measurement):
+    counts = ' '.join(['%s=%d' % (metric, measurement.get(metric, 0)) for metric in Counters.ALL_COUNTERS])
+    print '%-30s %-6s %10.2f  %s' % (name, measurement[STATUS], measurement[SECONDS], counts)
+    sys.stdout.flush()
+
+def FormatValue(value):
+    if isinstance(value, float):
+        return '%.2f' % value
+    return str(value)
+
+def main(argv):
+    try:
+        opts, scripts = getopt.getopt(argv, 'j:o:b:wr:f:xtnp:s:')
+    except getopt.GetoptError, e:
+        print str(e)
+        print __doc__
+        return 2
+    nuWorkers = 1
+    outDir = 'benchout'
+    baselineFile = BASELINE_FILE
+    write = 0
+    repeats = 1
+    threshold = DEFAULT_THRESHOLD
+    expandReads = 0
+    quietTower = 0
+    scopedForget = True
+    depths = None
+    sizes = None
+    for opt, value in opts:
+        if opt == '-j':
+            nuWorkers = int(value)
+        elif opt == '-o':
+            outDir = value
+        elif opt == '-b':
+            baselineFile = value
+        elif opt == '-w':
+            write = 1
+        elif opt == '-r':
+            repeats = int(value)
+        elif opt == '-f':
+            threshold = float(value)
+        elif opt == '-x':
+            expandReads = 1
+        elif opt == '-t':
+            quietTower = 1
+        elif opt == '-n':
+            scopedForget = False
+        elif opt == '-p':
+            depths = [int(depth) for depth in value.split(',')]
+        elif opt == '-s':
+            sizes = [int(size) for size in value.split(',')]
+    Flowsheet.SCOPED_FORGET = scopedForget
+    if depths:
+        print '%-6s %14s %14s' % ('depth', 'gets/s', 'sets/s')
+        for depth in depths:
+            gets, sets = MeasurePropertyAccess(depth)
+            print '%-6d %14.0f %14.0f' % (depth, gets, sets)
+        return 0
+    if sizes:
+        print '%-6s %10s %10s %10s' % ('ops', 'build', 'lookup', 'delete')
+        for size in sizes:
+            build, lookup, delete = MeasureBuild(size)
+            print '%-6d %10.3f %10.3f %10.3f' % (size, build, lookup, delete)
+        return 0
+    if not scripts:
+        print __doc__
+        return 2
+
+    cases = []
+    for script in scripts:
+        if expandReads:
+            cases.extend(BatchRunner.CasesFromReads(script))
+        else:
+            cases.extend(BatchRunner.CasesFromScripts([script]))
+
+    results = RunBenchmark(cases, outDir, nuWorkers, repeats, quietTower, PrintMeasurement, scopedForget)
+    if write:
+        SaveBaseline(baselineFile, results)
+        print 'Baseline of %d cases written to %s' % (len(results), baselineFile)
+        return 0
+
+    if not os.path.isfile(baselineFile):
+        print 'No baseline %s, run with -w to write one' % baselineFile
+        return 2
+    baseline = LoadBaseline(baselineFile)
+    missing = [name for name in results.keys() if not baseline.has_key(name)]
+    if missing:
+        missing.sort()
+        print 'Not in the baseline: %s' % ' '.join(missing)
+    regressions = Compare(results, baseline, threshold)
+    if not regressions:
+        print 'No regressions over %g of the baseline' % threshold
+        return 0
+    print '%d regressions over %g of the baseline:' % (len(regressions), threshold)
+    for name, metric, old, new in regressions:
+        print '%-30s %-18s %10s -> %s' % (name, metric, FormatValue(old), FormatValue(new))
+    return 1
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -34,7 +34,7 @@ from sim.design import *
 from sim.solver import Flowsheet, Ports
 from sim.solver.Error import CallBackException, SimError
 from sim.solver.Variables import *
-from sim.solver.Messages import MessageHandler
+from sim.solver.Messages import MessageHandler, MessageBuffer, ResolveArgs
 
 import vmgunits
 from vmgunits import units
@@ -70,6 +70,9 @@ del quo
 ZIPFILENAME = '__s42z__.s42'
 SIMSTORE_INFO = 'StoreInfo'
 
+#Objects found by path that GetObject keeps until the structure changes
+MAX_CACHED_PATHS = 10000
+
 MessageHandler.AddMessageModule(sim.cmd.cmdlanguages)
     
 class CommandInterface(object):
@@ -169,6 +172,10 @@ class CommandInterface(object):
             pass
         
         self.commandInProcess = ''
+        
+        #(start object, path) -> object, valid for one structure stamp
+        self._pathCache = {}
+        self._pathCacheStamp = None
 
         # Check all the thermo provider versions
         # Trap the error here so i may proceed as wrong version
@@ -2178,7 +2185,38 @@ class CommandInterface(object):
         """
         return the object described by objDesc relative to the startObj
         if the object does not exist return a CreateObject object
+        Unit ops, ports and port properties found from a unit op or port are
+        kept by path until the structure of a flowsheet changes
         """
+        if not isinstance(startObj, (UnitOperations.UnitOperation, Ports.Port)):
+            return self.FindObject(startObj, objDesc)
+        
+        stamp = Ports.GetStructureStamp()
+        if stamp != self._pathCacheStamp:
+            self._pathCache.clear()
+            self._pathCacheStamp = stamp
+        key = (startObj, objDesc)
+        obj = self._pathCache.get(key, None)
+        if obj is not None:
+            return obj
+        
+        obj = self.FindObject(startObj, objDesc)
+        if isinstance(obj, (UnitOperations.UnitOperation, Ports.Port, BasicProperty)):
+            #Only keep it if it is found through its owners, not through
+            #borrowed ports, tower stages and the like that can change
+            startPath = startObj.GetPath()
+            if startPath == '/':
+                path = '/' + objDesc
+            else:
+                path = startPath + '.' + objDesc
+            if obj.GetPath() == path:
+                if len(self._pathCache) >= MAX_CACHED_PATHS:
+                    self._pathCache.clear()
+                self._pathCache[key] = obj
+        return obj
+        
+    def FindObject(self, startObj, objDesc):
+        """GetObject walking the whole path every time"""
         if len(objDesc) == 0: return startObj
 
         c = objDesc[0]   # child type designator
@@ -2228,7 +2266,7 @@ class CommandInterface(object):
             
         if not obj is None:
            if remaining:
-               return self.GetObject(obj, remaining)
+               return self.FindObject(obj, remaining)
            else:
                return obj
         else:
@@ -2633,6 +2671,27 @@ class CommandInterface(object):
         except:
             pass
         return result
+    
+    def ValuesOf(self, rawCmds):
+        """
+        ValueOf of many objects in one call. rawCmds is a list of valueOf
+        commands, or a string of them separated by white space
+        returns the list of the results
+        """
+        if isinstance(rawCmds, types.StringTypes):
+            rawCmds = rawCmds.split()
+        return [self.ValueOf(rawCmd) for rawCmd in rawCmds]
+    
+    def SetValues(self, pathValues, estimate=0):
+        """
+        Assign many values in one call. pathValues is a list of (path, value)
+        with value a number in the current units or a string as in the
+        right hand side of '=' (e.g. '25 C'). Only forgets after each one
+        and solves once at the end, just as commands separated by ';'
+        """
+        operator = estimate and '~=' or '='
+        cmds = ['%s %s %s' % (path, operator, value) for path, value in pathValues]
+        return self.ProcessCommandString(';'.join(cmds))
 
     def CreatePort(self, remaining):
         """
@@ -2980,6 +3039,47 @@ class CommandInterface(object):
             optimize = 0
             
         SetUpCodeOptimization(optimize)
+
+    def Messages(self, remaining):
+        """
+        messages -- the number of suppressed messages by key and of the
+                    ones dropped from the recent list
+        messages recent [n] -- the last n (default 20) messages shown
+        messages level [n] -- get or set the level shown (0 all, 1 no details, 2 errors only)
+        messages reset -- clear the suppressed counts and the recent messages
+        """
+        words = remaining.split()
+        recent = getattr(self.infoCallBack, 'recent', None)
+        if not words:
+            counts = MessageHandler.GetSuppressedCounts().items()
+            counts.sort()
+            lines = []
+            total = 0
+            for msg, count in counts:
+                lines.append('%-30s %d' % (msg, count))
+                total += count
+            lines.append('%d messages suppressed' % total)
+            if recent:
+                lines.append('%d messages dropped from the recent list' % recent.dropped)
+            return '\n'.join(lines)
+        
+        if words[0] == 'recent':
+            if not recent:
+                return ''
+            count = 20
+            if len(words) > 1:
+                count = int(words[1])
+            return '\n'.join(recent.Render(count, self.infoCallBack.GetLanguageDict()))
+        elif words[0] == 'level':
+            if len(words) > 1:
+                MessageHandler.SetLevelShown(int(words[1]))
+            return MessageHandler.GetLevelShown()
+        elif words[0] == 'reset':
+            MessageHandler.ResetSuppressedCounts()
+            if recent:
+                recent.Clear()
+        else:
+            raise CmdError('CMDInvalidMessagesOption', words[0])
         
 # constants
 
@@ -3108,6 +3208,10 @@ class CommandInterface(object):
         self.clipboard.SetTag(tag)
         
         #Restore connections
+        cloneOfOp = {}
+        for idx in range(len(toCloneFull)):
+            if not cloneOfOp.has_key(toCloneFull[idx]):
+                cloneOfOp[toCloneFull[idx]] = clonesFull[idx]
         idx = 0
         for op in toCloneFull:
             cloneOp = clonesFull[idx]
@@ -3117,9 +3221,8 @@ class CommandInterface(object):
                     conn = port.GetConnection()
                     if conn != None:
                         connOp = conn.GetParent()
-                        if connOp in toCloneFull:
-                            connIdx = toCloneFull.index(connOp)
-                            connCloneOp = clonesFull[connIdx]
+                        connCloneOp = cloneOfOp.get(connOp, None)
+                        if connCloneOp != None:
                             clonePort = cloneOp.GetPort(port.GetName())
                             connClonePort = connCloneOp.GetPort(conn.GetName())
                             clonePort.ConnectTo(connClonePort)
@@ -3512,6 +3615,7 @@ class InfoCallBack(object):
         """
         self.language = MessageHandler.GetCurrentLanguage()
         self.languageDict = MessageHandler.GetLanguageDict(self.language)
+        self.recent = MessageBuffer()
         
     def SetLanguage(self, language):
         """
@@ -3534,6 +3638,8 @@ class InfoCallBack(object):
     def handleMessage(self, message, args, msgType=MessageHandler.infoMessage):
         """most basic of call backs"""
         if not MessageHandler.IsIgnored(message):
+            args = ResolveArgs(args)
+            self.recent.Add(message, args, msgType)
             sys.stdout.write('%s\n' %
                (MessageHandler.RenderMessage(message, args, self.languageDict)))
             
@@ -3556,6 +3662,7 @@ commands = {
             'dir':                 CommandInterface.Contents,
             'delete':              CommandInterface.Delete,
             'valueOf':             CommandInterface.ValueOf,
+            'valuesOf':            CommandInterface.ValuesOf,
             'createPort':          CommandInterface.CreatePort,
             'units':               CommandInterface.Units,
             'store':               CommandInterface.Store,
@@ -3579,7 +3686,8 @@ commands = {
             'optimizecode':        CommandInterface.OptimizeCode,
             'copy':                CommandInterface.Copy,
             'cut':                 CommandInterface.Cut,
-            'paste':               CommandInterface.Paste
+            'paste':               CommandInterface.Paste,
+            'messages':            CommandInterface.Messages
             }
 
 #Commands that can be processed while solving or forgetting
@@ -3606,7 +3714,11 @@ globalBasePath = None
 # recall or clear operation
 netServer = None
 
-def run(optimize=0):
+def IgnoreRoutineMessages(quietTower=0):
+    """
+    ignore the messages that are of no use in a script output
+    if quietTower is true the tower iteration messages are ignored too
+    """
     MessageHandler.IgnoreMessage('SolvingOp')
     MessageHandler.IgnoreMessage('DoneSolving')
     MessageHandler.IgnoreMessage('BeforePortDisconnect')    
@@ -3635,12 +3747,14 @@ def run(optimize=0):
     MessageHandler.IgnoreMessage('CMDNotifyBeforeAdd')
     MessageHandler.IgnoreMessage('CMDNotifyBeforeMinus')
     
-    if len(sys.argv) > 1:
-        if sys.argv[1] == '1':
-            MessageHandler.IgnoreMessage('TowerCalcJacobian')
-            MessageHandler.IgnoreMessage('TowerInnerError')
-            MessageHandler.IgnoreMessage('TowerOuterError')
-            
+    if quietTower:
+        MessageHandler.IgnoreMessage('TowerCalcJacobian')
+        MessageHandler.IgnoreMessage('TowerInnerError')
+        MessageHandler.IgnoreMessage('TowerOuterError')
+
+def run(optimize=0):
+    IgnoreRoutineMessages(len(sys.argv) > 1 and sys.argv[1] == '1')
+
     interface = CommandInterface(optimizeCode=optimize)
     while 1:
         try:
@@ -25,6 +25,7 @@ def Messages():
     m['CMDInvalidContents']     = "Cannot get contents of %s"
     m['CMDInvalidObject']       = "Invalid object %s"
     m['CMDInvalidUnitSet']      = "Invalid unit set %s"
+    m['CMDInvalidMessagesOption'] = "Invalid messages option %s"
     m['CMDInvalidNameSyntax']   = "Invalid name for object '%s'. It can not be a keyword or contain: ' ', ';' or start with: '/', '$'" 
     m['CMDNoCmpsMismatch']      = "Incorrect number of component fractions"
     m['CMDNoSuchName']          = "There is no object named %s"
@@ -0,0 +1,37 @@
+# Liquid liquid extractor solved with and without the simultaneous
+# (isothermal sum rates) initialization of the stages
+# Not read by testall.tst until its output has been checked with two liquid thermo
+$thermo = VirtualMaterials.Peng-Robinson
+/ -> $thermo
+thermo + n-HEPTANE BENZENE TRIETHYLENE_GLYCOL
+units SI
+
+lle = LiqLiqExt.LiqLiqEx()
+lle.NumberStages = 4
+cd lle.Feed
+Fraction = .5 .5 0.
+T = 0
+P = 101.325
+MoleFlow = 10
+cd /lle.Solvent
+Fraction = 0 0 1
+T = 0
+P = 101.325
+MoleFlow = 10
+cd /lle
+
+# stage by stage is the default
+Simultaneous
+Extract
+Raffinate
+
+# simultaneous, same answer
+Simultaneous = 1
+Extract
+Raffinate
+
+# simultaneous with more stages
+NumberStages = 6
+Extract
+Raffinate
+cd /
@@ -0,0 +1,40 @@
+# Flowsheet on the ollin cubic equations of state (no vmg needed)
+units SI
+$thermo = OllinThermo.Peng-Robinson
+/ -> $thermo
+thermo + Methane Ethane Propane isoButane n-Butane
+thermo + isoPentane CARBON_DIOXIDE
+
+# names are kept as the other providers give them
+thermo
+
+feed = Stream.Stream_Material()
+cd feed.In
+Fraction = .4 .15 .15 .1 .1 .05 .05
+T = 25 C
+P = 3000
+MoleFlow = 100
+cd /
+
+cooler = Heater.Heater()
+feed.Out -> cooler.In
+cooler.DeltaP = 50
+cooler.Out.T = -30 C
+
+sep = Flash.SimpleFlash()
+cooler.Out -> sep.In
+
+valve = Valve.Valve()
+sep.Liq0 -> valve.In
+valve.Out.P = 500
+
+sep.Vap
+sep.Liq0
+valve.Out
+cooler.InQ
+
+# warmer separator
+cooler.Out.T = -20 C
+sep.Vap.MoleFlow
+valve.Out.VapFrac
+cooler.InQ.Energy
@@ -233,5 +233,8 @@ read volumebalance.tst
 clear
 read setthermo.tst
 
+clear
+read ollin.tst
+
 #Finish with a clear to check for memory leaks
 clear
@@ -18,6 +18,9 @@ class HTTPMethodHandler(CGIHTTPServer.CGIHTTPRequestHandler):
     """
     http server using internal cgi methods
     """
+    # routines that send their own status line (e.g. 304 Not Modified)
+    ownStatusRoutines = ()
+
     def __init__(self, request, client_address, server, routines=None):
         """
         set up the methods allowed as cgi scripts
@@ -103,19 +106,23 @@ class HTTPMethodHandler(CGIHTTPServer.CGIHTTPRequestHandler):
         co = filter(None, self.headers.getheaders('cookie'))
         if co:
             env['HTTP_COOKIE'] = ', '.join(co)
+        inm = self.headers.getheader('if-none-match')
+        if inm:
+            env['HTTP_IF_NONE_MATCH'] = inm
         # XXX Other HTTP_* headers
 
-        # Since we're setting the env in the parent, provide empty
-        # values to override previously set values
+        # provide empty values for the variables the request does not set
         for k in ('QUERY_STRING', 'REMOTE_HOST', 'CONTENT_LENGTH',
                   'HTTP_USER_AGENT', 'HTTP_COOKIE'):
             env.setdefault(k, "")
 
-        self.send_response(200, "Script output follows")
+        if routine not in self.ownStatusRoutines:
+            self.send_response(200, "Script output follows")
 
         decoded_query = query.replace('+', ' ')
 
-        os.environ.update(env)
+        # kept per request, os.environ is shared by all the threads
+        self.cgiEnv = env
         try:
             if '=' not in decoded_query:
                 argvAppend = decoded_query
@@ -131,6 +138,8 @@ class HTTPMethodHandler(CGIHTTPServer.CGIHTTPRequestHandler):
                 waste = self.rfile.read(1)
             except:
                 break; # if there is a read error, just abandon conversation
+            if not waste:
+                break  # closed by the client
 
     def DoRoutine(self, argvAppend, routine):
       """ separate method so it can be overloaded """
@@ -158,7 +167,7 @@ class HTTPMethodHandler(CGIHTTPServer.CGIHTTPRequestHandler):
         self.end_headers()
         
         cgitb.enable()
-        form = cgi.FieldStorage()
+        form = cgi.FieldStorage(fp=self.rfile, environ=self.cgiEnv)
         stuff = form.getfirst("stuff", "Unknown")
         name = form.getfirst("name", "Name")
         
@@ -3,11 +3,12 @@ import BaseHTTPServer, SocketServer
 import sys, os, cgi, cgitb, random, re, time
 import traceback
 import sha
-import threading
-import cPickle
+import threading, Queue
+import cPickle, cStringIO
 import numpy
 import webbrowser, urllib
 import ConfigParser
+import json
 from numpy.oldnumeric import zeros, ones, reshape, Float, Int, array
 
 pickle = cPickle
@@ -22,8 +23,11 @@ from sim.solver import Ports, Flowsheet
 from sim.thermo import ThermoAdmin
 from sim42user import Sim42User
 import simbapfd
+import simbaworker
 
 simbaConfig = ConfigParser.ConfigParser()
+# session worker processes read the same file
+simbaConfigDir = os.getcwd()
 try:
     if not os.path.exists('simba.conf'):
         raise IOError
@@ -88,6 +92,19 @@ COMPVOLFRAC = 16
 COMPSTDLVOLFLOW = 32
 
 lastSessionName = '_lastsession.s42'
+hibernateName = '_hibernated%d.s42'
+
+# routines about the server itself, never handed to a session worker
+ServerRoutines = ('image', 'users', 'sessions')
+
+# solver messages kept per session for the json routine
+MaxKeptMessages = 500
+# longest wait in seconds of a json request for new messages
+MaxJsonWait = 30.0
+# rendered fragments kept per session
+MaxKeptFragments = 200
+# commands that change nothing the kept fragments show
+FragmentSafeCommands = ('cd', 'dir', 'valueOf', 'valuesOf', 'tree', 'ls', 'about')
 
 SIMBAINFO = 'Simba'
 PORTTABLES = 'PortTables'
@@ -111,6 +128,159 @@ except ImportError:
         sys.exit(1)
     mixin = SocketServer.ForkingMixIn
 
+
+def JsonValue(value):
+    """
+    value as something json can write
+    """
+    if isinstance(value, numpy.ndarray):
+        return value.tolist()
+    if isinstance(value, numpy.floating):
+        return float(value)
+    if isinstance(value, numpy.integer):
+        return int(value)
+    return value
+
+
+class ThreadStreams(object):
+    """
+    stand in for sys.stdout that sends the output of every thread to its own
+    stream, so request threads never swap the process wide one
+    """
+    def __init__(self, default=None):
+        self.default = default
+        self.local = threading.local()
+
+    def Install(self):
+        """replace sys.stdout, keeping the old one for threads without a stream"""
+        if sys.stdout is not self:
+            self.default = sys.stdout
+            sys.stdout = self
+
+    def Use(self, stream):
+        self.local.stream = stream
+        self.local.softspace = 0
+
+    def Release(self):
+        self.local.stream = None
+
+    def Capture(self, func, *args):
+        """run func and return what it printed in this thread"""
+        old = getattr(self.local, 'stream', None)
+        softspace = self.softspace
+        buffer = cStringIO.StringIO()
+        self.Use(buffer)
+        try:
+            func(*args)
+        finally:
+            self.local.stream = old
+            self.local.softspace = softspace
+        return buffer.getvalue()
+
+    def Stream(self):
+        stream = getattr(self.local, 'stream', None)
+        if stream is None:
+            return self.default
+        return stream
+
+    # print keeps its state in softspace, which has to be per thread too
+    def _GetSoftspace(self):
+        return getattr(self.local, 'softspace', 0)
+    def _SetSoftspace(self, value):
+        self.local.softspace = value
+    softspace = property(_GetSoftspace, _SetSoftspace)
+
+    def write(self, s):
+        self.Stream().write(s)
+
+    def writelines(self, lines):
+        self.Stream().writelines(lines)
+
+    def flush(self):
+        self.Stream().flush()
+
+    def __getattr__(self, name):
+        return getattr(self.Stream(), name)
+
+outputStreams = ThreadStreams()
+
+
+class CommandJob(object):
+    """
+    a command running for a session in the solve pool; its output is kept
+    so the page (or the polls that follow it) can show it
+    """
+    def __init__(self, session, cmdline):
+        self.session = session
+        self.cmdline = cmdline
+        self.output = cStringIO.StringIO()
+        self.result = ''
+        self.done = threading.Event()
+
+    def Run(self):
+        session = self.session
+        session.cmdLock.acquire()
+        outputStreams.Use(self.output)
+        try:
+            try:
+                self.result = session.CommandInterface().ProcessCommandString(self.cmdline)
+            except CallBackException, e:
+                session.infoCallBack.handleMessage('CMDCallBackException', str(e))
+            except Exception, e:
+                tb = ''
+                for i in traceback.format_tb(sys.exc_traceback):
+                    tb += i + '\n'
+                session.infoCallBack.handleMessage('CMDUnhandledError', (str(sys.exc_type), str(e), tb))
+        finally:
+            outputStreams.Release()
+            session.changeCount += 1
+            session.CommandDone(self.cmdline)
+            session.cmdLock.release()
+            self.done.set()
+            session.messageEvent.acquire()
+            session.messageEvent.notifyAll()
+            session.messageEvent.release()
+
+    def Wait(self, timeout=None):
+        """wait for the command up to timeout seconds and return true if it finished"""
+        self.done.wait(timeout)
+        return self.done.isSet()
+
+    def IsDone(self):
+        return self.done.isSet()
+
+    def Output(self):
+        """everything written so far"""
+        return self.output.getvalue()
+
+
+class SolvePool(object):
+    """
+    worker threads that run the session commands, so the request threads
+    return to serve pages while long solves go on
+    """
+    def __init__(self, nuWorkers):
+        self.queue = Queue.Queue()
+        self.workers = []
+        for i in range(max(1, nuWorkers)):
+            t = threading.Thread(target=self.Work, name='SolveWorker%d' % i)
+            t.setDaemon(1)
+            t.start()
+            self.workers.append(t)
+
+    def Submit(self, job):
+        self.queue.put(job)
+        return job
+
+    def Work(self):
+        while 1:
+            job = self.queue.get()
+            try:
+                job.Run()
+            except:
+                pass
+
+
 # Use mixin for multi threading - single threading makes debugging easier
 #class Sim42Server(BaseHTTPServer.HTTPServer):
 class Sim42Server(mixin, BaseHTTPServer.HTTPServer):
@@ -121,6 +291,22 @@ class Sim42Server(mixin, BaseHTTPServer.HTTPServer):
         """
         set up session stuff
         """
+        self.SetUp(localOnly, runPath)
+        server_address = ('', port)
+        
+        if self.processWorkers:
+            self.workerPool = simbaworker.WorkerPool(simbaConfigDir, self.runPath, localOnly,
+                                                     self.spareWorkers)
+        
+        if not localOnly and isinstance(self, mixin):
+            thread.start_new_thread(Sim42Server.PruneSessions, (self,))
+        
+        BaseHTTPServer.HTTPServer.__init__(self, server_address, Sim42Handler)
+        
+    def SetUp(self, localOnly, runPath):
+        """
+        configuration and session dictionaries, without the socket
+        """
         if runPath:
             self.runPath = os.path.abspath(runPath)
         else:
@@ -146,14 +332,12 @@ class Sim42Server(mixin, BaseHTTPServer.HTTPServer):
             
         self.sessions = {}
         self.sessionsByRootOp = {}
-        server_address = ('', port)
+        # guards the session dictionaries; each session has its own lock
+        self.sessionLock = threading.RLock()
+        self.solvePool = SolvePool(self.solveWorkers)
+        self.workerPool = None
         self.continueLoop = 1
         
-        if not localOnly and isinstance(self, mixin):
-            thread.start_new_thread(Sim42Server.PruneSessions, (self,))
-        
-        BaseHTTPServer.HTTPServer.__init__(self, server_address, Sim42Handler)
-        
     def LoadConfig(self):
         try:
             if self.localOnly and simbaConfig.has_option('Paths', 'localPath'):
@@ -178,6 +362,25 @@ class Sim42Server(mixin, BaseHTTPServer.HTTPServer):
         try: self.sessionPruneSleepTime = simbaConfig.getint('Sessions', 'sessionPruneSleepTime')
         except: self.sessionPruneSleepTime = 60
 
+        try: self.solveWorkers = simbaConfig.getint('Sessions', 'solveWorkers')
+        except: self.solveWorkers = 4
+
+        # seconds a command page waits for its command before it starts polling
+        try: self.commandWaitTime = simbaConfig.getfloat('Sessions', 'commandWaitTime')
+        except: self.commandWaitTime = 2.0
+
+        # when processWorkers is not 0 every session lives in a worker process
+        # and at most processWorkers of them are awake; the others are stored
+        # to disk after hibernateTime seconds without requests
+        try: self.processWorkers = simbaConfig.getint('Sessions', 'processWorkers')
+        except: self.processWorkers = 0
+
+        try: self.spareWorkers = simbaConfig.getint('Sessions', 'spareWorkers')
+        except: self.spareWorkers = 1
+
+        try: self.hibernateTime = simbaConfig.getint('Sessions', 'hibernateTime')
+        except: self.hibernateTime = 600
+
     def verify_request(self, request, client_address):
         """
         only allow local addresses for localOnly mode
@@ -193,17 +396,26 @@ class Sim42Server(mixin, BaseHTTPServer.HTTPServer):
         """
         for sessionId in self.sessions.keys():
             self.RemoveSession(sessionId)
+        if self.workerPool:
+            self.workerPool.Close()
         self.continueLoop = 0
         
     def AddSession(self, user, handler):
         """
         create a new session
         """
-        newId = randgen.randrange(100000, 1000000, 1)
-        while newId in self.sessions:
+        self.sessionLock.acquire()
+        try:
             newId = randgen.randrange(100000, 1000000, 1)
-        session = self.sessions[newId] = Sim42Session(user, newId)
-        self.sessionsByRootOp[session.CommandInterface().root] = session
+            while newId in self.sessions:
+                newId = randgen.randrange(100000, 1000000, 1)
+            if self.processWorkers:
+                session = self.sessions[newId] = RemoteSession(user, newId, self)
+            else:
+                session = self.sessions[newId] = Sim42Session(user, newId)
+                self.sessionsByRootOp[session.CommandInterface().root] = session
+        finally:
+            self.sessionLock.release()
         session.SetHandler(handler)
         
         if session.user.privilege & CAN_RESTART_SESSION:
@@ -244,6 +456,15 @@ class Sim42Server(mixin, BaseHTTPServer.HTTPServer):
                 except:
                     pass
                 
+            if isinstance(session, RemoteSession):
+                self.sessionLock.acquire()
+                try:
+                    del self.sessions[sessionID]
+                finally:
+                    self.sessionLock.release()
+                session.Close()
+                return
+                
             nullCallback = DoNothingCallBack()
             session.s42cmd.SetInfoCallBack(nullCallback)
             if session.user.privilege & CAN_RESTART_SESSION:
@@ -255,13 +476,22 @@ class Sim42Server(mixin, BaseHTTPServer.HTTPServer):
                 ##else:
                     ##name = session.user.name + '/' + lastSessionName
                 ##session.CommandInterface().Store(name)
-            del self.sessions[sessionID]
-            
-            rootOp = session.CommandInterface().root
-            while rootOp.GetParent(): rootOp = rootOp.GetParent()
-            del self.sessionsByRootOp[rootOp]
+            self.sessionLock.acquire()
+            try:
+                del self.sessions[sessionID]
+                
+                rootOp = session.CommandInterface().root
+                while rootOp.GetParent(): rootOp = rootOp.GetParent()
+                del self.sessionsByRootOp[rootOp]
+            finally:
+                self.sessionLock.release()
             
-            session.CommandInterface().CleanUp()
+            # wait for any command still running in the session
+            session.cmdLock.acquire()
+            try:
+                session.CommandInterface().CleanUp()
+            finally:
+                session.cmdLock.release()
 
         except:
             pass
@@ -270,7 +500,11 @@ class Sim42Server(mixin, BaseHTTPServer.HTTPServer):
         """
         return the session corresponding with sessionID
         """
-        session = self.sessions.get(sessionID, None)
+        self.sessionLock.acquire()
+        try:
+            session = self.sessions.get(sessionID, None)
+        finally:
+            self.sessionLock.release()
         session.lastAccessed = time.time()
         return session
 
@@ -296,8 +530,27 @@ class Sim42Server(mixin, BaseHTTPServer.HTTPServer):
                 self.RemoveSession(session.id)
             #f.close()
 
+            for session in self.sessions.values():
+                if (isinstance(session, RemoteSession) and
+                    currentTime - session.lastAccessed > self.hibernateTime):
+                    session.TryHibernate()
+
             time.sleep(self.sessionPruneSleepTime)            
         
+    def LeaseWorker(self):
+        """
+        a worker process for a session; if processWorkers are already awake
+        the one idle for the longest is hibernated first
+        """
+        awake = [(s.lastAccessed, s) for s in self.sessions.values()
+                 if isinstance(s, RemoteSession) and s.worker]
+        if len(awake) >= self.processWorkers:
+            awake.sort()
+            for lastAccessed, session in awake:
+                if session.TryHibernate():
+                    break
+        return self.workerPool.Lease()
+
     def PermittedBasePath(self, rootOp):
         """
         return the base path for session with rootOp
@@ -582,6 +835,18 @@ class Sim42Session(object):
         self.s42cmd.session = self
         self.commandLog = []
         self.handler = None
+        # lock is held by the request using the session and cmdLock by the
+        # command running for it in the solve pool
+        self.lock = threading.RLock()
+        self.cmdLock = threading.Lock()
+        self.job = None
+        # bumped by every command, the json routine ETag
+        self.changeCount = 0
+        self.messages = []
+        self.messageSeq = 0
+        self.messageEvent = threading.Condition()
+        # rendered html of ports and trees, see CachedRender
+        self.fragments = {}
         self.lastAccessed = time.time()
         self.errorMessages = []
         self.suggestions = False
@@ -620,6 +885,145 @@ class Sim42Session(object):
         """
         if cmd:
             self.commandLog.append(cmd)
+
+    def RunCommand(self, cmdline, pool):
+        """
+        queue cmdline in the solve pool and return its job
+        """
+        self.job = pool.Submit(CommandJob(self, cmdline))
+        return self.job
+
+    def IsRunning(self):
+        return self.job is not None and not self.job.IsDone()
+
+    def CommandDone(self, cmdline):
+        """
+        drop the kept fragments if cmdline may have changed how things
+        render (units, language, a recalled case...); changes to the
+        objects themselves are caught by their change stamps
+        """
+        for cmd in cmdline.split(';'):
+            words = cmd.split()
+            if words and CommandInterface.commands.has_key(words[0]) and \
+               not words[0] in FragmentSafeCommands:
+                self.fragments = {}
+                return
+
+    def RenderContext(self):
+        """what a fragment depends on besides the objects it shows"""
+        cmd = self.s42cmd
+        return (id(self.infoCallBack.GetLanguageDict()), id(cmd.units.defaultSet),
+                self.GetObjectPath(cmd.currentObj))
+
+    def CachedRender(self, key, signature, func, *args):
+        """
+        print what func(*args) prints, reusing the text of the last call
+        with the same key while signature and the render context stay the same
+        """
+        signature = (signature, self.RenderContext())
+        fragments = self.fragments
+        kept = fragments.get(key, None)
+        if kept and kept[0] == signature:
+            text = kept[1]
+        else:
+            text = outputStreams.Capture(func, *args)
+            if len(fragments) >= MaxKeptFragments:
+                fragments.clear()
+            fragments[key] = (signature, text)
+        sys.stdout.write(text)
+
+    def PortSignature(self, port):
+        """
+        change stamps of everything a port page shows: the port, its
+        connection and their unit ops with their ports (flash results)
+        """
+        GetChangeStamp = Ports.GetChangeStamp
+        conn = port.GetConnection()
+        signature = [GetChangeStamp(port)]
+        ops = [port.GetParent()]
+        if conn:
+            signature.append((conn.GetPath(), GetChangeStamp(conn)))
+            ops.append(conn.GetParent())
+        for op in ops:
+            if op:
+                signature.append(GetChangeStamp(op))
+                signature.extend([GetChangeStamp(p) for p in op.GetPorts()])
+        return tuple(signature)
+
+    def AddMessage(self, text):
+        """
+        keep a rendered message for the json routine
+        """
+        self.messageEvent.acquire()
+        try:
+            self.messageSeq += 1
+            self.messages.append((self.messageSeq, text))
+            if len(self.messages) > MaxKeptMessages:
+                del self.messages[:-MaxKeptMessages]
+            self.messageEvent.notifyAll()
+        finally:
+            self.messageEvent.release()
+
+    def MessagesFrom(self, seq, wait=0.0):
+        """
+        messages numbered seq or later as (seq, text); if there are none and
+        a command is running, wait up to wait seconds for one
+        """
+        self.messageEvent.acquire()
+        try:
+            if wait > 0.0 and self.messageSeq < seq and self.IsRunning():
+                self.messageEvent.wait(wait)
+            return [m for m in self.messages if m[0] >= seq]
+        finally:
+            self.messageEvent.release()
+
+    def JsonObject(self, path):
+        """
+        dictionary with the values of the object at path, ready for json
+        """
+        cmd = self.s42cmd
+        if path.startswith('/'):
+            obj = cmd.GetObject(cmd.root, path[1:])
+        else:
+            obj = cmd.GetObject(cmd.currentObj, path)
+        if isinstance(obj, Ports.Port):
+            return self.JsonPort(obj)
+        elif isinstance(obj, UnitOperations.UnitOperation):
+            return self.JsonUnitOp(obj)
+        elif isinstance(obj, BasicProperty):
+            return {'type': 'property', 'value': JsonValue(obj.GetValue()),
+                    'status': obj.GetCalcStatus()}
+        return {'type': 'unknown'}
+
+    def JsonPort(self, port):
+        props = {}
+        for name in port.GetPropNames():
+            prop = port.GetProperty(name)
+            props[name] = [JsonValue(prop.GetValue()), prop.GetCalcStatus()]
+        conn = port.GetConnection()
+        data = {'type': 'port', 'path': port.GetPath(), 'properties': props,
+                'connection': conn and conn.GetPath() or None}
+        if isinstance(port, Ports.Port_Material):
+            cmps = port.GetCompounds()
+            data['compounds'] = port.GetCompoundNames()
+            data['fractions'] = [JsonValue(c.GetValue()) for c in cmps]
+        return data
+
+    def JsonUnitOp(self, op):
+        message = op.ObjectMessage()
+        if len(message) > 1:
+            status = MessageHandler.RenderMessage(message[0], message[1], self.infoCallBack.GetLanguageDict())
+        elif message[0] != 'NoMessage':
+            status = str(message[0])
+        else:
+            status = ''
+        ports = {}
+        for name in op.GetPortNames():
+            ports[name] = self.JsonPort(op.GetPort(name))
+        return {'type': 'unitop', 'path': op.GetPath(), 'class': op.__class__.__name__,
+                'status': status, 'ports': ports,
+                'children': op.GetChildUONames()}
+
     def GetCommandLog(self):
         return self.commandLog
     
@@ -671,12 +1075,8 @@ class Sim42Session(object):
                 print ''' (<a href="javascript:DeleteObject('%s');">%s</a>)''' % (
                     path, self.msg('WebDelete'))
                 
-        if isinstance(obj, Ports.Port_Material):
-            self.ShowMaterialPort(obj)
-        elif isinstance(obj, Ports.Port_Signal):
-            self.ShowSignalPort(obj)
-        elif isinstance(obj, Ports.Port_Energy):
-            self.ShowEnergyPort(obj)
+        if isinstance(obj, Ports.Port):
+            self.CachedRender(('port', path), self.PortSignature(obj), self.ShowPort, obj)
         elif isinstance(obj, SimInfoDict):
            if obj.parent.GetName() == PORTTABLES:
                self.ShowPortTable(obj)
@@ -740,6 +1140,19 @@ class Sim42Session(object):
         else:
             self.ClearMenus()
 
+    def ShowPort(self, port):
+        """
+        render any kind of port
+        """
+        if isinstance(port, Ports.Port_Material):
+            self.ShowMaterialPort(port)
+        elif isinstance(port, Ports.Port_Signal):
+            self.ShowSignalPort(port)
+        elif isinstance(port, Ports.Port_Energy):
+            self.ShowEnergyPort(port)
+        else:
+            self.ClearMenus()
+
     def ClearMenus(self):
         print '''
         <script>
@@ -781,10 +1194,30 @@ class Sim42Session(object):
         self.ShowTreeItems(self.s42cmd.thermoAdmin, 1)
         
         #Flowsheet tree
-        print '<tr><td>', self.MakeCdRef('/' + '   (' + self.msg('WebFlowsheet') + ')', self.s42cmd.root), '</td></tr>'
-        self.ShowTreeItems(self.s42cmd.root, 1)
+        root = self.s42cmd.root
+        print '<tr><td>', self.MakeCdRef('/' + '   (' + self.msg('WebFlowsheet') + ')', root), '</td></tr>'
+        signature = self.TreeSignature(root, self.s42cmd.currentObj.GetPath())
+        self.CachedRender(('tree', id(root)), signature, self.ShowTreeItems, root, 1)
         print '</table>'
 
+    def TreeSignature(self, base, currentPath):
+        """
+        names and paths ShowTreeItems shows under base, without rendering them
+        """
+        if not hasattr(base, 'GetContents'):
+            return ()
+        contents = base.GetContents()
+        contents.sort()
+        signature = []
+        for name, item in contents:
+            if hasattr(item, 'GetPath'):
+                path = item.GetPath()
+                if currentPath.find(path) == 0:
+                    signature.append((name, path, self.TreeSignature(item, currentPath)))
+                else:
+                    signature.append((name, path))
+        return tuple(signature)
+
     def ShowTreeItems(self, base, indent):
         """
         display tree items in object base with indent level
@@ -1277,6 +1710,17 @@ class Sim42Session(object):
         """
         Print the ports as links and connections
         """
+        GetChangeStamp = Ports.GetChangeStamp
+        signature = [GetChangeStamp(op)]
+        for port in op.GetPorts():
+            conn = port.GetConnection()
+            signature.append((port.GetName(), GetChangeStamp(port), conn and conn.GetPath()))
+        self.CachedRender(('ports', op.GetPath()), tuple(signature), self.RenderPortSummary, op)
+
+    def RenderPortSummary(self, op):
+        """
+        PortSummary without the cache
+        """
         print '<table border=0>'
         self.PortSummaryRow(op, op.GetPortNames(MAT|IN),  'WebMatIn')
         self.PortSummaryRow(op, op.GetPortNames(MAT|OUT), 'WebMatOut')
@@ -6017,10 +6461,109 @@ function SelectPortTableOptions(menu)
     def GetPort(self, name):
         return self.ports[name]
 
+class ForwardRequest(Exception):
+    """
+    raised by Sim42Handler.GetSession when the session is in a worker process
+    """
+    def __init__(self, session):
+        Exception.__init__(self)
+        self.session = session
+
+
+class RemoteSession(object):
+    """
+    a session living in a worker process - the server only keeps the user,
+    the lock and, while it hibernates, the name of the stored case
+    """
+    def __init__(self, user, id, server):
+        self.user = user
+        self.id = id
+        self.server = server
+        self.worker = None
+        self.caseName = None
+        self.handler = None
+        self.lastAccessed = time.time()
+        self.lock = threading.RLock()
+        self.infoCallBack = SimbaCallBack(self)
+        try: self.infoCallBack.SetLanguage(user.language)
+        except: pass
+
+    def GetUser(self):
+        return self.user
+
+    def SetHandler(self, handler):
+        self.handler = handler
+
+    def ClearHandler(self):
+        self.handler = None
+
+    def Handler(self):
+        return self.handler
+
+    def msg(self, msgKey, args=None):
+        return MessageHandler.RenderMessage(msgKey, args, self.infoCallBack.GetLanguageDict())
+
+    def Worker(self):
+        """
+        the worker process, waking the session up if it hibernates
+        """
+        if self.worker is None or not self.worker.IsAlive():
+            self.worker = None
+            worker = self.server.LeaseWorker()
+            worker.Call('open', self.user, self.id, self.caseName)
+            self.worker = worker
+            self.caseName = None
+        return self.worker
+
+    def Forward(self, routine, argvAppend, env, body):
+        """
+        have the worker answer a request; returns (output, alive, shutdown)
+        """
+        return self.Worker().Call('request', routine, argvAppend, env, body)
+
+    def TryHibernate(self):
+        """
+        store the case and let the worker go unless a request or a command
+        is using the session; return true if it did
+        """
+        if self.worker is None or not self.lock.acquire(0):
+            return 0
+        try:
+            caseName = hibernateName % self.id
+            try:
+                if not self.worker.Call('hibernate', caseName):
+                    return 0
+            except simbaworker.WorkerError, e:
+                self.server.log_message('Session %d could not hibernate\n%s\n' % (self.id, str(e)))
+                return 0
+            self.worker.Close()
+            self.worker = None
+            self.caseName = caseName
+            return 1
+        finally:
+            self.lock.release()
+
+    def Close(self):
+        """
+        end the worker and forget the stored case
+        """
+        if self.worker:
+            self.worker.Close()
+            self.worker = None
+        if self.caseName:
+            path = self.server.basePath
+            if not self.server.localOnly:
+                path += os.sep + self.user.name
+            try: os.remove(path + os.sep + self.caseName)
+            except OSError: pass
+            self.caseName = None
+
+
 class Sim42Handler(HTTPMethodHandler):
     """
     Request handler for web server dedicated to Sim42 application
     """
+    ownStatusRoutines = ('json',)
     
     def __init__(self, request, client_address, server):
         """
@@ -6030,6 +6573,12 @@ class Sim42Handler(HTTPMethodHandler):
         self.server = server
         self.client_address = client_address
         self.session = None
+        HTTPMethodHandler.__init__(self, request, client_address, server, self.Routines())
+
+    def Routines(self):
+        """
+        the routines available
+        """
         routines = {
                     "command":  Sim42Handler.Command,
                     "docmd":    Sim42Handler.DoCommand,
@@ -6059,10 +6608,10 @@ class Sim42Handler(HTTPMethodHandler):
                     "image":    Sim42Handler.Image,
                     "addtoporttable":  Sim42Handler.AddToPortTable,
                     "deletefromporttable":  Sim42Handler.DeleteFromPortTable,            
-                    "selectporttable":  Sim42Handler.SelectPortTable                 
+                    "selectporttable":  Sim42Handler.SelectPortTable,
+                    "json":     Sim42Handler.JsonData
                     }
-                
-        HTTPMethodHandler.__init__(self, request, client_address, server, routines)
+        return routines
 
     def address_string(self):
         """Return the client address formatted for logging.
@@ -6120,6 +6669,11 @@ class Sim42Handler(HTTPMethodHandler):
         """
         self.session = self.GetSessionHelper(form)
         if self.session:
+            # only one request at a time works with a session
+            self.session.lock.acquire()
+            self.heldLocks.append(self.session.lock)
+            if self.forward and isinstance(self.session, RemoteSession):
+                raise ForwardRequest(self.session)
             # tell session what current handler is
             self.session.SetHandler(self)
             
@@ -6195,38 +6749,33 @@ class Sim42Handler(HTTPMethodHandler):
         self.SendBottom()
         return None
     
-    def SaveFileDescriptors(self):
-        self.save_argv = sys.argv
-        self.save_stdin = sys.stdin
-        self.save_stdout = sys.stdout
-        self.save_stderr = sys.stderr
-
-    def RestoreFileDescriptors(self):
-        sys.argv = self.save_argv
-        sys.stdin = self.save_stdin
-        sys.stdout = self.save_stdout
-        sys.stderr = self.save_stderr
-
-    def UseMyFileDescriptors(self):
-        sys.argv = self.myargv
-        sys.stdout = self.wfile
-        sys.stdin = self.rfile
-        
-        
     def DoRoutine(self, argvAppend, routine):
-        """ threaded version of DoRoutine """
-        globalLock.acquire()
-        self.SaveFileDescriptors()
-
+        """
+        threaded version of DoRoutine
+        print goes to this request only through outputStreams, so requests
+        for different sessions run side by side
+        """
         self.myargv = [routine]
         if argvAppend:
             self.myargv.append(argvAppend)
 
-        self.UseMyFileDescriptors()
+        self.form = None
+        self.heldLocks = []
+        self.body = None
+        self.forward = self.server.processWorkers and routine not in ServerRoutines
+        if self.forward:
+            # keep the request so it can be handed to a session worker
+            self.body = self.ReadBody()
+        outputStreams.Use(self.wfile)
 
         try:
-            self.routines[routine](self)
-            if (not self.session) and routine != 'sim42' and routine != 'hypowin':
+            try:
+                self.routines[routine](self)
+            except ForwardRequest, e:
+                self.ForwardRequest(e.session, routine, argvAppend)
+                return
+            if ((not self.session) and routine != 'sim42' and routine != 'hypowin' and
+                routine not in self.ownStatusRoutines):
                 s = msg('WebNotLoggedIn')
                 self.SendTop(s)
                 print '<body bgcolor=%s>' % (CommandBGColor)
@@ -6239,16 +6788,53 @@ class Sim42Handler(HTTPMethodHandler):
         finally:
             if self.session:
                 self.session.ClearHandler()
-            self.RestoreFileDescriptors()
-            globalLock.release()
+            outputStreams.Release()
+            while self.heldLocks:
+                self.heldLocks.pop().release()
         
     def GetForm(self):
         """
         returns a cgi.FieldStorage
         """
-        cgitb.enable()
-        form = cgi.FieldStorage()
-        return form
+        if self.form is None:
+            cgitb.enable()
+            # read from this request, not the process wide stdin and environment
+            if self.body is None:
+                fp = self.rfile
+            else:
+                fp = cStringIO.StringIO(self.body)
+            self.form = cgi.FieldStorage(fp=fp, environ=self.cgiEnv)
+        return self.form
+
+    def ReadBody(self):
+        """
+        the posted data of the request
+        """
+        try: length = int(self.cgiEnv.get('CONTENT_LENGTH', 0))
+        except ValueError: length = 0
+        if length > 0:
+            return self.rfile.read(length)
+        return ''
+
+    def ForwardRequest(self, session, routine, argvAppend):
+        """
+        let the worker process of session answer the request
+        """
+        try:
+            output, alive, shutdown = session.Forward(routine, argvAppend, self.cgiEnv, self.body)
+        except simbaworker.WorkerError, e:
+            self.server.log_message('Session %d worker failed\n%s\n' % (session.id, str(e)))
+            self.server.RemoveSession(session.id)
+            self.SendTop(msg('WebNotLoggedIn'))
+            print '<body bgcolor=%s>' % (CommandBGColor)
+            print '<p><a href="sim42" target="_top">%s</a></p>' % msg('WebLoginTitle')
+            self.SendBottom()
+            return
+        self.wfile.write(output)
+        if shutdown:
+            self.server.ShutDown()
+        elif not alive:
+            self.server.RemoveSession(session.id)
          
     def Download(self):
         form = self.GetForm()
@@ -7014,23 +7600,26 @@ function SaveOutputContents() {
         form = self.GetForm()
         session = self.GetSession(form)
         if session is None: return
-        cmdline = form.getfirst("cmd")
         self.SendTop(session.msg('WebCommandOutputTitle'))
-        self.ProcessCommand(session, cmdline) 
+        if form.has_key('poll'):
+            self.PollCommand(session)
+        else:
+            cmdline = form.getfirst("cmd")
+            self.ProcessCommand(session, cmdline) 
         self.SendBottom()
 
 
-    def ProcessCommand(self, session, cmdline):
+    def CommandScript(self, session):
         """
-        process cmdLine for session
+        scripts of the command output page
         """
-        
         # note that the code=Math.random() in the url below is just to force the browser to actually reload
         # the page when it has used a named anchor with in the page
         print """
 <SCRIPT TYPE="text/javascript">
 <!--
 sid = %d;
+var intervalId = null;
 
 function DoDisplay()
 {
@@ -7084,50 +7673,157 @@ function last() {
 }
 //-->
 </SCRIPT>
+""" % session.id
+
+    def CommandBody(self, job):
+        """
+        body tag of the command output page - the other frames are only
+        refreshed once the command is done
+        """
+        if job and not job.IsDone():
+            print '</head><body bgcolor="%s">' % ProcessBGColor
+        else:
+            print '</head><body onLoad="DoDisplay();" bgcolor="%s">' % ProcessBGColor
+
+    def JsonData(self):
+        """
+        port values, unit op status and solver messages as json, for
+        clients other than the browser pages. Fields:
+            path      object paths, any number of them
+            messages  first message number wanted (messages are left out if not given)
+            wait      seconds to wait for new messages while a command runs
+                      (not honoured when the session lives in a worker process)
+        The ETag is the session change counter, so an unchanged flowsheet
+        is answered with 304 Not Modified
+        """
+        form = self.GetForm()
+        session = None
+        if form.has_key('sid'):
+            session = self.GetSession(form)
+        if session is None:
+            self.send_error(403, "No session")
+            return
+
+        running = session.IsRunning()
+        etag = '"%d-%d"' % (session.id, session.changeCount)
+        if not running and self.cgiEnv.get('HTTP_IF_NONE_MATCH') == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        data = {'sid': session.id, 'change': session.changeCount, 'running': running}
+        if form.has_key('messages'):
+            try: first = int(form.getfirst('messages'))
+            except ValueError: first = 0
+            try: wait = min(float(form.getfirst('wait', 0)), MaxJsonWait)
+            except ValueError: wait = 0.0
+            if isinstance(self.server, WorkerServer):
+                # the parent holds the session lock and the worker pipe for the
+                # whole request, waiting here would block the session; answer
+                # at once and let the client poll
+                wait = 0.0
+            if wait > 0.0:
+                # let other requests of the session in while waiting
+                session.lock.release()
+                try:
+                    messages = session.MessagesFrom(first, wait)
+                finally:
+                    session.lock.acquire()
+            else:
+                messages = session.MessagesFrom(first)
+            data['messages'] = messages
+            data['next'] = session.messageSeq + 1
+            data['running'] = running = session.IsRunning()
+
+        objects = {}
+        for path in form.getlist('path'):
+            try:
+                objects[path] = session.JsonObject(path)
+            except Exception, e:
+                objects[path] = {'type': 'error', 'error': str(e)}
+        data['objects'] = objects
+
+        self.send_response(200)
+        self.send_header("Content-type", "application/json")
+        self.send_header("Cache-Control", "no-cache")
+        if not running:
+            self.send_header("ETag", '"%d-%d"' % (session.id, session.changeCount))
+        self.end_headers()
+        self.wfile.write(json.dumps(data))
 
-</head><body onLoad="DoDisplay();" bgcolor="%s">
-""" % (session.id, ProcessBGColor)
+    def ProcessCommand(self, session, cmdline):
+        """
+        process cmdLine for session
+        the command runs in the solve pool; if it is not done after
+        commandWaitTime the page shows what it has and polls for the rest
+        """
+        self.CommandScript(session)
 
-        cmdResult = ''
+        job = None
         if cmdline:
             if cmdline == 'quit':
                 if self.server.localOnly or session.GetUser().GetPrivilege() & CAN_SHUTDOWN:
+                    self.CommandBody(job)
                     self.server.ShutDown()
                     return
             elif cmdline == 'logout':
                 self.server.RemoveSession(session.id)
-                
-            try:
-                if cmdline.find('\n') == -1:
-                    print """<script>AddToCmdHistory('%s');
-                    var intervalId = setInterval(ScrollOutputWindow, 200);
-                    </script>""" % cmdline
 
-                print '<pre id="cmdOutput">\n=> ' + cmdline + '\n'
-                session.LogCommand(cmdline)
-                
-                self.RestoreFileDescriptors()
-                globalLock.release()
-                try:
-                    cmdResult = session.CommandInterface().ProcessCommandString(cmdline)
-                finally:
-                    globalLock.acquire()
-                    self.SaveFileDescriptors()
-                    self.UseMyFileDescriptors()
+            session.LogCommand(cmdline)
+            job = session.RunCommand(cmdline, self.server.solvePool)
+            job.Wait(self.server.commandWaitTime)
 
-                print '<script>clearInterval(intervalId);</script>'
-                if cmdline.split()[0] in ['language', 'units', 'recall', 'read']:
-                    self.languageFixups(session)
-                
-            except CallBackException, e:
-                print '<script>clearInterval(intervalId);</script>'
-                session.infoCallBack.handleMessage('CMDCallBackException', str(e))
-            except Exception, e:
-                print '<script>clearInterval(intervalId);</script>'
-                tb = ''
-                for i in traceback.format_tb(sys.exc_traceback):
-                    tb += i + '\n'
-                session.infoCallBack.handleMessage('CMDUnhandledError', (str(sys.exc_type), str(e), tb))
+        self.CommandBody(job)
+        if not cmdline:
+            print '<pre id="cmdOutput">'
+            self.EndCommandOutput(session, '')
+            return
+
+        if cmdline.find('\n') == -1:
+            print """<script>AddToCmdHistory('%s');
+            var intervalId = setInterval(ScrollOutputWindow, 200);
+            </script>""" % cmdline
+
+        print '<pre id="cmdOutput">\n=> ' + cmdline + '\n'
+        self.ShowCommandJob(session, job)
+
+    def PollCommand(self, session):
+        """
+        output of the last command of session, polled while it runs
+        """
+        self.CommandScript(session)
+        job = session.job
+        self.CommandBody(job)
+        if job is None:
+            print '<pre id="cmdOutput">'
+            self.EndCommandOutput(session, '')
+            return
+        print '<pre id="cmdOutput">\n=> ' + job.cmdline + '\n'
+        self.ShowCommandJob(session, job)
+
+    def ShowCommandJob(self, session, job):
+        """
+        output of job so far and either the rest of the page or a poll
+        """
+        print job.Output(),
+        if not job.IsDone():
+            print '</pre>'
+            print """<script>clearInterval(intervalId);
+            setTimeout("location.replace('docmd?sid=%d&poll=1&code=' + Math.random())", 1000);
+            </script>""" % session.id
+            return
+
+        print '<script>clearInterval(intervalId);</script>'
+        words = job.cmdline.split()
+        if words and words[0] in ['language', 'units', 'recall', 'read']:
+            self.languageFixups(session)
+        self.EndCommandOutput(session, job.result)
+
+    def EndCommandOutput(self, session, cmdResult):
+        """
+        command result and the output history links
+        """
         print cmdResult,
         print '</pre>'
 
@@ -8191,8 +8887,13 @@ function PathClick() {
         self.SendTop('WebSessions')
         print '</head><body bgcolor="%s">' % DisplayBGColor
         print '<table>'
-        for sId in self.server.sessions:
-            s = self.server.sessions[sId]
+        self.server.sessionLock.acquire()
+        try:
+            sessions = self.server.sessions.items()
+        finally:
+            self.server.sessionLock.release()
+        sessions.sort()
+        for sId, s in sessions:
             print '<tr><td>%d</td>' % sId
             print '<td>%s</td><td>%s</td>' % (s.user.name, time.ctime(s.lastAccessed))
             print '<td><a href="sessions?sid=%d&kill=%d">%s</a></td></tr>' % (
@@ -8521,23 +9222,105 @@ function PathClick() {
         session.pfd.OutputImage(session)    
 
 
+class WorkerServer(Sim42Server):
+    """
+    Sim42Server of a session worker process - it has no socket and answers
+    the requests its parent forwards for the one session it hosts
+    """
+    def __init__(self, localOnly, runPath):
+        self.SetUp(localOnly, runPath)
+        self.processWorkers = 0
+        self.hostedSession = None
+
+    def OpenSession(self, user, id, caseName=None):
+        """
+        host the session id, recalling its case if it hibernated
+        """
+        session = Sim42Session(user, id)
+        self.sessionLock.acquire()
+        try:
+            self.sessions[id] = session
+            self.sessionsByRootOp[session.CommandInterface().root] = session
+        finally:
+            self.sessionLock.release()
+        self.hostedSession = session
+        if caseName:
+            cmd = session.CommandInterface()
+            session.infoCallBack.SetLanguage(user.language)
+            cmd.ProcessCommand('units %s' % user.units)
+            cmd.Recall(caseName)
+            try:
+                self.remove(cmd.root, caseName)
+            except CommandInterface.CmdError, e:
+                self.log_message('Session %d could not remove %s\n%s\n' % (id, caseName, str(e)))
+
+    def HandleRequest(self, routine, argvAppend, env, body):
+        """
+        output of the request and whether the session and the server go on
+        """
+        handler = WorkerHandler(self, env, body)
+        handler.DoRoutine(argvAppend, routine)
+        session = self.hostedSession
+        alive = session is not None and self.sessions.has_key(session.id)
+        return handler.wfile.getvalue(), alive, not self.continueLoop
+
+    def HibernateSession(self, caseName):
+        """
+        store the case and drop the session; return false without waiting
+        if a command (e.g. a solve) is running in the session
+        """
+        session = self.hostedSession
+        if not session.cmdLock.acquire(0):
+            return 0
+        try:
+            session.CommandInterface().Store(caseName)
+        finally:
+            session.cmdLock.release()
+        self.RemoveSession(session.id)
+        self.hostedSession = None
+        return 1
+
+
+class WorkerHandler(Sim42Handler):
+    """
+    handler of a request forwarded to a worker process - the posted data
+    comes in body and everything written is kept in wfile
+    """
+    def __init__(self, server, env, body):
+        self.server = server
+        self.client_address = (env.get('REMOTE_ADDR', ''), 0)
+        self.session = None
+        self.routines = self.Routines()
+        self.cgiEnv = env
+        self.command = env.get('REQUEST_METHOD', 'GET')
+        self.request_version = 'HTTP/1.0'
+        self.rfile = cStringIO.StringIO(body)
+        self.wfile = cStringIO.StringIO()
+
+    def GetSessionHelper(self, form):
+        """
+        the parent checked the login already
+        """
+        session = self.server.hostedSession
+        if session:
+            session.lastAccessed = time.time()
+        return session
+
+
 class SimbaCallBack(CommandInterface.InfoCallBack):
     def __init__(self, session):
         self.session = session
         super(SimbaCallBack, self).__init__()
 
     def handleMessage(self, message, args, msgType=None):
-        """thread safe (??) message handler"""
+        """thread safe message handler"""
         if not MessageHandler.IsIgnored(message):
-            globalLock.acquire()  # is this really needed?
-            try:
-                wf = self.session.handler.wfile
-                msg = MessageHandler.RenderMessage(message, args, self.languageDict)
-                wf.write('%s\n' % msg)
-                if msgType == MessageHandler.errorMessage:
-                    self.session.errorMessages.append(msg)
-            finally:
-                globalLock.release()
+            # sys.stdout is the stream of the thread running the command
+            msg = MessageHandler.RenderMessage(message, args, self.languageDict)
+            sys.stdout.write('%s\n' % msg)
+            self.session.AddMessage(msg)
+            if msgType == MessageHandler.errorMessage:
+                self.session.errorMessages.append(msg)
 
 class DoNothingCallBack(CommandInterface.InfoCallBack):
     """
@@ -8548,16 +9331,12 @@ class DoNothingCallBack(CommandInterface.InfoCallBack):
         return
 
 
-globalLock = None
-
 def StartServer(server):
     """
-    create a global lock and start server
+    send the output of every thread to its own stream and start server
     """
 
-    global globalLock
-    globalLock = threading.RLock()
-    CommandInterface.globalLock = globalLock
+    outputStreams.Install()
 
     #MessageHandler.IgnoreMessage('SolvingOp')
     MessageHandler.IgnoreMessage('BeforePortDisconnect')    
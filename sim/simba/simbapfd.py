@@ -1,6 +1,7 @@
 """
 simbapfd attempts to generate a navigation quality pfd for use with simba
 """
+import weakref
 import sim.solver.Ports
 from sim.solver.Variables import *
 import piddlePIL
@@ -44,6 +45,11 @@ MaterialConnectionColor = blue
 EnergyConnectionColor = red
 SignalConnectionColor = green
 
+IndexBucketSize = 8 * ConnectorSeparation
+
+# last layout drawn of every flowsheet, see SimbaPFD.CreateImage
+_layouts = weakref.WeakKeyDictionary()
+
 class UopPositionMatrix(object):
     """
     matrix containing position of unit ops
@@ -87,6 +93,48 @@ class UopPositionMatrix(object):
             cols = max(cols, len(row))
         return (rows, cols)
 
+class SpatialIndex(object):
+    """
+    grid buckets along one axis. An item is kept in every bucket its
+    [low, high] range touches, so a query at a coordinate only sees the items
+    that can be near it. Items are (order, connection, uop) tuples
+    """
+    def __init__(self, bucketSize=IndexBucketSize):
+        self.bucketSize = bucketSize
+        self.buckets = {}
+
+    def Add(self, low, high, item):
+        size = self.bucketSize
+        for i in range(int(low) / size, int(high) / size + 1):
+            self.buckets.setdefault(i, []).append(item)
+
+    def Query(self, v):
+        """
+        the items whose range may hold v, once each and in order
+        """
+        items = {}
+        for item in self.buckets.get(int(v) / self.bucketSize, ()):
+            items[item[0]] = item
+        orders = items.keys()
+        orders.sort()
+        return [items[order] for order in orders]
+
+class PFDLayout(object):
+    """
+    what is kept of a drawn pfd to draw its flowsheet again
+    """
+    def __init__(self, topology, pfd):
+        self.topology = topology
+        self.canvas = pfd.canvas
+        self.areas = pfd.areas
+        self.rightBound = pfd.rightBound
+        self.bottomBound = pfd.bottomBound
+        self.obstacles = pfd.Obstacles()
+        self.routes = {}
+        for conn in pfd.connections:
+            if conn.connectedPoint:
+                self.routes[conn.Key()] = (conn.horizontalSegments, conn.verticalSegments)
+
 class ConnectionIcon(object):
     def __init__(self, input, direction, point):
         """
@@ -107,6 +155,13 @@ class ConnectionIcon(object):
         
         self.point2 = (x,y)
         
+    def Box(self):
+        """
+        (left, top, right, bottom) of the icon
+        """
+        (x,y), (x2,y2) = self.point, self.point2
+        return (min(x, x2), min(y, y2), max(x, x2), max(y, y2))
+
     def VerticalLineLimits(self, verticalTrial):
         """
         set limits on verticalTrial so it doesn't cross icon
@@ -334,6 +389,19 @@ class Connection(object):
         self.verticalSegments = []
         self.horizontalSegments = []        
 
+    def Key(self):
+        """
+        the connection in another layout of the flowsheet has the same key
+        """
+        return (self.point, self.connectedPoint)
+
+    def SetRoute(self, horizontalSegments, verticalSegments):
+        """
+        take the route found for the connection in an earlier layout
+        """
+        self.horizontalSegments = horizontalSegments
+        self.verticalSegments = verticalSegments
+
     def Route(self, pfd):
         """
         find a route of horizontal and vertical lines between the connection points in pfd
@@ -670,22 +738,143 @@ class SimbaPFD(object):
                               'Valve':               SimbaPFD.DrawValve
                               }
         self.connectionDir = {}
+        self.connections = []
+        self.areas = []
         
     def CreateImage(self):
         """
-        create the pfd image
+        create the pfd image. A flowsheet with the same topology as when it
+        was last drawn gets the same image back, otherwise only the
+        connections its changes get in the way of are routed again
+        """
+        topology = self.Topology()
+        last = _layouts.get(self.flowsheet, None)
+        if last and last.topology == topology:
+            self.canvas = last.canvas
+            self.areas = last.areas
+            self.rightBound = last.rightBound
+            self.bottomBound = last.bottomBound
+        else:
+            self.Position()
+            self.DrawUops()
+            self.RouteConnections(last)
+            
+            for conn in self.connections:
+                conn.DrawVertical(self.canvas)
+                
+            for conn in self.connections:
+                conn.DrawHorizontal(self.canvas)
+            _layouts[self.flowsheet] = PFDLayout(topology, self)
+            
+        for area in self.areas:
+            print area
+            
+    def Topology(self):
         """
-        self.Position()
-        self.DrawUops()
-        for conn in self.connectionDir.values():
+        everything the drawing depends on, as a tuple
+        """
+        uops = self.flowsheet.chUODict.values()
+        uops.sort(lambda a, b:cmp(a.creationTime, b.creationTime))
+        topology = [self.flowsheet.GetPath()]
+        for uop in uops:
+            ports = []
+            for port in uop.GetPorts():
+                conn = port.GetConnection()
+                ports.append((port.GetName(), port.GetPortType(), conn and conn.GetPath()))
+            topology.append((uop.GetName(), uop.__class__.__name__, uop.creationTime,
+                             getattr(uop, 'numStages', None), tuple(ports)))
+        return tuple(topology)
+    
+    def RouteConnections(self, last=None):
+        """
+        route the connections, keeping the routes of the last layout that
+        are still clear of everything new
+        """
+        self.connections = self.connectionDir.values()
+        self.hIndex = SpatialIndex()
+        self.vIndex = SpatialIndex()
+        order = 0
+        for conn in self.connections:
+            item = (order, conn, None)
+            self.IndexBox(conn.icon.Box(), 0, item)
+            if conn.connectedIcon:
+                self.IndexBox(conn.connectedIcon.Box(), 0, item)
+            order += 1
+        for uop in self.flowsheet.chUODict.values():
+            self.IndexBox(uop.info[PFDINFO][BOUNDINGBOX], ConnectorSeparation, (order, None, uop))
+            order += 1
+
+        toRoute = []
+        newObstacles = []
+        if last:
+            newObstacles = self.Obstacles()
+            for box in last.obstacles:
+                newObstacles.pop(box, None)
+            newObstacles = newObstacles.keys()
+        order = 0
+        for conn in self.connections:
+            route = last and last.routes.get(conn.Key(), None)
+            if route and self.RouteIsClear(route, newObstacles):
+                conn.SetRoute(*route)
+                self.IndexSegments(conn, order)
+            else:
+                toRoute.append((order, conn))
+            order += 1
+
+        for order, conn in toRoute:
             conn.Route(self)
+            self.IndexSegments(conn, order)
             
+    def IndexBox(self, box, margin, item):
+        """
+        add item to the indexes for the box (left, top, right, bottom) plus margin
+        """
+        (left, top, right, bottom) = box
+        self.hIndex.Add(top - margin, bottom + margin, item)
+        self.vIndex.Add(left - margin, right + margin, item)
+
+    def IndexSegments(self, conn, order):
+        """
+        add the segments of a routed connection to the indexes
+        """
+        item = (order, conn, None)
+        for segment in conn.horizontalSegments:
+            self.hIndex.Add(segment.TopBound() - ConnectorSeparation,
+                            segment.BottomBound() + ConnectorSeparation, item)
+        for segment in conn.verticalSegments:
+            self.vIndex.Add(segment.LeftBound() - ConnectorSeparation,
+                            segment.RightBound() + ConnectorSeparation, item)
+
+    def Obstacles(self):
+        """
+        dictionary with the boxes of the unit ops and connection icons
+        """
+        obstacles = {}
+        for uop in self.flowsheet.chUODict.values():
+            obstacles[uop.info[PFDINFO][BOUNDINGBOX]] = 1
         for conn in self.connectionDir.values():
-            conn.DrawVertical(self.canvas)
-            
-        for conn in self.connectionDir.values():
-            conn.DrawHorizontal(self.canvas)
-            
+            obstacles[conn.icon.Box()] = 1
+            if conn.connectedIcon:
+                obstacles[conn.connectedIcon.Box()] = 1
+        return obstacles
+
+    def RouteIsClear(self, route, obstacles):
+        """
+        true if the segments of route stay in the image and away from obstacles
+        """
+        sep = ConnectorSeparation
+        for segments in route:
+            for segment in segments:
+                left, top = segment.LeftBound(), segment.TopBound()
+                right, bottom = segment.RightBound(), segment.BottomBound()
+                if left < 0 or top < 0 or right > self.rightBound or bottom > self.bottomBound:
+                    return False
+                for (oLeft, oTop, oRight, oBottom) in obstacles:
+                    if left <= oRight + sep and right >= oLeft - sep and \
+                       top <= oBottom + sep and bottom >= oTop - sep:
+                        return False
+        return True
+
     def Position(self):
         uops = self.flowsheet.chUODict.values()
         uops.sort(lambda a, b:cmp(a.creationTime, b.creationTime))
@@ -752,23 +941,21 @@ class SimbaPFD(object):
         """
         set limits of segment so it doesn't conflict with anything
         """
-        for conn in self.connectionDir.values():
-            conn.HorizontalLineLimits(trialSegment)
-            
-        uops = self.flowsheet.chUODict.values()
-        for uop in uops:
-            trialSegment.UopLineLimits(uop)
+        for order, conn, uop in self.hIndex.Query(trialSegment.ptOrigin[1]):
+            if conn:
+                conn.HorizontalLineLimits(trialSegment)
+            else:
+                trialSegment.UopLineLimits(uop)
             
     def VerticalLineLimits(self, trialSegment):
         """
         set limits of segment so it doesn't conflict with anything
         """
-        for conn in self.connectionDir.values():
-            conn.VerticalLineLimits(trialSegment)
-            
-        uops = self.flowsheet.chUODict.values()
-        for uop in uops:
-            trialSegment.UopLineLimits(uop)
+        for order, conn, uop in self.vIndex.Query(trialSegment.ptOrigin[0]):
+            if conn:
+                conn.VerticalLineLimits(trialSegment)
+            else:
+                trialSegment.UopLineLimits(uop)
             
     def DrawUops(self):
         """
@@ -784,8 +971,8 @@ class SimbaPFD(object):
             uopTypeName = str(type(uop)).split('.')[-1][:-2]
             method = self.uopDrawMethods.get(uopTypeName, SimbaPFD.DrawGenericOp)
             method(self, uop)
-            print '<area shape="RECT" COORDS="%d,%d,%d,%d"' % uop.info[PFDINFO][BOUNDINGBOX]
-            print '''href="javascript:DisplayUop('%s');">''' % uop.GetPath()
+            self.areas.append('<area shape="RECT" COORDS="%d,%d,%d,%d"\n' % uop.info[PFDINFO][BOUNDINGBOX] +
+                              '''href="javascript:DisplayUop('%s');">''' % uop.GetPath())
    
     def AddConnection(self, position, direction, port):
         """
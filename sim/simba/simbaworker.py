@@ -0,0 +1,209 @@
+"""
+Session worker processes for simba
+
+Classes:
+SessionWorker -- A process hosting one session, driven over a pipe
+WorkerPool -- Hands out workers, keeping a few spare ones started ahead
+
+Remarks:
+A worker imports simba itself and serves the requests of its session with
+a WorkerHandler, sending back everything the handler wrote. The messages
+are tuples:
+('open', user, id, caseName) -- host a session, recalling caseName if given
+('request', routine, argvAppend, env, body) -- (output, alive, shutdown)
+('hibernate', caseName) -- store the case in caseName and drop the session,
+    false if a command is running and nothing was done
+('close',) -- drop the session and end the process
+"""
+
+import os, sys, threading, traceback
+import multiprocessing
+
+
+class WorkerError(Exception):
+    """the worker process failed or went away"""
+    pass
+
+
+def WorkerMain(conn, configDir, runPath, localOnly):
+    """
+    loop of a worker process
+    """
+    # simba reads simba.conf from the current directory when imported
+    os.chdir(configDir)
+    from sim.simba import simba
+
+    # a forked worker still has the stream of the request that started it
+    simba.outputStreams.Release()
+    simba.outputStreams.Install()
+    server = simba.WorkerServer(localOnly, runPath)
+
+    while 1:
+        try:
+            msg = conn.recv()
+        except (EOFError, IOError):
+            break
+        kind = msg[0]
+        try:
+            if kind == 'open':
+                server.OpenSession(*msg[1:])
+                reply = None
+            elif kind == 'request':
+                reply = server.HandleRequest(*msg[1:])
+            elif kind == 'hibernate':
+                reply = server.HibernateSession(*msg[1:])
+            elif kind == 'close':
+                server.ShutDown()
+                conn.send(('ok', None))
+                break
+            else:
+                raise WorkerError('unknown message %s' % kind)
+            conn.send(('ok', reply))
+        except Exception:
+            conn.send(('error', ''.join(traceback.format_exception(*sys.exc_info()))))
+    conn.close()
+
+
+class SessionWorker(object):
+    """
+    parent side of a worker process
+    """
+    def __init__(self, configDir, runPath, localOnly):
+        self.conn, child = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=WorkerMain,
+                                               args=(child, configDir, runPath, localOnly))
+        self.process.daemon = True
+        self.process.start()
+        child.close()
+        self.lock = threading.Lock()
+
+    def Call(self, *msg):
+        """send msg and wait for the reply"""
+        self.lock.acquire()
+        try:
+            try:
+                self.conn.send(msg)
+                status, reply = self.conn.recv()
+            except (EOFError, IOError):
+                raise WorkerError('worker process %s ended' % self.process.pid)
+        finally:
+            self.lock.release()
+        if status == 'error':
+            raise WorkerError(reply)
+        return reply
+
+    def IsAlive(self):
+        return self.process.is_alive()
+
+    def Close(self):
+        """end the process, politely if it still answers"""
+        try:
+            if self.IsAlive():
+                self.Call('close')
+            self.process.join(5.0)
+        except WorkerError:
+            pass
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+
+
+class WorkerPool(object):
+    """
+    source of worker processes - nuSpare of them are started ahead so a
+    new session does not wait for the interpreter and the imports
+    """
+    def __init__(self, configDir, runPath, localOnly, nuSpare=1):
+        self.configDir = configDir
+        self.runPath = runPath
+        self.localOnly = localOnly
+        self.nuSpare = nuSpare
+        self.spare = []
+        self.lock = threading.Lock()
+        self.Replenish()
+
+    def NewWorker(self):
+        return SessionWorker(self.configDir, self.runPath, self.localOnly)
+
+    def Replenish(self):
+        self.lock.acquire()
+        try:
+            while len(self.spare) < self.nuSpare:
+                self.spare.append(self.NewWorker())
+        finally:
+            self.lock.release()
+
+    def Lease(self):
+        """a worker of its own for a session"""
+        worker = None
+        self.lock.acquire()
+        try:
+            while self.spare and worker is None:
+                worker = self.spare.pop(0)
+                if not worker.IsAlive():
+                    worker = None
+        finally:
+            self.lock.release()
+        if worker is None:
+            worker = self.NewWorker()
+        self.Replenish()
+        return worker
+
+    def Close(self):
+        self.lock.acquire()
+        try:
+            spare, self.spare = self.spare, []
+        finally:
+            self.lock.release()
+        for worker in spare:
+            worker.Close()
+
+
+def SelfTest(configDir, runPath):
+    """
+    check a worker end to end: request, hibernate, wake up and the busy
+    case, where hibernation must give up instead of waiting
+    """
+    os.chdir(configDir)
+    from sim.simba import simba
+    from sim.simba.sim42user import Sim42User
+    user = Sim42User('test', 'test', simba.CAN_UPLOAD)
+    caseName = simba.hibernateName % 1
+    env = {'REQUEST_METHOD': 'GET', 'QUERY_STRING': 'cmd=units%20SI'}
+
+    pool = WorkerPool(configDir, runPath, 1, 0)
+    worker = pool.Lease()
+    try:
+        worker.Call('open', user, 1, None)
+        output, alive, shutdown = worker.Call('request', 'docmd', None, env, '')
+        assert output and alive and not shutdown
+        assert worker.Call('hibernate', caseName)
+        worker.Call('open', user, 1, caseName)
+        output, alive, shutdown = worker.Call('request', 'docmd', None, env, '')
+        assert alive
+    finally:
+        worker.Close()
+
+    # a command holding the session in the worker
+    server = simba.WorkerServer(1, runPath)
+    server.OpenSession(user, 2)
+    session = server.hostedSession
+    session.cmdLock.acquire()
+    try:
+        assert not server.HibernateSession(caseName)
+        assert server.hostedSession is session
+    finally:
+        session.cmdLock.release()
+    assert server.HibernateSession(caseName)
+    server.OpenSession(user, 2, caseName)
+    assert not os.path.exists(caseName)
+    print 'simbaworker ok'
+
+
+if __name__ == '__main__':
+    # python simbaworker.py [directory with simba.conf]
+    if len(sys.argv) > 1:
+        configDir = os.path.abspath(sys.argv[1])
+    else:
+        configDir = os.getcwd()
+    SelfTest(configDir, configDir)
@@ -0,0 +1,46 @@
+"""Work counters of the solver and the thermo admin
+
+Functions:
+Count -- Add to a counter
+GetCounts -- Copy of all the counters
+ResetCounts -- Set all the counters back to zero
+
+Remarks:
+The counters are plain module globals, cheap enough to be always on, and
+count the work done in this process since the last ResetCounts. They are
+meant for benchmarks (see sim.cmd.Benchmark), not for the solver itself.
+ForgetOps are the ops taken off the forget stack and ForgetSolves the ones
+of them that had to be solved in forget mode.
+NonSuppFlashes are the flashes not supported by the thermo that were solved by
+iterating on supported ones (UnitOperations.CalculateNonSupportedFlash),
+NonSuppFailures the ones of them that did not converge and NonSuppIterations
+their secant and Brent steps. Their flashes also count as ThermoCalls.
+"""
+
+OP_SOLVES = 'OpSolves'
+FORGET_OPS = 'ForgetOps'
+FORGET_SOLVES = 'ForgetSolves'
+RECYCLE_ITERATIONS = 'RecycleIterations'
+THERMO_CALLS = 'ThermoCalls'
+FLASHES = 'Flashes'
+NONSUPP_FLASHES = 'NonSuppFlashes'
+NONSUPP_FAILURES = 'NonSuppFailures'
+NONSUPP_ITERATIONS = 'NonSuppIterations'
+
+ALL_COUNTERS = (OP_SOLVES, FORGET_OPS, FORGET_SOLVES, RECYCLE_ITERATIONS, THERMO_CALLS, FLASHES,
+                NONSUPP_FLASHES, NONSUPP_FAILURES, NONSUPP_ITERATIONS)
+
+_counts = {}
+
+
+def ResetCounts():
+    for name in ALL_COUNTERS:
+        _counts[name] = 0
+
+def Count(name, n=1):
+    _counts[name] = _counts.get(name, 0) + n
+
+def GetCounts():
+    return dict(_counts)
+
+ResetCounts()
@@ -78,6 +78,8 @@ class NumericMethodSettings(object):
         
 class EquationBasedOp(UnitOperations.UnitOperation):
     """Base class of a unit operation that solves equations simulataneously"""
+    dontClone = ("_numMethodSetings",)
+
     def __init__(self, initScript=None):
         super(EquationBasedOp, self).__init__(initScript)
 
@@ -310,17 +312,6 @@ class EquationBasedOp(UnitOperations.UnitOperation):
                 self.parameters[FREQ_JAC_MSG_PAR] = 10
                 self._numMethodSetings.freqJacMsg = 10  #value
                 
-    def _RemoveFromCloneList(self, clone, attrNamesToClone):
-        """Default attributes that should not be cloned"""
-        attrNamesToClone = super(EquationBasedOp, self)._RemoveFromCloneList(clone, attrNamesToClone)
-        
-        dontClone = ["_numMethodSetings"]
-        
-        for name in dontClone:
-            if name in attrNamesToClone:
-                attrNamesToClone.remove(name)
-        
-        return attrNamesToClone
 
 def SolveNonLinearEquations(parent, u, numMethSettings, lastConvX, lastX, lastJac, lastConvJac=None):
 
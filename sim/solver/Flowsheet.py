@@ -9,16 +9,21 @@ Flowsheet -- Class for the flowsheet. Inherits from UnitOperation
 #Anything in CVS should always have it as False
 REPORT_TIME = False
 
+#Forget passes skip the ops with nothing changed at their ports since they
+#solved, instead of solving them in forget mode (see UnitOperation.NothingToForget)
+SCOPED_FORGET = True
+
 
 import time
 from rexec import RExec
 from sim.unitop import UnitOperations
 from sim.unitop import Controller
 from sim.thermo.ThermoAdmin import ThermoCase
-from Messages import MessageHandler
+from Messages import MessageHandler, LazyArgs
 
 import Ports
 import Error
+import Counters
 from Variables import *
 
 import numpy
@@ -38,16 +43,102 @@ RECYCLE_DETAILS_VAR = 'RecycleDetails'
 rootPathName = ''  # used for storing and recalling non python things
 
 
+class OpStack(list):
+    """
+    Solver stack of unit operations. A list that counts its ops, so checking
+    whether an op is on it does not scan the list. The counts are not
+    stored, they are built again when first needed
+    """
+    def __getstate__(self):
+        return {}
+
+    def _Counts(self):
+        counts = self.__dict__.get('_counts', None)
+        if counts is None:
+            counts = {}
+            for op in self:
+                counts[op] = counts.get(op, 0) + 1
+            self._counts = counts
+        return counts
+
+    def _Uncount(self, counts, op):
+        n = counts[op] - 1
+        if n:
+            counts[op] = n
+        else:
+            del counts[op]
+
+    def __contains__(self, op):
+        return self._Counts().has_key(op)
+
+    def append(self, op):
+        counts = self._Counts()
+        list.append(self, op)
+        counts[op] = counts.get(op, 0) + 1
+
+    def extend(self, ops):
+        for op in ops:
+            self.append(op)
+
+    def pop(self, i=-1):
+        counts = self._Counts()
+        op = list.pop(self, i)
+        self._Uncount(counts, op)
+        return op
+
+    def remove(self, op):
+        counts = self._Counts()
+        list.remove(self, op)
+        self._Uncount(counts, op)
+
+    def _Changed(self):
+        self._counts = None
+
+    def __delitem__(self, i):
+        list.__delitem__(self, i)
+        self._Changed()
+
+    def __setitem__(self, i, op):
+        list.__setitem__(self, i, op)
+        self._Changed()
+
+    def __delslice__(self, i, j):
+        list.__delslice__(self, i, j)
+        self._Changed()
+
+    def __setslice__(self, i, j, ops):
+        list.__setslice__(self, i, j, ops)
+        self._Changed()
+
+    def __iadd__(self, ops):
+        self.extend(ops)
+        return self
+
+    def insert(self, i, op):
+        list.insert(self, i, op)
+        self._Changed()
+
+
+def RecycleDetailArgs(prop, value, currentValue):
+    """arguments of the recycle detail messages of prop"""
+    return (prop.GetParent().GetParent().GetPath(), prop.GetType().name, value, currentValue)
+
+
 class Flowsheet(UnitOperations.UnitOperation):
     """Class for the flowsheet. Inherits from UnitOperation"""
+    dontClone = ("_solveStack", "_forgetStack", "_resetNewCalcStack", "_resetNewFixedStack",
+                 "_iterationStack", "_consistencyErrorStack", "_controllerSolver",
+                 "_isForgetting", "_isSolving", "hold", "lastUnconvRecycles",
+                 "lastConsistErrrors")
+
     def __init__(self, initScript = None):
         """Sets up stacks etc"""
         self.version = VERSION
         super(Flowsheet, self).__init__(initScript)
         
         # set up stacks and more stacks for solver
-        self._solveStack = []
-        self._forgetStack = []
+        self._solveStack = OpStack()
+        self._forgetStack = OpStack()
         self._resetNewCalcStack = []
         self._resetNewFixedStack = []
         self._iterationStack = []
@@ -56,6 +147,7 @@ class Flowsheet(UnitOperations.UnitOperation):
         
         self._isForgetting = 0
         self._isSolving = 0
+        self._solverContext.solver = self
         self.hold = 0
         
         #Some objects so the flowsheet still knows what was unconverged or with inconsistencies
@@ -82,8 +174,8 @@ class Flowsheet(UnitOperations.UnitOperation):
                 self._controllerSolver.CleanUp()
                 self._controllerSolver = None
                 
-            self._solveStack = []
-            self._forgetStack = []
+            self._solveStack = OpStack()
+            self._forgetStack = OpStack()
             self._resetNewCalcStack = []
             self._resetNewFixedStack = []
             self._iterationStack = []
@@ -134,13 +226,12 @@ class Flowsheet(UnitOperations.UnitOperation):
             self.parentUO.RemoveOpFromSolveStack(op)
             
         if op in self._solveStack:
-            i = self._solveStack.index(op)
-            del self._solveStack[i]
+            self._solveStack.remove(op)
             op.DelStackStatus(ON_SOLVE_STACK)
             
     def PushForgetOp(self, op):
         if self.parentUO:
-            self.parentUO.Solver().PushForgetOp(op)
+            self.RootSolver().PushForgetOp(op)
             return
         
         if not (op.IsOnStack(ON_FORGET_STACK) or op.IsPushBlocked()):
@@ -164,13 +255,12 @@ class Flowsheet(UnitOperations.UnitOperation):
             self.parentUO.RemoveOpFromForgetStack(op)
             
         if op in self._forgetStack:
-            i = self._forgetStack.index(op)
-            del self._forgetStack[i]
+            self._forgetStack.remove(op)
             op.DelStackStatus(ON_FORGET_STACK)
             
     def PushResetCalcPort(self, port):
         if self.parentUO:
-            self.parentUO.Solver().PushResetCalcPort(port)
+            self.RootSolver().PushResetCalcPort(port)
             return
         
         if not port.IsOnStack(ON_RESET_CALC_STACK):
@@ -179,7 +269,7 @@ class Flowsheet(UnitOperations.UnitOperation):
 
     def PopResetCalcPort(self):
         if self.parentUO:
-            return self.parentUO.Solver().PopResetCalcPort()
+            return self.RootSolver().PopResetCalcPort()
         
         if len(self._resetNewCalcStack):
             port = self._resetNewCalcStack.pop()
@@ -190,7 +280,7 @@ class Flowsheet(UnitOperations.UnitOperation):
 
     def PushResetFixedPort(self, port):
         if self.parentUO:
-            self.parentUO.Solver().PushResetFixedPort(port)
+            self.RootSolver().PushResetFixedPort(port)
             return
 
         if not port.IsOnStack(ON_RESET_FIXED_STACK):
@@ -199,7 +289,7 @@ class Flowsheet(UnitOperations.UnitOperation):
 
     def PopResetFixedPort(self):
         if self.parentUO:
-            return self.parentUO.Solver().PopResetFixedPort()
+            return self.RootSolver().PopResetFixedPort()
         
         if len(self._resetNewFixedStack):
             port = self._resetNewFixedStack.pop()
@@ -268,7 +358,7 @@ class Flowsheet(UnitOperations.UnitOperation):
         if self.parentUO:
             self.parentUO.Solver().SolverForget()
         
-        self._isForgetting = 1
+        self.SetForgetting(1)
         PopForgetOp = self.PopForgetOp
         PopResetCalcPort = self.PopResetCalcPort
         PopResetFixedPort = self.PopResetFixedPort
@@ -279,20 +369,24 @@ class Flowsheet(UnitOperations.UnitOperation):
                 if not op is self:
                     op.BlockPush(1)
                     try:
-                        try:
-                            #self.InfoMessage('ForgettingOp', op.GetPath())
-                            if op.GetParameterValue(IGNORED_PAR) == None:
-                                op.Solve()
-                        except (ArithmeticError, 
-                                Error.SimError,
-                                Error.CallBackException), e:
-                            pass  # skip these errors when forgetting - may not be necessary
-                        
-                        for port in op.GetPorts():
-                            if port.GetParentOp() == op:
-                                port.UpdateConnection()
-            
-                        op.Forget()
+                        Counters.Count(Counters.FORGET_OPS)
+                        if not (SCOPED_FORGET and op.NothingToForget()):
+                            Counters.Count(Counters.FORGET_SOLVES)
+                            try:
+                                #self.InfoMessage('ForgettingOp', op.GetPath())
+                                if op.GetParameterValue(IGNORED_PAR) == None:
+                                    op.Solve()
+                            except (ArithmeticError, 
+                                    Error.SimError,
+                                    Error.CallBackException), e:
+                                pass  # skip these errors when forgetting - may not be necessary
+                            
+                            for port in op.GetPorts():
+                                if port.GetParentOp() == op:
+                                    port.UpdateConnection()
+                
+                            op.Forget()
+                            Ports.MarkChanged(op)
                         
                         #port = self.PopResetCalcPort()
                         port = PopResetCalcPort()
@@ -312,31 +406,33 @@ class Flowsheet(UnitOperations.UnitOperation):
                 #port = self.PopResetFixedPort()
                 port = PopResetFixedPort()
         finally:
-            self._isForgetting = 0
+            self.SetForgetting(0)
      
-    def IsForgetting(self):
-        if self.parentUO:
-            return self.parentUO.Solver().IsForgetting()
-        return self._isForgetting
+    def ForgetsBySolving(self):
+        """Only solving a flowsheet tells what its ops have to forget"""
+        return 1
+    
+    def SetForgetting(self, isForgetting):
+        """the root flowsheet shares its flag with the whole tree"""
+        self._isForgetting = isForgetting
+        if not self.parentUO:
+            self.SolverContext().isForgetting = isForgetting
+
+    def SetSolving(self, isSolving):
+        """the root flowsheet shares its flag with the whole tree"""
+        self._isSolving = isSolving
+        if not self.parentUO:
+            self.SolverContext().isSolving = isSolving
     
     def ForgetAllCalculations(self):
         self.lastConsistErrrors.CleanUp()
         self.lastUnconvRecycles.CleanUp()
         super(Flowsheet, self).ForgetAllCalculations()
     
-    def IsSolving(self):
-        """Indicate if it is solving, given that it is not forgetting"""
-        if self.parentUO:
-            return self.parentUO.Solver().IsSolving()
-        
-        if not self._isForgetting:
-            return self._isSolving
-        return 0
-    
     def Solve(self):
         """Solve this flowsheet"""
         
-        self._isSolving = 1
+        self.SetSolving(1)
         path = self.GetPath()
         if REPORT_TIME:
             self.InfoMessage('InitSolveTime', (time.asctime(), time.time()))
@@ -345,7 +441,7 @@ class Flowsheet(UnitOperations.UnitOperation):
             self.InnerSolve()
             if self.hold:
                 self.unitOpMessage = ('On Hold',)
-                self._isSolving = 0
+                self.SetSolving(0)
                 return 1
             
             if self._controllerSolver:
@@ -357,7 +453,7 @@ class Flowsheet(UnitOperations.UnitOperation):
             if not self.IsForgetting():
                 self.InfoMessage('DoneSolving',self.name)
         finally:
-            self._isSolving = 0
+            self.SetSolving(0)
         if REPORT_TIME:
             self.InfoMessage('InitSolveTime', (time.asctime(), time.time()))
             
@@ -406,17 +502,21 @@ class Flowsheet(UnitOperations.UnitOperation):
                     if not op is self and op.GetParameterValue(IGNORED_PAR) == None:
                         op.BlockPush(1)
                         try:
-                            InfoMessage('SolvingOp', op.GetPath())
+                            InfoMessage('SolvingOp', LazyArgs(op.GetPath))
                             op.unitOpMessage = ('',)
+                            Counters.Count(Counters.OP_SOLVES)
                             op.Solve()
                             for port in op.GetPorts():
                                 port.UpdateConnection()
+                            if SCOPED_FORGET:
+                                op.RecordDependencies()
                             for obj in op.associatedObjs:
                                 obj.NotifySolved(op)
                             for obj in op.designObjects.values():
                                 obj.NotifyUnitOpSolved()
                         finally:
                             op.BlockPush(0)
+                            Ports.MarkChanged(op)
                             
                             #Remove the unit op if it got attempted to solve
                             if uncRecyclesDict and uncRecyclesDict.has_key(op):
@@ -441,8 +541,7 @@ class Flowsheet(UnitOperations.UnitOperation):
             for i in range(nIterationValues):
                 prop = self._iterationStack[i]
                 if prop._myPort and recycDetails:
-                    InfoMessage('RecycleErrorDetail',(prop.GetParent().GetParent().GetPath(),
-                                      prop.GetType().name, prop._newIterationValue, prop._value))
+                    InfoMessage('RecycleErrorDetail', LazyArgs(RecycleDetailArgs, prop, prop._newIterationValue, prop._value))
                 err = prop.CalculateError(prop._newIterationValue)
                 if maxError < err:
                     maxError = err
@@ -450,14 +549,14 @@ class Flowsheet(UnitOperations.UnitOperation):
                 
             for prop in self._consistencyErrorStack:
                 if prop._myPort and recycDetails:
-                    InfoMessage('RecycleConsistency' ,(prop.GetParent().GetParent().GetPath(),
-                                     prop.GetType().name, prop._consistencyError, prop._value))
+                    InfoMessage('RecycleConsistency', LazyArgs(RecycleDetailArgs, prop, prop._consistencyError, prop._value))
                 err = prop.CalculateError(prop._consistencyError)
                 if maxError < err:
                     maxError = err
                     maxErrProp = prop.GetPath()
             
             InfoMessage('RecycleIter', (iter, maxError, maxErrProp))
+            Counters.Count(Counters.RECYCLE_ITERATIONS)
             
             
             if maxError < tolerance and len(self._consistencyErrorStack) == 0:
@@ -548,13 +647,13 @@ class Flowsheet(UnitOperations.UnitOperation):
                 self.InfoMessage('UnresolvedRecycles', (path, str(self.lastUnconvRecycles)))
             
         if iter >= maxIter:
-            self._isSolving = 0
+            self.SetSolving(0)
             raise Error.SimError("MaxSolverIterExceeded", (maxIter, path))
         
         
         if len(self._consistencyErrorStack):
             # just raise first error
-            self._isSolving = 0
+            self.SetSolving(0)
             try:
                 for prop in self._consistencyErrorStack:
                     port = prop.GetParent()
@@ -712,19 +811,6 @@ class Flowsheet(UnitOperations.UnitOperation):
         return super(Flowsheet, self).Clone()
     
     
-    def _RemoveFromCloneList(self, clone, attrNamesToClone):
-        """Default attributes that should not be cloned"""
-        attrNamesToClone = super(Flowsheet, self)._RemoveFromCloneList(clone, attrNamesToClone)
-        
-        dontClone = ["_solveStack", "_forgetStack", "_resetNewCalcStack", "_resetNewFixedStack", "_iterationStack",
-                     "_consistencyErrorStack", "_controllerSolver", "_isForgetting", "_isSolving",
-                     "hold", "lastUnconvRecycles", "lastConsistErrrors"]
-        
-        for name in dontClone:
-            if name in attrNamesToClone:
-                attrNamesToClone.remove(name)
-        
-        return attrNamesToClone
             
 class SubFlowsheet(UnitOperations.UnitOperation):
     """
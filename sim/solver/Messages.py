@@ -1,5 +1,68 @@
 import sim.solver.languages
 import imp, sys, re
+from collections import deque
+
+#Levels of the messages, only the ones at or above the level shown get to the callbacks
+DETAIL_LEVEL = 0
+INFO_LEVEL = 1
+ERROR_LEVEL = 2
+
+#Routine messages of every solver pass
+DETAIL_MESSAGES = ('SolvingOp', 'RecycleIter', 'RecycleErrorDetail', 'RecycleConsistency')
+
+#Messages kept by a MessageBuffer
+MAX_BUFFERED_MESSAGES = 1000
+
+
+class LazyArgs(object):
+    """
+    Message arguments computed only if the message is rendered,
+    func(*args) must return the actual arguments
+    """
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def Resolve(self):
+        return self.func(*self.args)
+
+def ResolveArgs(args):
+    """the actual arguments of a message"""
+    if isinstance(args, LazyArgs):
+        return args.Resolve()
+    return args
+
+
+class MessageBuffer(object):
+    """
+    Ring buffer with the last size messages as (seq, message, args, msgType)
+    records. They are rendered only when asked for. dropped counts the
+    records pushed out of the buffer since the last Clear
+    """
+    def __init__(self, size=MAX_BUFFERED_MESSAGES):
+        self.records = deque(maxlen=size)
+        self.seq = 0
+        self.dropped = 0
+
+    def Add(self, message, args, msgType):
+        """keep a message, its arguments are resolved now as the objects can change"""
+        if len(self.records) == self.records.maxlen:
+            self.dropped += 1
+        self.seq += 1
+        self.records.append((self.seq, message, ResolveArgs(args), msgType))
+
+    def Render(self, count=None, dictionary=None):
+        """the last count messages (all if None) as text lines"""
+        records = list(self.records)
+        if count != None:
+            records = records[-count:]
+        render = MessageHandler.RenderMessage
+        return [render(message, args, dictionary) for seq, message, args, msgType in records]
+
+    def Clear(self):
+        self.records.clear()
+        self.dropped = 0
+
 
 class Messages:
     """
@@ -11,6 +74,11 @@ class Messages:
         """
         self.messageModules = []
         self.ignored = {}
+        self.levels = {}
+        for msg in DETAIL_MESSAGES:
+            self.levels[msg] = DETAIL_LEVEL
+        self.levelShown = DETAIL_LEVEL
+        self.suppressed = {}
         self.languages = {}
         self.LoadMessageModule(sim.solver.languages, self.languages)
         self.SetCurrentLanguage(language)
@@ -69,11 +137,49 @@ class Messages:
 
     def IsIgnored(self, msg):
         return msg in self.ignored
+
+    def SetMessageLevel(self, msg, level):
+        """level of the msg key, by default INFO_LEVEL or ERROR_LEVEL by message type"""
+        self.levels[msg] = level
+
+    def SetLevelShown(self, level):
+        """messages under level are suppressed"""
+        self.levelShown = level
+
+    def GetLevelShown(self):
+        return self.levelShown
+
+    def IsShown(self, msg, msgType=None):
+        """True if msg is neither ignored nor under the level shown"""
+        return not msg in self.ignored and not self.IsUnderLevel(msg, msgType)
+
+    def IsUnderLevel(self, msg, msgType=None):
+        """True if the level of msg is under the level shown"""
+        if self.levelShown == DETAIL_LEVEL:
+            return 0
+        level = self.levels.get(msg, None)
+        if level == None:
+            if msgType == self.errorMessage:
+                level = ERROR_LEVEL
+            else:
+                level = INFO_LEVEL
+        return level < self.levelShown
+
+    def CountSuppressed(self, msg):
+        self.suppressed[msg] = self.suppressed.get(msg, 0) + 1
+
+    def GetSuppressedCounts(self):
+        """dictionary with the number of suppressed messages by key"""
+        return dict(self.suppressed)
+
+    def ResetSuppressedCounts(self):
+        self.suppressed = {}
     
     def RenderMessage(self, msg, args=None, dictionary=None):
         """
         render the message using the appropriate dictionary
         """
+        args = ResolveArgs(args)
         try:
             if dictionary:
                 d = dictionary
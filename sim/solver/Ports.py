@@ -1,6 +1,7 @@
 """Class definitions for the ports used by uos in the simulator
 
 Classes:
+ObjectDict -- Dict of named objects that knows the name of every object
 PortDict -- Dict of ports
 Port -- Base class for a port
 Port_Material -- Material port. Inherits from Port
@@ -12,7 +13,7 @@ Port_Signal -- Signal port. Inherits from Port
 from Variables import *
 import S42Glob
 from Error import SimError
-import re, string
+import re, string, weakref, itertools
 import numpy
 from numpy.oldnumeric import array, Float, Int, zeros, ones
 
@@ -27,22 +28,133 @@ FIXALL_STATE = 0
 ESTIMATEALL_STATE = 1
 NONE_STATE = 2
 
-class PortDict(dict):
-    """Dictionary of ports. Inherits from dict
+#Stamp of the last change of every port and unit op. It lets an interface
+#keep what it showed of an object until the object changes. Kept out of the
+#objects so it never goes into a stored case
+_changeStamps = weakref.WeakKeyDictionary()
+_changeClock = itertools.count(1)
 
-    keys -- Name of the port
-    values -- Instance of Port
+def MarkChanged(obj):
+    """Record that obj (a port or a unit op) just changed"""
+    _changeStamps[obj] = _changeClock.next()
 
-    """    
+def GetChangeStamp(obj):
+    """Stamp of the last change of obj. 0 if it was not touched since it was recalled"""
+    return _changeStamps.get(obj, 0)
+
+#Stamp of the last change to the structure of any flowsheet, i.e. unit ops,
+#ports, compounds or port properties added, deleted, moved or renamed.
+#An object found by its path is still the one at that path while it stays
+_structureStamp = 0
+
+def MarkStructureChanged():
+    """Record that the structure of a flowsheet just changed"""
+    global _structureStamp
+    _structureStamp = _changeClock.next()
+
+def GetStructureStamp():
+    """Stamp of the last change to the structure of any flowsheet"""
+    return _structureStamp
+
+class ObjectDict(dict):
+    """Dictionary of named objects. Inherits from dict
+
+    keys -- Name of the object
+    values -- Objects, each one only once
+
+    It keeps an index from every object to its name, so finding an object
+    or its name does not scan the values. The index is not stored, it is
+    built again when first needed
+    """
     def __init__(self):
-        """Init an empty dictionary"""          
+        """Init an empty dictionary"""
         dict.__init__(self)
+        self._names = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if state.has_key('_names'):
+            del state['_names']
+        return state
+
+    def _Names(self):
+        names = self.__dict__.get('_names', None)
+        if names is None:
+            names = {}
+            for key, item in self.iteritems():
+                names[item] = key
+            self._names = names
+        return names
 
+    def __setitem__(self, key, item):
+        """No repetitions of values"""
+        names = self._Names()
+        if names.has_key(item): return
+        old = self.get(key, None)
+        if old is not None:
+            del names[old]
+        dict.__setitem__(self, key, item)
+        names[item] = key
+        MarkStructureChanged()
+
+    def __delitem__(self, key):
+        names = self._Names()
+        item = self[key]
+        dict.__delitem__(self, key)
+        del names[item]
+        MarkStructureChanged()
+
+    def pop(self, key, *default):
+        names = self._Names()
+        if not self.has_key(key):
+            return dict.pop(self, key, *default)
+        item = dict.pop(self, key)
+        del names[item]
+        MarkStructureChanged()
+        return item
+
+    def popitem(self):
+        names = self._Names()
+        key, item = dict.popitem(self)
+        del names[item]
+        MarkStructureChanged()
+        return key, item
+
+    def setdefault(self, key, item=None):
+        if not self.has_key(key):
+            self[key] = item
+        return self.get(key, None)
+
+    def update(self, other=(), **kw):
+        if hasattr(other, 'keys'):
+            other = [(key, other[key]) for key in other.keys()]
+        for key, item in list(other) + kw.items():
+            self[key] = item
+
+    def clear(self):
+        dict.clear(self)
+        self._names = {}
+        MarkStructureChanged()
+
+    def KeyOf(self, item):
+        """name of item, None if it is not in the dictionary"""
+        return self._Names().get(item, None)
+
+    def HasItem(self, item):
+        return self._Names().has_key(item)
+
+
+class PortDict(ObjectDict):
+    """Dictionary of ports. Inherits from ObjectDict
+
+    keys -- Name of the port
+    values -- Instance of Port
+
+    """    
     def __setitem__(self, key, item):
         """Only ports, no repetitions of values"""
         if not isinstance(item, Port): return
-        if item in self.values(): return
-        dict.__setitem__(self, key, item)
+        ObjectDict.__setitem__(self, key, item)
 
 class Port(object):
     """Base class for specific ports"""
@@ -67,6 +179,7 @@ class Port(object):
         #Flag to see if all the specs into a port should be froced as estimates
         #self.forceEstimates = 0
         self.state = FIXALL_STATE
+        MarkChanged(self)
         
         
     def __getstate__(self):
@@ -99,9 +212,15 @@ class Port(object):
         propsClone = clone._properties
         for propName in props:
             prop = props[propName]
-            if propName in propsClone:
+            cloneProp = propsClone.get(propName, None)
+            if (type(prop) is BasicProperty and type(cloneProp) is BasicProperty and
+                prop._type is cloneProp._type):
+                #The clone already created it, just pass the value
+                prop.CloneInto(cloneProp)
+                continue
+            if cloneProp != None:
                 #Delete if already there. Clone through clone method !
-                propsClone[propName].CleanUp()
+                cloneProp.CleanUp()
                 del propsClone[propName]
                 
             #Cloning of properties do not assign parents
@@ -169,10 +288,14 @@ the method 'DeleteObj'
     def GetPortType(self): return self._type
     def GetParentOp(self): return self._parentOp
     def GetParent(self): return self._parentOp   # preferred more generically named version of GetParentOp
-    def Rename(self, name): self._name = name
+    def Rename(self, name):
+        self._name = name
+        MarkChanged(self)
+        MarkStructureChanged()
     def SetState(self, state):
         """Sets the state of a port (all fixed, all estimated, etc)"""
         if self.state == state: return
+        MarkChanged(self)
         op = self.GetParent()
         if op: 
             op.InfoMessage('ChangedPortState', (op.ShortestPortPath(self), state))
@@ -199,6 +322,7 @@ the method 'DeleteObj'
         """
         called when any property contained by this port is modified.
         """
+        MarkChanged(self)
         if calcStatus & FIXED_V:
             self._parentOp.PushSolveOp(self._parentOp)
             self._parentOp.PushResetFixedPort(self)
@@ -242,6 +366,7 @@ the method 'DeleteObj'
         #let parent op know what is happening
         parentOp.MakingPortConnection(self, otherPort)
         self._connection = otherPort
+        MarkChanged(self)
         otherPort.ConnectTo(self, True)
         self.UpdateConnection()
                 
@@ -282,6 +407,7 @@ the method 'DeleteObj'
         parentOp.MakingPortConnection(self, None)
         
         self._connection = None
+        MarkChanged(self)
         #self.UpdateConnection()
         
         other.Disconnect(True)
@@ -505,6 +631,10 @@ the method 'DeleteObj'
     
     def GetProperties(self):
         return self._properties
+
+    def GetAllProperties(self):
+        """List of every property instance of the port"""
+        return self._properties.values()
     def GetProperty(self, propName):
         return self._properties.get(propName, None)  ## perhaps some error checking?
     
@@ -946,6 +1076,14 @@ class Port_Material(Port):
                 
         super(Port_Material, self).AllPropsAsNonEstimates()
                 
+    def GetAllProperties(self):
+        """List of every property instance of the port, compounds included"""
+        props = self._properties.values()
+        props.extend(self._compounds)
+        for prop in self._arrProperties.values():
+            props.extend(prop)
+        return props
+
     def GetCompounds(self):
         return self._compounds
     
@@ -1115,6 +1253,8 @@ class Port_Material(Port):
                 prop.append(BasicProperty(name, self))
                 
         self._flashResults = None
+        MarkChanged(self)
+        MarkStructureChanged()
     
         
     def MoveCompound(self, cmp1Idx, cmp2Idx):
@@ -1122,6 +1262,8 @@ class Port_Material(Port):
         self._compounds.MoveCompound(cmp1Idx, cmp2Idx)
         # to prevent inconsistency in composition
         self._flashResults = None
+        MarkChanged(self)
+        MarkStructureChanged()
 
     def DeleteCompound(self, cmpName):
         """Deletes a compound from the port"""
@@ -1136,6 +1278,8 @@ class Port_Material(Port):
         for prop in self._arrProperties.values():
             del prop[cmpNo]
         self._flashResults = None
+        MarkChanged(self)
+        MarkStructureChanged()
         
     def DeleteCompounds(self, nuDelCmps, startIdx):
         """Delete nuDelCmps starting at index startIdx"""
@@ -1145,6 +1289,8 @@ class Port_Material(Port):
         for prop in self._arrProperties.values():
             del prop[startIdx:startIdx+nuDelCmps]
         self._flashResults = None
+        MarkChanged(self)
+        MarkStructureChanged()
         
     def SetCompositionValues(self, vals, calcStatus):
         """Assumes vals is in the correct order
@@ -1390,11 +1536,11 @@ class Port_Material(Port):
             x[i] = frac
             #sum += frac
             
-        total = Numeric.sum(x)
+        total = numpy.sum(x)
         if not total: return None
         x = x/total
         
-        return Numeric.sum(x * cmpMwt)
+        return numpy.sum(x * cmpMwt)
     
     
         #for i in range(len(self._compounds)):
@@ -1923,6 +2069,8 @@ class Port_Signal(Port):
         self._prop = self._properties[varTypeName]# = BasicProperty(varTypeName, self)
         self._varType = varTypeName
         self._cmpName = cmpName
+        MarkChanged(self)
+        MarkStructureChanged()
         
         
         
@@ -1934,6 +2082,8 @@ class Port_Signal(Port):
         self._prop = None
         self._varType = None
         self._cmpName = None
+        MarkChanged(self)
+        MarkStructureChanged()
 
     def GetValue(self):
         """get the value from the signal property"""
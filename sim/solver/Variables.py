@@ -647,6 +647,15 @@ class BasicProperty(object):
             clone._calcStatus = self._calcStatus
             
         return clone
+    
+    def CloneInto(self, prop):
+        """Same as Clone but into prop, a new property of the same type"""
+        if self._calcStatus & FIXED_V:
+            prop._value = self._value
+            prop._calcStatus = self._calcStatus
+        else:
+            prop._value = None
+            prop._calcStatus = UNKNOWN_V
             
     def CleanUp(self):
         """
@@ -1163,7 +1172,9 @@ class CompoundList(list):
             return 0
         try:
             #If I can do this, then it is ready
-            values = array(self.GetValues(), Float)
+            values = self.GetValues()
+            if None in values: return 0
+            values = array(values, Float)
             return 1
         except:
             return 0
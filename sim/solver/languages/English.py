@@ -93,6 +93,7 @@ def Messages():
     m['InvalidComposition']     = "The %s composition = %f in %s.  It has been reset to zero."
     m['InvalidDrawPhase']       = "Invalid phase for draw on stage %d of %s"
     m['InvalidTowerSpecPhase']  = "Invalid phase in spec on stage %d of %s"
+    m['LLExNotConverged']       = "Simultaneous solution of the stages of %s did not converge in %d iterations - error = %f. Solving stage by stage"
     m['LumpLiqs']               = "A second liquid with fraction %f is detected in a two phase VL flash."
     m['MaxSolverIterExceeded']  = "Maximum %d iterations exceeded in solving flowsheet %s"
     m['MissingSpecs']           = "Missing %d specifications"
@@ -16,6 +16,11 @@ EXPERIMENT_DEN = 'DensityCurve'
 EXPERIMENT_PARAM = 'EXPERIMENT'
 EXPERIMENT_CHROMATOGRAPH = 'Chromatograph'
 
+# Keys of the assay data passed to and from the property packages
+ASSAY_PARAMETERS = 'Parameters'
+ASSAY_CURVES = 'Curves'
+ASSAY_LIGHTENDS = 'LightEnds'
+
 # Assay state
 AssayStateBuilding = 0
 AssayStateCut = 1
@@ -91,6 +96,22 @@ class OilExperiment(ATable):
         # set motifications
         self.GetSeries(0).Initialize(obj, 'X')
         self.GetSeries(1).Initialize(obj, self.exptType)
+
+    def GetPoints(self):
+        """(x, y) lists of the points with both values"""
+        x = self.GetSeries(0)
+        y = self.GetSeries(1)
+        xVals, yVals = [], []
+        if x and y and x.GetLen() == y.GetLen():
+            for xVal, yVal in zip(x.GetValues(), y.GetValues()):
+                if xVal != None and yVal != None:
+                    xVals.append(xVal)
+                    yVals.append(yVal)
+        return xVals, yVals
+
+    def SetPoints(self, x, y):
+        self.GetObject('Series0').SetValues(x)
+        self.GetObject('Series1').SetValues(y)
         
     def GetInputCurve(self):
         # returns the property package values
@@ -567,6 +588,46 @@ class Assay(BasicOilObject):
             raise SimError('ErrorValue', cmd + ' failed in Oils.py.') 
         return result
 
+    def GetAssayData(self):
+        """
+        inputs of the assay as plain data, {ASSAY_PARAMETERS: {name: value},
+        ASSAY_CURVES: {exptType: (x, y)}, ASSAY_LIGHTENDS: {name: fraction}}
+        """
+        params = {}
+        for key in self.parameters.keys():
+            value = self.parameters[key].GetValue()
+            if value and str(value) != '':
+                params[key] = value
+        curves = {}
+        for curve in (self.distCurve, self.MWCurve, self.denCurve, self.chromatograph):
+            if curve != None:
+                curves[curve.exptType] = curve.GetPoints()
+        lightEnds = {}
+        for key, param in self.lightEnds.lightEndDict.items():
+            value = param.GetValue()
+            if value > 0.0:
+                lightEnds[key] = value
+        return {ASSAY_PARAMETERS: params, ASSAY_CURVES: curves, ASSAY_LIGHTENDS: lightEnds}
+
+    def SetAssayData(self, data):
+        """add the parameters, light ends and curves in data (see GetAssayData)"""
+        params = data[ASSAY_PARAMETERS]
+        for parName in params.keys():
+            paramObj = OilParameter(GENERIC_VAR, params[parName])
+            paramObj.parentObj = self
+            paramObj.name = parName
+            self.parameters[parName] = paramObj
+        lightEnds = data[ASSAY_LIGHTENDS]
+        for name in lightEnds.keys():
+            if lightEnds[name] > 0.0:
+                self.lightEnds.AddObject(lightEnds[name], name)
+        curves = data[ASSAY_CURVES]
+        for exptType in (EXPERIMENT_DEN, EXPERIMENT_MW, EXPERIMENT_DIST, EXPERIMENT_CHROMATOGRAPH):
+            if curves.has_key(exptType):
+                curve = OilExperiment(exptType)
+                self.AddObject(curve, exptType)
+                curve.SetPoints(*curves[exptType])
+
     def AssayState(self):
         return self.state
 
@@ -607,3 +668,9 @@ class Blend(Assay):
         self.assays = []
         super(Blend, self).CleanUp()
 
+    def SetBlendData(self, data):
+        """the blend as cut by the property package (see GetAssayData)"""
+        self.SetAssayData(data)
+        self.IsUpToDate(1)
+        self.state = AssayStateCut
+
@@ -0,0 +1,1092 @@
+"""Thermo provider built on the ollin cubic equations of state
+
+Classes:
+ThermoInterface -- Main class of the interfase
+
+Remarks:
+Pure python alternative to VirtualMaterials, it does not need vmg.
+Compound constants come from the ollin data base and all the
+calculations are done with arrays (ollin.EOS.Cubic, ollin.Flash.ArrayFlash),
+so GetProperties and GetArrayProperty called with one row per stage or
+segment evaluate all the rows in one pass.
+Only vapour/liquid equilibrium is supported (no second liquid, solids
+or oils).
+
+"""
+
+import string
+import numpy
+from numpy.oldnumeric import Float, zeros, ones, array
+from numpy import asarray, exp, log, sqrt, where, newaxis, dot, identity
+from sim.solver.Variables import *
+from sim.solver.Error import SimError
+from sim.solver import S42Glob
+from ThermoConstants import *
+from ThermoAdmin import FlashResults, EnvelopeResults, ThermoCase
+from VMConstants import FlashSettingInfo
+from VMConstants import seaPTFlash, seaPHFlash, seaTHFlash, seaPVFlash, seaTVFlash, seaPSFlash
+
+from ollin.DataBase.DataBase import DataBase
+from ollin.EOS.Cubic import Models, Wilson, T_REF, VAPOUR_ROOT, LIQUID_ROOT, STABLE_ROOT
+from ollin.Flash.ArrayFlash import ArrayFlash
+from ollin.Thermodinamics.Constans import R
+
+OLLIN_INTERFACE_VERSION = 1.0
+
+#Property packages and the ollin model behind them
+_pkgModels = {'Peng-Robinson': 'PengRobinson',
+              'SRK': 'SoaveRK',
+              'RK': 'RedlichKwong'}
+
+#Compound constants as named in the simulator and in ollin.DataBase.SysData
+_cmpProps = {'MolecularWeight': 'MoleWt',
+             'NormalBoilingPoint': 'TB',
+             'FreezingPoint': 'TFP',
+             'CriticalTemperature': 'TC',
+             'CriticalPressure': 'PC',
+             'CriticalVolume': 'VC',
+             'CriticalCompressibility': 'ZC',
+             'AcentricFactor': 'OMEGA',
+             'DipoleMoment': 'DIM',
+             'LiquidDensity@298': 'LIQDEN',
+             'IdealGasEnthalpyOfFormation@298': 'DELHF',
+             'IdealGasGibbsFreeEnergyOfFormation@298': 'DELGF'}
+
+_cmpKeys = ['MoleWt', 'TB', 'TFP', 'TC', 'PC', 'VC', 'ZC', 'OMEGA', 'DIM', 'LIQDEN', 'TDEN',
+            'CP_A', 'CP_B', 'CP_C', 'CP_D', 'DELHF', 'DELGF']
+
+#Ideal gas Cp coefficients of n-butane per unit of molecular weight, used
+#for compounds without them
+_cpPerMW = (9.487/58.12, 0.3313/58.12, -1.108e-4/58.12, -2.822e-9/58.12)
+
+#Properties that only need the composition
+_cmpOnlyProps = (MOLE_WT, STDLIQVOL_VAR, STDLIQDEN_VAR, PSEUDOTC_VAR, PSEUDOPC_VAR,
+                 PSEUDOVC_VAR, IDEALGASFORMATION_VAR)
+
+_simProps = [T_VAR, P_VAR, MOLE_WT, ZFACTOR_VAR, molarV_VAR, MASSDEN_VAR, H_VAR, S_VAR,
+             CP_VAR, CV_VAR, GIBBSFREEENERGY_VAR, HELMHOLTZENERGY_VAR, INTERNALENERGY_VAR,
+             IDEALGASENTHALPY_VAR, IDEALGASENTROPY_VAR, IDEALGASCP_VAR,
+             RESIDUALENTHALPY_VAR, RESIDUALENTROPY_VAR, RESIDUALCP_VAR, RESIDUALCV_VAR,
+             IDEALGASFORMATION_VAR, SPEEDOFSOUND_VAR, ISOTHERMALCOMPRESSIBILITY_VAR, DPDVT_VAR,
+             STDLIQVOL_VAR, STDLIQDEN_VAR, PSEUDOTC_VAR, PSEUDOPC_VAR, PSEUDOVC_VAR, JT_VAR,
+             CPMASS_VAR, CVMASS_VAR, HMASS_VAR, SMASS_VAR]
+
+_simArrayProps = ['Composition', 'LnFugacityCoefficient', 'LnActivityCoefficient',
+                  'LnStandardStateFugacity', LNFUG_VAR, 'IdealKValue', MASSFRAC_VAR,
+                  'IdealVolumeFraction', CMPIDEALG_VAR, STDVOLFRAC_VAR,
+                  STDLIQMOLVOLPERCMP_VAR, 'MolecularWeightArray']
+
+#Array properties that do not need the equation of state
+_cmpOnlyArrayProps = ('Composition', 'IdealKValue', MASSFRAC_VAR, 'IdealVolumeFraction',
+                      CMPIDEALG_VAR, STDVOLFRAC_VAR, STDLIQMOLVOLPERCMP_VAR, 'MolecularWeightArray')
+
+_flashProps = (T_VAR, P_VAR, H_VAR, S_VAR, VPFRAC_VAR)
+
+#Simulator names of compounds that are under another name in the data base
+_cmpAliases = {'ISOPENTANE': '2-METHYL BUTANE',
+               'NEOPENTANE': '2,2-DIMETHYL PROPANE',
+               'HELIUM': 'HELIUM-4',
+               'ISOBUTENE': 'ISOBUTYLENE',
+               'PROPENE': 'PROPYLENE',
+               'ETHENE': 'ETHYLENE'}
+
+IP_MATRIX = 'Kij'
+IP_PANE = 'kij'
+
+STD_REF_T = 288.15
+
+
+def _NameKey(name):
+    """Key to match compound names regardless of case, blanks and underscores"""
+    return string.upper(string.strip(name)).replace('_', ' ')
+
+def _SimName(name):
+    """Compound name as given by the other providers (METHANE, n-BUTANE, CARBON_DIOXIDE)"""
+    name = _NameKey(name).replace(' ', '_')
+    if name[:2] == 'N-':
+        name = 'n-' + name[2:]
+    return name
+
+
+def _Value(col, i):
+    """Value of row i of a column of properties, None if not supported"""
+    if col is None:
+        return None
+    return float(col[i])
+
+
+class OllinFlashSettingsInfoDict(dict):
+    """Dictionary with stuff describing flash settings"""
+    def __init__(self):
+        dict.__init__(self)
+        TTypeID = S42Glob.unitSystem.GetTypeID("Temperature")
+        PTypeID = S42Glob.unitSystem.GetTypeID("Pressure")
+        unitSet = S42Glob.unitSystem.GetUnitSet('VMG')
+        TUnit = S42Glob.unitSystem.GetUnit(unitSet, TTypeID)
+        PUnit = S42Glob.unitSystem.GetUnit(unitSet, PTypeID)
+
+        self["Flash conv tolerance"] = FlashSettingInfo('tol', "Flash conv tolerance", 1.0e-10)
+        self["Maximum number of iterations"] = FlashSettingInfo('maxIter', "Maximum number of iterations", 100)
+        self["Minumum temperature"] = FlashSettingInfo('tMin', "Minumum temperature", 20.0, unit=TUnit)
+        self["Maximum temperature"] = FlashSettingInfo('tMax', "Maximum temperature", 3000.0, unit=TUnit)
+        self["Minimum pressure"] = FlashSettingInfo('pMin', "Minimum pressure", 0.0001, unit=PUnit)
+        self["Maximum pressure"] = FlashSettingInfo('pMax', "Maximum pressure", 1.0e5, unit=PUnit)
+
+
+class OllinStoreInfoOfThermoCase(object):
+    """Everything needed to rebuild a thermo case, can be stored by pickle"""
+    def __init__(self):
+        self.version = OLLIN_INTERFACE_VERSION
+        self.pkgName = ''
+        self.cmps = []
+        self.hypoDescs = {}     #cmp name: hypo descriptor tuple
+        self.consts = {}        #cmp name: dict of constants
+        self.kij = None
+        self.fshSets = {}
+        self.thCaseObj = None
+
+
+class ThermoInterface(object):
+    """Main class of the interfase"""
+    def __init__(self):
+        """Initializes the package"""
+        self.cases = {}             #thName: OllinStoreInfoOfThermoCase
+        self._arrays = {}           #thName: (constants as arrays, eos) cache
+        self.flashSettingsInfoDict = OllinFlashSettingsInfoDict()
+        self._simCommonProps = list(_simProps)
+        self._simCommonArrayProps = []
+        self.parent = None
+        self.name = 'OllinThermo'
+        self.version = OLLIN_INTERFACE_VERSION
+        self._db = None
+        self._dbNames = None
+
+    def __getstate__(self):
+        """return info to store"""
+        return (self.cases, self._simCommonProps, self._simCommonArrayProps,
+                self.parent, self.name)
+
+    def __setstate__(self, oldState):
+        """build packages from saved info"""
+        (self.cases, self._simCommonProps, self._simCommonArrayProps,
+         self.parent, self.name) = oldState
+        self._arrays = {}
+        self.flashSettingsInfoDict = OllinFlashSettingsInfoDict()
+        self.version = OLLIN_INTERFACE_VERSION
+        self._db = None
+        self._dbNames = None
+
+    def Clone(self, thCase, newCaseName):
+        if thCase in self.cases.keys():
+            old = self.cases[thCase]
+            new = OllinStoreInfoOfThermoCase()
+            new.pkgName = old.pkgName
+            new.cmps = list(old.cmps)
+            new.hypoDescs = dict(old.hypoDescs)
+            new.consts = dict(old.consts)
+            new.kij = array(old.kij, Float)
+            new.fshSets = dict(old.fshSets)
+            if self.parent:
+                new.thCaseObj = ThermoCase(self.parent, self.name, newCaseName, new.pkgName)
+            self.cases[newCaseName] = new
+            return newCaseName
+
+    def CleanUp(self):
+        for case in self.cases.values():
+            if case.thCaseObj:
+                case.thCaseObj.CleanUp()
+        self.cases = {}
+        self._arrays = {}
+        self.parent = None
+
+    def SetParent(self, parent):
+        """Should be a thermo admin instance but is not inforced"""
+        if self.parent != parent:
+            for thCaseName, case in self.cases.items():
+                case.thCaseObj = ThermoCase(parent, self.name, thCaseName, case.pkgName)
+        self.parent = parent
+
+    def GetPath(self):
+        if self.parent:
+            return self.parent.GetPath() + '.' + self.name
+        return None
+
+    def GetParent(self):
+        return self.parent
+
+    def SetName(self, name):
+        self.name = name
+
+    def GetName(self):
+        return self.name
+
+    def DeleteObject(self, obj):
+        if isinstance(obj, ThermoCase):
+            thAdmin = obj.thermoAdmin
+            thName = obj.case
+            provider = obj.provider
+
+            if thAdmin != self.parent:
+                raise SimError('ThAdminMismatch', (str(obj),))
+
+            unitOps = obj.GetUnitOps()
+            if thName in self.cases.keys() and provider == self.name:
+                for uo in unitOps:
+                    uo.thCaseObj = None
+                self.parent.DeleteThermoCase(provider, thName)
+
+    def GetContents(self):
+        results = []
+        for thCaseName, case in self.cases.items():
+            results.append((thCaseName, case.thCaseObj))
+        return results
+
+    def GetObject(self, desc):
+        """Return the thermo case if it exists"""
+        if self.cases.has_key(desc):
+            return self.cases[desc].thCaseObj
+        return None
+
+    def MergeProvider(self, fProv):
+        """Merge the incomming provider into this thermo provider"""
+        self.cases.update(fProv.cases)
+        self._arrays = {}
+
+    def _DataBase(self):
+        if self._db == None:
+            self._db = DataBase(verbose=0)
+        return self._db
+
+    def _DbName(self, name):
+        """Name of a compound in the data base, None if it is not there"""
+        if self._dbNames == None:
+            db = self._DataBase()
+            db.Cursor.execute("SELECT %s FROM %s;" % (db.SupportVars["Name"], db.SupportVars["TableComp"]))
+            self._dbNames = {}
+            for x in db.Cursor.fetchall():
+                self._dbNames.setdefault(_NameKey(x[0]), x[0])
+            for alias, key in _cmpAliases.items():
+                if self._dbNames.has_key(key):
+                    self._dbNames[alias] = self._dbNames[key]
+        return self._dbNames.get(_NameKey(name), None)
+
+    def _DbConstants(self, name):
+        """Constants of a compound from the data base, None if it is not there"""
+        dbName = self._DbName(name)
+        if dbName == None:
+            return None
+        db = self._DataBase()
+        row = db.Rows([dbName])[dbName]
+        const = {}
+        for key in _cmpKeys:
+            const[key] = row.get(db.SupportVars[key], None)
+        return const
+
+    def _Changed(self, thName):
+        """Forget the arrays of a thermo case after a change"""
+        if self._arrays.has_key(thName):
+            del self._arrays[thName]
+
+    def _Arrays(self, thName):
+        """Constants of the thermo case as arrays and its equation of state"""
+        arrays = self._arrays.get(thName, None)
+        if arrays == None:
+            case = self.cases[thName]
+            c = {}
+            for key in _cmpKeys:
+                c[key] = array([case.consts[cmp][key] for cmp in case.cmps], Float)
+            eos = Models[_pkgModels[case.pkgName]]()
+            fsh = ArrayFlash(eos, c, case.kij,
+                             case.fshSets["Flash conv tolerance"],
+                             case.fshSets["Maximum number of iterations"])
+            fsh.TLimits = (case.fshSets["Minumum temperature"], case.fshSets["Maximum temperature"])
+            fsh.PLimits = (case.fshSets["Minimum pressure"], case.fshSets["Maximum pressure"])
+            arrays = (c, eos, fsh)
+            self._arrays[thName] = arrays
+        return arrays
+
+
+##Thermo case methods ##############################################################################
+    def GetAvThCaseNames(self):
+        """List of the avilable thermo cases for a specified provider"""
+        return self.cases.keys()
+
+    def GetAvPropPkgNames(self):
+        """List of avilable porperty packages for a specified provider"""
+        return _pkgModels.keys()
+
+    def AddPkgFromName(self, thName, pkgName):
+        """Selects a property packages for a specified thermo case"""
+        self.DeleteThermoCase(thName)
+        pkgName = string.strip(pkgName)
+        if not pkgName:
+            raise SimError('NoPkgSelected', (thName,))
+        if not _pkgModels.has_key(pkgName):
+            raise SimError('ErrorValue', 'Property package %s is not supported by %s' % (pkgName, self.name))
+
+        case = OllinStoreInfoOfThermoCase()
+        case.pkgName = pkgName
+        case.kij = zeros((0, 0), Float)
+        for i, info in self.flashSettingsInfoDict.items():
+            case.fshSets[i] = info.defValue
+        if self.parent:
+            case.thCaseObj = ThermoCase(self.parent, self.name, thName, pkgName)
+        self.cases[thName] = case
+        return case.thCaseObj
+
+    def ReplacePkgFromName(self, thName, pkgName):
+        """Replaces property packages in an existing thermo case"""
+        pkgName = string.strip(pkgName)
+        if not _pkgModels.has_key(pkgName):
+            raise SimError('ErrorValue', 'Property package %s is not supported by %s' % (pkgName, self.name))
+        case = self.cases[thName]
+        case.pkgName = pkgName
+        if case.thCaseObj:
+            case.thCaseObj.package = pkgName
+        self._Changed(thName)
+
+    def ChangeThermoCaseName(self, oldThName, newThName):
+        """Change the name of a thermo case"""
+        avThCases = self.GetAvThCaseNames()
+        if (newThName in avThCases) or (not oldThName in avThCases):
+            return
+        self.cases[newThName] = self.cases[oldThName]
+        del self.cases[oldThName]
+        self._Changed(oldThName)
+
+    def DeleteThermoCase(self, thName):
+        """Deletes a thermo case"""
+        if self.cases.has_key(thName):
+            del self.cases[thName]
+            self._Changed(thName)
+
+    def GetPropPkgString(self, thName):
+        """Retrives a string with the selected property package name/s"""
+        if self.cases.has_key(thName): return self.cases[thName].pkgName
+        return None
+
+    def CheckThermoVersion(self):
+        pass
+
+    def GetThermoXMLString(self):
+        """Everything is stored by pickle"""
+        return ''
+
+    def SetThermoXMLString(self, xmlString):
+        pass
+
+
+##IP methods ######################################################################################
+    def GetIPMatrixNames(self, thName):
+        """Returns the names of the IP Matrices used by a property package"""
+        return [IP_MATRIX]
+
+    def GetNuIPPanes(self, thName, ipMatrName):
+        """Returns the amount of panes for an IP matrix"""
+        if ipMatrName == IP_MATRIX:
+            return 1
+        return None
+
+    def GetIPPaneNames(self, thName, ipMatrName):
+        """Returns the names of the panes for an IP matrix"""
+        if ipMatrName == IP_MATRIX:
+            return [IP_PANE]
+        return []
+
+    def GetIPValues(self, thName, ipMatrName, pane):
+        try:
+            return array(self.cases[thName].kij, Float)
+        except:
+            return None
+
+    def GetIPValue(self, thName, ipMatrName, cmpName1, cmpName2, pane):
+        """Returns the IP value of a specific pane for two compounds"""
+        try:
+            case = self.cases[thName]
+            return case.kij[case.cmps.index(cmpName1), case.cmps.index(cmpName2)]
+        except:
+            return None
+
+    def SetIPValue(self, thName, ipMatrName, cmpName1, cmpName2, pane, value):
+        """Sets the IP value of a specific pane for two compounds"""
+        try:
+            case = self.cases[thName]
+            idx1, idx2 = case.cmps.index(cmpName1), case.cmps.index(cmpName2)
+            case.kij[idx1, idx2] = case.kij[idx2, idx1] = float(value)
+            self._Changed(thName)
+        except:
+            try:
+                self.parent.InfoMessage('CantSetIP', (value, cmpName1, cmpName2))
+            except:
+                pass
+            return None
+
+    def GetIPInfo(self, thName, ipMatrName, cmpName1, cmpName2):
+        return ''
+
+
+##Oil methods ######################################################################################
+    def _NoOils(self):
+        raise SimError('ErrorValue', 'Oil characterization is not supported by %s' % self.name)
+
+    def CustomCommand(self, thCase, cmd):
+        """Only Pkg.Info is supported, returns (retCode, result string)"""
+        if cmd == 'Pkg.Info':
+            return (0, 'Version=%s; Packages=%s' % (str(self.version), ', '.join(self.GetAvPropPkgNames())))
+        return (1, 'Custom commands are not supported by %s' % self.name)
+
+    def InstallOil(self, thCase, assayObj): self._NoOils()
+    def DeletePseudos(self, thCase, assayObj): self._NoOils()
+    def UpdateOil(self, thCase, assayObj): self._NoOils()
+    def BlendAssay(self, thCase, blend): self._NoOils()
+    def SetAssayParameterValue(self, thCase, paramObj): self._NoOils()
+    def CutAssay(self, thCase, assayObj): self._NoOils()
+
+    def PseudoList(self, thCase, assayObj):
+        return None
+
+    def GetOilComposition(self, thCase, assayObj):
+        return None
+
+    def DeleteOilObject(self, thCase, obj):
+        pass
+
+
+##Compound methods################################################################################
+    def GetAvCompoundNames(self):
+        """List of avilable compounds for a specified provider"""
+        self._DbName('')
+        names = map(_SimName, self._dbNames.keys())
+        names.sort()
+        return names
+
+    def _Complete(self, name, const):
+        """Fill in the constants the data base (or the hypo) does not have"""
+        for key in _cmpKeys:
+            if const.get(key, None) == None:
+                const[key] = None
+        if not const['TC'] or not const['PC'] or not const['MoleWt']:
+            raise SimError('ErrorValue', '%s needs MolecularWeight, CriticalTemperature and '
+                           'CriticalPressure in %s' % (name, self.name))
+        Tc, Pc = const['TC'], const['PC']
+        if const['OMEGA'] == None:
+            #Edmister
+            if not const['TB']:
+                raise SimError('ErrorValue', '%s needs AcentricFactor or NormalBoilingPoint in %s' % (name, self.name))
+            const['OMEGA'] = 3.0/7.0*numpy.log10(Pc/101.325)/(Tc/const['TB'] - 1.0) - 1.0
+        if const['CP_A'] == None:
+            for key, cp in zip(('CP_A', 'CP_B', 'CP_C', 'CP_D'), _cpPerMW):
+                const[key] = cp*const['MoleWt']
+        for key in ('CP_B', 'CP_C', 'CP_D', 'DELHF', 'DELGF', 'DIM'):
+            if const[key] == None:
+                const[key] = 0.0
+        if not const['LIQDEN']:
+            #Rackett at the standard temperature
+            zra = 0.29056 - 0.08775*const['OMEGA']
+            Tr = min(STD_REF_T/Tc, 1.0)
+            const['LIQDEN'] = const['MoleWt']/(R*Tc/Pc*zra**(1.0 + (1.0 - Tr)**(2.0/7.0)))
+            const['TDEN'] = STD_REF_T
+        if not const['TDEN']:
+            const['TDEN'] = 298.15
+        return const
+
+    def _AddConstants(self, thName, cmp, const, desc=None):
+        case = self.cases[thName]
+        if cmp in case.cmps:
+            raise SimError('ErrorValue', 'Compound %s is already in %s' % (cmp, thName))
+        n = len(case.cmps)
+        kij = zeros((n + 1, n + 1), Float)
+        kij[:n, :n] = case.kij
+        case.consts[cmp] = const
+        case.cmps.append(cmp)
+        if desc != None:
+            case.hypoDescs[cmp] = desc
+        else:
+            kij[:, :] = self._DataBase().Kij([self._DbName(c) or c for c in case.cmps])
+            for i in range(n):
+                for j in range(n):
+                    kij[i, j] = case.kij[i, j]
+        case.kij = kij
+        self._Changed(thName)
+
+    def AddCompound(self, thName, cmp):
+        """
+        Adds a compound to a  thermo case. The name is matched regardless of case and
+        it is kept as the other providers name it (Methane -> METHANE, n-Butane -> n-BUTANE)
+        """
+        const = self._DbConstants(cmp)
+        if const == None:
+            raise SimError('ErrorValue', 'Compound %s is not in the %s data base' % (cmp, self.name))
+        cmp = _SimName(cmp)
+        self._AddConstants(thName, cmp, self._Complete(cmp, const))
+
+    def _HypoConstants(self, hypoName, hypoDesc):
+        dblDescs, dblVals = hypoDesc[4], hypoDesc[5]
+        const = {}
+        for desc, val in zip(dblDescs, dblVals):
+            if _cmpProps.has_key(desc):
+                const[_cmpProps[desc]] = float(val)
+        if const.has_key('LIQDEN'):
+            const['TDEN'] = 298.15
+        return self._Complete(hypoName, const)
+
+    def AddHypoCompound(self, thName, hypoName, hypoDesc):
+        """Adds a hypothetical compound to a  thermo case"""
+        const = self._HypoConstants(hypoName, hypoDesc)
+        self._AddConstants(thName, hypoName, const, hypoDesc)
+
+    def EditCompound(self, thName, cmpIdx, hypoDesc):
+        """Changes the constants of a hypothetical compound"""
+        case = self.cases[thName]
+        cmp = case.cmps[cmpIdx]
+        case.consts[cmp] = self._HypoConstants(cmp, hypoDesc)
+        case.hypoDescs[cmp] = hypoDesc
+        self._Changed(thName)
+
+    def DeleteCompound(self, thName, cmp):
+        """Removes a compound from a thermo case"""
+        case = self.cases[thName]
+        idx = case.cmps.index(cmp)
+        keep = range(len(case.cmps))
+        del keep[idx]
+        case.kij = numpy.take(numpy.take(case.kij, keep, 0), keep, 1)
+        del case.cmps[idx]
+        del case.consts[cmp]
+        if case.hypoDescs.has_key(cmp):
+            del case.hypoDescs[cmp]
+        self._Changed(thName)
+
+    def GetSelectedCompoundNames(self, thName):
+        """List of selected compounds for a thermo case"""
+        return list(self.cases[thName].cmps)
+
+    def GetHypoteticalCompoundNames(self, thName):
+        """List of hypotetical compounds"""
+        case = self.cases[thName]
+        return [cmp for cmp in case.cmps if case.hypoDescs.has_key(cmp)]
+
+    def GetCompoundPropertyNames(self, propGroup):
+        propNames = []
+        if propGroup == None or propGroup & CMP_ID_GRP:
+            propNames.extend(['Name', 'Id'])
+        if propGroup == None or propGroup & CMP_NO_EQDEP_GRP:
+            propNames.extend(_cmpProps.keys())
+        return propNames
+
+    def _CmpProperties(self, const, name, propNames):
+        if type(propNames) == type(''):
+            propNames = string.split(propNames)
+        vals = []
+        for prop in propNames:
+            if prop == 'Name':
+                vals.append(name)
+            elif _cmpProps.has_key(prop):
+                vals.append(const[_cmpProps[prop]])
+            else:
+                vals.append(None)
+        return vals
+
+    def GetCompoundProperties(self, thName, cmpName, propNames):
+        """return property(ies) for component"""
+        case = self.cases[thName]
+        if case.consts.has_key(cmpName):
+            const = case.consts[cmpName]
+        else:
+            const = self._DbConstants(cmpName)
+            if const == None: return None
+        if type(propNames) == type('') and propNames == 'Name':
+            return cmpName
+        return self._CmpProperties(const, cmpName, propNames)
+
+    def GetSelectedCompoundProperties(self, thName, cmpNo, propNames):
+        """return property(ies) for component number cmpNo"""
+        case = self.cases[thName]
+        cmp = case.cmps[cmpNo]
+        if propNames == 'ChemicalFamily':
+            return ['']
+        return self._CmpProperties(case.consts[cmp], cmp, propNames)
+
+    def MoveCompound(self, thName, cmp1Name, cmp2Name):
+        """ move cmp1 before cmp2"""
+        case = self.cases[thName]
+        order = range(len(case.cmps))
+        idx1 = case.cmps.index(cmp1Name)
+        del order[idx1]
+        if cmp2Name == '$':
+            order.append(idx1)
+        else:
+            order.insert(order.index(case.cmps.index(cmp2Name)), idx1)
+        case.cmps = [case.cmps[i] for i in order]
+        case.kij = numpy.take(numpy.take(case.kij, order, 0), order, 1)
+        self._Changed(thName)
+        return None
+
+
+##Stream methods ######################################################################################
+    def GetPropertyNames(self):
+        """Returns a list of supported properties"""
+        return list(_simProps)
+
+    def GetArrayPropertyNames(self):
+        """Returns a list of supported array properties"""
+        return list(_simArrayProps)
+
+    def SetCommonPropertyNames(self, propList):
+        """Sets the common property list"""
+        self._simCommonProps = list(propList)
+
+    def SetCommonArrayPropertyNames(self, propList):
+        """Sets the common array property list"""
+        self._simCommonArrayProps = list(propList)
+
+    def GetCommonPropertyNames(self):
+        return list(self._simCommonProps)
+
+    def GetCommonArrayPropertyNames(self):
+        return list(self._simCommonArrayProps)
+
+    def _StdVolumes(self, c, T):
+        """Liquid molar volume of every compound at T (rows), Rackett from the reference density"""
+        T = asarray(T, 'd')[:, newaxis]
+        Tc = c['TC']
+        zra = 0.29056 - 0.08775*c['OMEGA']
+        tau = (1.0 - numpy.minimum(T/Tc, 1.0))**(2.0/7.0)
+        tau0 = (1.0 - numpy.minimum(c['TDEN']/Tc, 1.0))**(2.0/7.0)
+        return c['MoleWt']/c['LIQDEN']*zra**(tau - tau0)
+
+    def _State(self, thName, names, vals, phase, x, needEOS):
+        """
+        Dict with the state of every row: T, P, x, VapFrac and the
+        properties from the equation of state when needEOS
+        """
+        c, eos, fsh = self._Arrays(thName)
+        m = x.shape[0]
+        spec = dict(zip(names, vals))
+        st = {'x': x, 'VapFrac': where(phase == VAPOUR_PHASE, 1.0, 0.0)}
+        st['T'] = spec.get(T_VAR, STD_REF_T*ones(m, Float))
+        st['P'] = spec.get(P_VAR, 101.325*ones(m, Float))
+        if not needEOS:
+            return st
+
+        if spec.has_key(T_VAR) and spec.has_key(P_VAR):
+            T, P = st['T'], st['P']
+            root = where(phase == VAPOUR_PHASE, VAPOUR_ROOT,
+                         where(phase == OVERALL_PHASE, STABLE_ROOT, LIQUID_ROOT))
+            props = eos.Properties(T, P, x, c, self.cases[thName].kij, root)
+            st.update(props)
+            overall = numpy.nonzero(phase == OVERALL_PHASE)[0]
+            if len(overall):
+                res = fsh.PT(numpy.take(T, overall), numpy.take(P, overall), numpy.take(x, overall, 0))
+                for key, val in res['bulk'].items():
+                    st[key] = numpy.array(st[key])
+                    numpy.put(st[key], overall, val)
+                numpy.put(st['VapFrac'], overall, res['VapFrac'])
+            return st
+
+        res = self._FlashRows(thName, names, vals, x)
+        vap = (phase == VAPOUR_PHASE)
+        liq = (phase == LIQUID_PHASE) | (phase == SOLID_PHASE)
+        for key, val in res['bulk'].items():
+            st[key] = where(vap, res['vap'][key], where(liq, res['liq'][key], val))
+        st['lnPhi'] = where(vap[:, newaxis], res['vap']['lnPhi'], res['liq']['lnPhi'])
+        st['x'] = where(vap[:, newaxis], res['y'], where(liq[:, newaxis], res['x'], x))
+        st['VapFrac'] = where(vap, 1.0, where(liq, 0.0, res['VapFrac']))
+        st['T'], st['P'] = res['T'], res['P']
+        return st
+
+    def _FlashRows(self, thName, names, vals, z):
+        """Flash every row with the two known properties in names"""
+        c, eos, fsh = self._Arrays(thName)
+        spec = {}
+        for name, val in zip(names, vals):
+            spec[name] = asarray(val, 'd')
+        flType, vars = self.DecideTypeOfFlash(spec.keys(), ())
+        if flType == seaPTFlash:
+            return fsh.PT(spec[T_VAR], spec[P_VAR], z)
+        elif flType == seaPHFlash:
+            return fsh.PH(spec[P_VAR], spec[H_VAR], z)
+        elif flType == seaTHFlash:
+            return fsh.TH(spec[T_VAR], spec[H_VAR], z)
+        elif flType == seaPSFlash:
+            return fsh.PS(spec[P_VAR], spec[S_VAR], z)
+        elif flType == seaPVFlash:
+            return fsh.PV(spec[P_VAR], spec[VPFRAC_VAR], z)
+        elif flType == seaTVFlash:
+            return fsh.TV(spec[T_VAR], spec[VPFRAC_VAR], z)
+        raise SimError('ErrorValue', 'Can not flash with %s and %s in %s' % (names[0], names[1], self.name))
+
+    def _SimValues(self, thName, st, propList, refT=None):
+        """Columns (one per property) of the simulator properties for the rows in st"""
+        c, eos, fsh = self._Arrays(thName)
+        x = st['x']
+        MW = dot(x, c['MoleWt'])
+        if refT == None: refT = STD_REF_T
+        cols = []
+        for prop in propList:
+            try:
+                if prop == T_VAR: val = st['T']
+                elif prop == P_VAR: val = st['P']
+                elif prop == VPFRAC_VAR: val = st['VapFrac']
+                elif prop == MOLE_WT: val = MW
+                elif prop == STDLIQVOL_VAR:
+                    val = (x*self._StdVolumes(c, refT*ones(x.shape[0]))).sum(axis=-1)
+                elif prop == STDLIQDEN_VAR:
+                    val = MW/(x*self._StdVolumes(c, refT*ones(x.shape[0]))).sum(axis=-1)
+                elif prop == PSEUDOTC_VAR: val = dot(x, c['TC'])
+                elif prop == PSEUDOPC_VAR: val = dot(x, c['PC'])
+                elif prop == PSEUDOVC_VAR: val = dot(x, c['VC'])
+                elif prop == IDEALGASFORMATION_VAR: val = dot(x, c['DELHF'])
+                elif not st.has_key('H'): val = None
+                elif prop == ZFACTOR_VAR: val = st['Z']
+                elif prop == molarV_VAR: val = st['V']
+                elif prop == MASSDEN_VAR: val = MW/st['V']
+                elif prop == H_VAR: val = st['H']
+                elif prop == S_VAR: val = st['S']
+                elif prop == CP_VAR: val = st['Cp']
+                elif prop == CV_VAR: val = st['Cv']
+                elif prop == GIBBSFREEENERGY_VAR: val = st['H'] - st['T']*st['S']
+                elif prop == HELMHOLTZENERGY_VAR: val = st['H'] - st['T']*st['S'] - st['P']*st['V']
+                elif prop == INTERNALENERGY_VAR: val = st['H'] - st['P']*st['V']
+                elif prop == IDEALGASENTHALPY_VAR: val = st['Hig']
+                elif prop == IDEALGASENTROPY_VAR: val = st['Sig']
+                elif prop == IDEALGASCP_VAR: val = st['Cpig']
+                elif prop == RESIDUALENTHALPY_VAR: val = st['Hres']
+                elif prop == RESIDUALENTROPY_VAR: val = st['Sres']
+                elif prop == RESIDUALCP_VAR: val = st['Cpres']
+                elif prop == RESIDUALCV_VAR: val = st['Cvres']
+                elif prop == DPDVT_VAR: val = st['dPdV']
+                elif prop == ISOTHERMALCOMPRESSIBILITY_VAR: val = -1.0/(st['V']*st['dPdV'])
+                elif prop == SPEEDOFSOUND_VAR:
+                    #m/s, P in kPa
+                    val = sqrt(-1000.0*st['V']**2/MW*st['Cp']/st['Cv']*st['dPdV'])
+                elif prop == JT_VAR:
+                    dVdT = -st['dPdT']/st['dPdV']
+                    val = (st['T']*dVdT - st['V'])/st['Cp']
+                elif prop == CPMASS_VAR: val = st['Cp']/MW
+                elif prop == CVMASS_VAR: val = st['Cv']/MW
+                elif prop == HMASS_VAR: val = st['H']/MW
+                elif prop == SMASS_VAR: val = st['S']/MW
+                else: val = None
+            except KeyError:
+                #not available for this phase (e.g. dPdV of a two phase mix)
+                val = None
+            cols.append(val)
+        return cols
+
+    def _Rows(self, inProp1, inProp2, phase, frac):
+        """Everything as arrays of rows, and whether the input was a single row"""
+        prop1, prop2 = inProp1[1], inProp2[1]
+        single = not isinstance(prop1, numpy.ndarray)
+        x = asarray(frac, 'd')
+        if single:
+            x = x[newaxis, :]
+        m = x.shape[0]
+        v1 = asarray(prop1, 'd')*ones(m, Float)
+        v2 = asarray(prop2, 'd')*ones(m, Float)
+        phase = asarray(phase)*ones(m, numpy.int32)
+        return single, (inProp1[0], inProp2[0]), (v1, v2), phase, x
+
+    def GetProperties(self, thName, inProp1, inProp2, phase, frac, propList):
+        """
+        Return a list of properties corresponding to the types in propList.
+        Two intensive variables must be specified (inProp1 and inProp2). Each of
+        these is a tuple with the first member being a string property type.
+        The second member can be either a scalar or array variable.
+        If the input variables and  phase are scalars and frac a one
+        dimensional composition array, then each member of the return list will be a scalar.
+        If the input variables, phase are Numeric.arrays and frac a two dimensional
+        array with one composition per row, then the return value will be a 2 dim
+        Numeric.array
+        """
+        if type(propList) == type(''):
+            propList = [propList]
+        single, names, vals, phase, x = self._Rows(inProp1, inProp2, phase, frac)
+        needEOS = 0
+        for prop in propList:
+            if not prop in _cmpOnlyProps and not prop in names:
+                needEOS = 1
+        st = self._State(thName, names, vals, phase, x, needEOS)
+        cols = self._SimValues(thName, st, propList)
+        if single:
+            return [_Value(col, 0) for col in cols]
+        m = x.shape[0]
+        values = []
+        for i in range(m):
+            values.append([_Value(col, i) for col in cols])
+        return array(values)
+
+    def _ArrayValues(self, thName, st, prop, frac):
+        c, eos, fsh = self._Arrays(thName)
+        x = st['x']
+        m, n = x.shape
+        if prop == 'MolecularWeightArray':
+            return c['MoleWt']*ones((m, n), Float)
+        elif prop == STDLIQMOLVOLPERCMP_VAR:
+            return self._StdVolumes(c, st['T'])
+        elif prop == MASSFRAC_VAR:
+            w = x*c['MoleWt']
+            return w/w.sum(axis=-1)[:, newaxis]
+        elif prop in (STDVOLFRAC_VAR, 'IdealVolumeFraction'):
+            v = x*self._StdVolumes(c, st['T'])
+            return v/v.sum(axis=-1)[:, newaxis]
+        elif prop == 'Composition':
+            #frac are std liquid volume fractions
+            v = x/self._StdVolumes(c, st['T'])
+            return v/v.sum(axis=-1)[:, newaxis]
+        elif prop == 'IdealKValue':
+            return Wilson(st['T'], st['P'], c)
+        elif prop == CMPIDEALG_VAR:
+            T = st['T'][:, newaxis]
+            T0 = T_REF
+            A, B, C, D = c['CP_A'], c['CP_B'], c['CP_C'], c['CP_D']
+            dh = A*(T - T0) + B/2.0*(T**2 - T0**2) + C/3.0*(T**3 - T0**3) + D/4.0*(T**4 - T0**4)
+            ds = A*log(T/T0) + B*(T - T0) + C/2.0*(T**2 - T0**2) + D/3.0*(T**3 - T0**3)
+            return c['DELGF']*T/T0 + c['DELHF']*(1.0 - T/T0) + dh - T*ds
+        elif prop == 'LnFugacityCoefficient':
+            return st['lnPhi']
+        elif prop == LNFUG_VAR:
+            return st['lnPhi'] + log(where(x > 0.0, x, 1e-300)) + log(st['P'])[:, newaxis]
+        elif prop in ('LnActivityCoefficient', 'LnStandardStateFugacity'):
+            #pure compounds at the same T, P and phase
+            T = numpy.repeat(st['T'], n)
+            P = numpy.repeat(st['P'], n)
+            root = numpy.repeat(where(st['VapFrac'] >= 1.0, VAPOUR_ROOT, LIQUID_ROOT), n)
+            pure = numpy.resize(identity(n, Float), (m*n, n))
+            lnPhi, Z = eos.LnPhiOnly(T, P, pure, c, self.cases[thName].kij, root)
+            lnPhiPure = (lnPhi*pure).sum(axis=-1).reshape((m, n))
+            if prop == 'LnStandardStateFugacity':
+                return lnPhiPure + log(st['P'])[:, newaxis]
+            return st['lnPhi'] - lnPhiPure
+        return None
+
+    def GetArrayProperty(self, thName, inProp1, inProp2, phase, frac, property):
+        """
+        return a Numeric array containing properties of the type 'property'
+        Two intensive variables must be specified (inProp1 and inProp2). Each of
+        these is a tuple with the first member being a string property type.
+        The second member can be either a scalar or array variable.
+        If the input variables and phase are scalars, frac should be a single
+        composition array and a single array of properties is returned.
+        If the input variables and phase are Numeric.arrays, then they must be the same length
+        and frac must be a 2d Numeric.array with the same number or rows and each row
+        must be a composition.  In this case a 2d Numeric array will be returned with
+        one set of results per row
+        """
+        single, names, vals, phase, x = self._Rows(inProp1, inProp2, phase, frac)
+        needEOS = not property in _cmpOnlyArrayProps
+        st = self._State(thName, names, vals, phase, x, needEOS)
+        values = self._ArrayValues(thName, st, property, x)
+        if values == None:
+            return None
+        if single:
+            return values[0]
+        return values
+
+    def GetIdealKValues(self, thName, t, p):
+        """
+        return array of initial K values based on t and p
+        t and p can be scalars in which case an array nComp long is returned
+        if t and p are Numeric.arrays they must be the same length and a matrix
+        with that many rows of nComp columns will be returned
+        """
+        c, eos, fsh = self._Arrays(thName)
+        if not isinstance(t, numpy.ndarray):
+            return Wilson(array([t], Float), array([p], Float), c)[0]
+        return Wilson(t, p, c)
+
+    def GetMolecularWeightValues(self, thName):
+        """shortcut method to get the molecular weight vector of a thermo case"""
+        try:
+            c, eos, fsh = self._Arrays(thName)
+            return array(c['MoleWt'])
+        except:
+            return None
+
+    def GetSpecialProperty(self, thName, inputData, frac, prop, nuPoints=None):
+        """
+        Return a special property as a string and a status.
+        inputData contains any necessary info requiered to calculate the required prop
+        frac is just the composition
+        """
+        z = asarray(frac, 'd')[newaxis, :]
+        c, eos, fsh = self._Arrays(thName)
+        try:
+            if prop in (BUBBLEPOINT_VAR, DEWPOINT_VAR):
+                vf = prop == DEWPOINT_VAR and 1.0 or 0.0
+                res = fsh.PV(array([inputData], Float), array([vf], Float), z)
+                return str(res['T'][0]), 'OK'
+            elif prop == BUBBLEPRESSURE_VAR:
+                res = fsh.TV(array([inputData], Float), array([0.0], Float), z)
+                return str(res['P'][0]), 'OK'
+            elif prop in (PSEUDOTC_VAR, PSEUDOPC_VAR, PSEUDOVC_VAR):
+                return str(self.GetProperties(thName, (T_VAR, STD_REF_T), (P_VAR, 101.325),
+                                              LIQUID_PHASE, frac, [prop])[0]), 'OK'
+            elif prop == JT_VAR:
+                T, P = inputData
+                return str(self.GetProperties(thName, (T_VAR, T), (P_VAR, P),
+                                              OVERALL_PHASE, frac, [prop])[0]), 'OK'
+        except SimError, e:
+            return '', str(e)
+        return '', '%s is not supported by %s' % (prop, self.name)
+
+
+##Flash methods ####################################################################################
+    def GetFlashSettingsInfo(self, thName):
+        """Returns a dictionary with objects describing the flash settings"""
+        return self.flashSettingsInfoDict
+
+    def SetFlashSetting(self, thName, settingName, value):
+        if not self.flashSettingsInfoDict.has_key(settingName):
+            raise SimError('ErrorValue', 'Unknown flash setting %s' % settingName)
+        self.cases[thName].fshSets[settingName] = value
+        self._Changed(thName)
+
+    def GetFlashSetting(self, thName, settingName):
+        """Get the value of a flash setting"""
+        return self.cases[thName].fshSets[settingName]
+
+    def GetPropNamesCapableOfFlash(self, thName):
+        """Returns a tuple with prop names that can be used to calculate a flash"""
+        return _flashProps
+
+    def Flash(self, thName, cmps, properties, liqPhCount,
+              propList=None, thThermoAdmin=None, nuSolids=0,
+              stdVolRefT=None):
+        """Performs a Flash calculation
+
+        thName -- Name of the thermo case
+        cmps -- Instance of Variables.CompoundList
+        properties -- Instance of Variables.MaterialPropertyDict
+        liqPhCount -- Number of liquid phases
+
+        returns a FlashResults object
+        """
+        if not cmps.AreValuesReady(): return None
+        fixed = properties.GetNamesOfKnownFixedVars(CANFLASH_PROP)
+        if len(fixed) > 2:
+            port = properties.values()[0].GetParent()
+            parentPath = ''
+            if port:
+                parentPath = port.GetPath()
+            raise SimError ('OverspecFlash', (parentPath, len(fixed), ' '.join(fixed)))
+        calc = properties.GetNamesOfKnownCalcVars(CANFLASH_PROP)
+        returnedType = self.DecideTypeOfFlash(fixed, calc)
+        if returnedType == None: return None
+        flType, vars = returnedType
+        vals = []
+        for i in vars: vals.append(array([properties[i].GetValue()], Float))
+
+        bulkComp = array(cmps.GetValues(), Float)
+        res = self._FlashRows(thName, vars, vals, bulkComp[newaxis, :])
+
+        if not propList:
+            propsNamesOut = self.GetCommonPropertyNames()
+        elif type(propList) == type(''):
+            propsNamesOut = [propList]
+        else:
+            propsNamesOut = list(propList)
+        arrPropNamesOut = self.GetCommonArrayPropertyNames()
+        if not stdVolRefT: stdVolRefT = STD_REF_T
+
+        beta = res['VapFrac'][0]
+        T, P = res['T'], res['P']
+        vap = {'T': T, 'P': P, 'x': res['y'], 'VapFrac': array([1.0])}
+        vap.update(res['vap'])
+        liq = {'T': T, 'P': P, 'x': res['x'], 'VapFrac': array([0.0])}
+        liq.update(res['liq'])
+        bulk = {'T': T, 'P': P, 'x': bulkComp[newaxis, :], 'VapFrac': res['VapFrac']}
+        bulk.update(res['bulk'])
+
+        def values(st):
+            return [_Value(col, 0) for col in self._SimValues(thName, st, propsNamesOut, stdVolRefT)]
+        def arrValues(st):
+            return [self._ArrayValues(thName, st, prop, st['x'])[0] for prop in arrPropNamesOut]
+
+        bulkProps = values(bulk)
+        bulkArrProps = arrValues(bulk)
+
+        #Vapour first, then the liquids (only one is calculated)
+        phasesFracs = [beta, 1.0 - beta]
+        phasesComposit = [res['y'][0], res['x'][0]]
+        phasesProps = [values(vap), values(liq)]
+        phasesArrProps = [arrValues(vap), arrValues(liq)]
+        for i in range(max(liqPhCount, 1) - 1 + min(nuSolids, 1)):
+            phasesFracs.append(0.0)
+            phasesComposit.append(res['x'][0])
+            phasesProps.append(list(phasesProps[1]))
+            phasesArrProps.append(list(phasesArrProps[1]))
+        if nuSolids and thThermoAdmin != None:
+            thThermoAdmin.InfoMessage('ErrorValue', 'Solids are not supported by %s' % self.name)
+
+        return FlashResults(propsNamesOut, arrPropNamesOut, bulkComp, bulkProps, bulkArrProps,
+                            array(phasesFracs, Float), phasesComposit, phasesProps, phasesArrProps)
+
+    def DecideTypeOfFlash(self, fixed, calc):
+        """Decides which type of flash to perform depending on the info av"""
+        if len(fixed) == 0:
+            lookin = calc #Flash with calc vars
+        elif len(fixed) == 2:
+            lookin = fixed #Flash with  both fixed vars
+        else:
+            lookin = None
+
+        if lookin != None:
+            if P_VAR in lookin and H_VAR in lookin: return seaPHFlash, (P_VAR, H_VAR)
+            if T_VAR in lookin and H_VAR in lookin: return seaTHFlash, (T_VAR, H_VAR)
+            if T_VAR in lookin and P_VAR in lookin: return seaPTFlash, (T_VAR, P_VAR)
+            if P_VAR in lookin and VPFRAC_VAR in lookin: return seaPVFlash, (P_VAR, VPFRAC_VAR)
+            if T_VAR in lookin and VPFRAC_VAR in lookin: return seaTVFlash, (T_VAR, VPFRAC_VAR)
+            if P_VAR in lookin and S_VAR in lookin: return seaPSFlash, (P_VAR, S_VAR)
+        if T_VAR in fixed:
+            if H_VAR in calc:
+                if P_VAR in calc:
+                    return seaPHFlash, (P_VAR, H_VAR)
+                return seaTHFlash, (T_VAR, H_VAR)
+            if P_VAR in calc: return seaPTFlash, (T_VAR, P_VAR)
+            if VPFRAC_VAR in calc: return seaTVFlash, (T_VAR, VPFRAC_VAR)
+        if P_VAR in fixed:
+            if H_VAR in calc: return seaPHFlash, (P_VAR, H_VAR)
+            if T_VAR in calc: return seaPTFlash, (P_VAR, T_VAR)
+            if VPFRAC_VAR in calc: return seaPVFlash, (P_VAR, VPFRAC_VAR)
+            if S_VAR in calc: return seaPSFlash, (P_VAR, S_VAR)
+        if VPFRAC_VAR in fixed:
+            if T_VAR in calc: return seaTVFlash, (VPFRAC_VAR, T_VAR)
+            if P_VAR in calc: return seaPVFlash, (VPFRAC_VAR, P_VAR)
+        if S_VAR in fixed:
+            if P_VAR in calc: return seaPSFlash, (S_VAR, P_VAR)
+        if H_VAR in fixed:
+            if P_VAR in calc: return seaPHFlash, (H_VAR, P_VAR)
+        return None
+
+    def PhaseEnvelope(self, thName, cmps, vapFraction, pressure, maxPoints, pList=None):
+        """
+        Quality line (vapFraction) from pressure up, a point every 15% in
+        pressure plus the pressures in pList, until the flash stops converging.
+        Only the branch that starts at the lowest temperature is traced
+        """
+        c, eos, fsh = self._Arrays(thName)
+        z = asarray(cmps, 'd')
+        P = pressure*1.15**numpy.arange(maxPoints)
+        if pList:
+            P = numpy.unique(numpy.concatenate((P, asarray(pList, 'd'))))[:maxPoints]
+        m = len(P)
+        res = fsh.PV(P, vapFraction*ones(m, Float), numpy.resize(z, (m, len(z))))
+        ok = (abs(res['Residual']) < 1e-4) & (abs(log(res['K'])).max(axis=-1) > 1e-3)
+
+        types, pVals, tVals, kVals = [], [], [], []
+        for i in range(m):
+            if not ok[i]:
+                break
+            types.append(0)
+            pVals.append(float(P[i]))
+            tVals.append(float(res['T'][i]))
+            kVals.append(res['K'][i])
+        npt = len(pVals)
+        if npt:
+            types[pVals.index(max(pVals))] = 3
+            types[tVals.index(max(tVals))] = 4
+            retCode, msg = 0, 'OK'
+        else:
+            retCode, msg = 1, 'No point of the envelope converged'
+        return EnvelopeResults(retCode, msg, npt, types, pVals, tVals, kVals)
+
@@ -17,6 +17,8 @@ from sim.solver.Error import SimError
 from ThermoConstants import *
 from Hypo import *
 from sim.solver.Messages import MessageHandler
+from sim.solver import Counters
+import ThermoRecorder
 import numpy
 from numpy.oldnumeric import array, ones, zeros, Float, Int, sum
 
@@ -24,7 +26,14 @@ from numpy.oldnumeric import array, ones, zeros, Float, Int, sum
 VMModName = 'VirtualMaterials'
 VMClassName = 'ThermoInterface'
 
+OllinModName = 'OllinThermo'
+OllinClassName = 'ThermoInterface'
+
 IPINFO = 'IPInfo'
+
+#Oil work memoised by ThermoAdmin
+CUT_MEMO = 'Cut'
+INSTALL_MEMO = 'Install'
 LINKED_OPS_KEY = 'LinkedOps'
 
 class ThermoDict(UserDict):
@@ -45,18 +54,23 @@ class ThermoDict(UserDict):
 class ThermoAdmin(object):
     """Thermo administrator"""
     def __init__(self):
-        """Supports Virtual Materials by default"""
+        """Supports Virtual Materials and the ollin cubic equations by default"""
         self.thDict = ThermoDict()
         self._linkedUOs = []    #Instance of uos that use this thermoadmin
         self.saveInfo = []
         self._unsentMsgStack = []    #Top most unit op stacks messages while an infoCallBack is not available
+        self._surrogates = {}        #(provider, thName): list of objects with a GetSurrogate method
+        self._oilMemo = {}           #(memo, provider, thName, oilName, assayName): (inputs, result)
         err = self.SetNewThermoProvider(VMModName, VMClassName)
+        err = self.SetNewThermoProvider(OllinModName, OllinClassName)
         self.currTypeOfCmpID = 'VMName' #Could be VM Id, CASN, DIPPR ID, etc.
 
     def CleanUp(self):
         for i in self.thDict.values(): i.CleanUp()
         self._linkedUOs = []
         self._unsentMsgStack = []
+        self._surrogates = {}
+        self._oilMemo = {}
         self.saveInfo = []
 
     def AdjustOldCase(self, version):
@@ -74,6 +88,10 @@ class ThermoAdmin(object):
         if version[0] < 22:
             if not hasattr(self, '_unsentMsgStack'):
                 self._unsentMsgStack = []
+        if not hasattr(self, '_surrogates'):
+            self._surrogates = {}
+        #The oils are rebuilt by the providers on recall
+        self._oilMemo = {}
                 
         for thName, thCase in self.GetContents():
             if isinstance(thCase, ThermoCase):
@@ -157,12 +175,20 @@ class ThermoAdmin(object):
         args -- (Optional) Tuple with necessary arguments to create className 
 
         """
-        module = self.__ImportModule(modName)
-        if not module:
-            self.InfoMessage('CouldNotLoadProvider', modName)
-            return 0
-        #The provider name and the module name are the same
-        self.thDict[modName] = apply(module.__dict__[className], args)
+        replayFile = os.environ.get(ThermoRecorder.REPLAY_ENV, None)
+        if replayFile and ThermoRecorder.IsRecorded(replayFile, modName):
+            #Stand-in that serves recorded results, the provider is not needed
+            self.thDict[modName] = ThermoRecorder.ReplayInterface(replayFile, modName)
+        else:
+            module = self.__ImportModule(modName)
+            if not module:
+                self.InfoMessage('CouldNotLoadProvider', modName)
+                return 0
+            #The provider name and the module name are the same
+            self.thDict[modName] = apply(module.__dict__[className], args)
+            recordFile = os.environ.get(ThermoRecorder.RECORD_ENV, None)
+            if recordFile:
+                self.thDict[modName] = ThermoRecorder.RecordingInterface(self.thDict[modName], recordFile, modName)
         
         #Make sure it know who the parent is
         self.thDict[modName].SetParent(self)
@@ -199,6 +225,31 @@ class ThermoAdmin(object):
 
         return 1
 
+    def RecordThermoProvider(self, provider, fileName):
+        """Log every call to a provider in fileName (see ThermoRecorder)"""
+        prov = self.thDict[provider]
+        if not isinstance(prov, ThermoRecorder.RecordingInterface):
+            self.thDict[provider] = ThermoRecorder.RecordingInterface(prov, fileName, provider)
+
+    def StopRecordingThermoProvider(self, provider):
+        """Put back the recorded provider and close its log"""
+        prov = self.thDict[provider]
+        if isinstance(prov, ThermoRecorder.RecordingInterface):
+            self.thDict[provider] = prov.GetWrappedProvider()
+            ThermoRecorder.StopRecording(prov._fileName)
+
+    def ReplayThermoProvider(self, provider, fileName, tol=None):
+        """Replace a provider with the results recorded in fileName"""
+        if self.thDict.has_key(provider):
+            cases = self.thDict[provider].GetContents()
+        else:
+            cases = []
+        replay = ThermoRecorder.ReplayInterface(fileName, provider, tol)
+        for thName, thCaseObj in cases:
+            replay.cases[thName] = (thCaseObj.package, thCaseObj)
+        replay.parent = self
+        self.thDict[provider] = replay
+
     def __ImportModule(self, modName):
         """Imports a module and returns its instance or None if error"""
         module = None
@@ -287,6 +338,10 @@ class ThermoAdmin(object):
             #Should raise an error
 
         self.thDict[provider].ChangeThermoCaseName(oldThName, newThName)
+        if self._surrogates.has_key((provider, oldThName)):
+            self._surrogates[(provider, newThName)] = self._surrogates[(provider, oldThName)]
+            del self._surrogates[(provider, oldThName)]
+        self._ForgetOilMemo(provider, oldThName)
         
         '''
         Watch out!  ThermoAdmin has no access to thermoCase objects, hence the 
@@ -313,6 +368,9 @@ class ThermoAdmin(object):
                 self.DeleteCompound(provider, thName, cmp)
                 
         self.thDict[provider].DeleteThermoCase(thName)
+        if self._surrogates.has_key((provider, thName)):
+            del self._surrogates[(provider, thName)]
+        self._ForgetOilMemo(provider, thName)
         
     def GetPropPkgString(self, provider, thName):
         """Retrives a string with the selected property package name/s"""
@@ -381,14 +439,56 @@ class ThermoAdmin(object):
 ##Oil methods ######################################################################################
 
     def CustomCommand(self, provider, thCase, cmd):
+        if not _IsQueryCommand(cmd):
+            #It may change any oil in the case
+            self._ForgetOilMemo(provider, thCase)
         try:
             return self.thDict[provider].CustomCommand(thCase, cmd)
         except SimError, e:
             return e.extraData
         except:
             raise SimError('ErrorValue', cmd + ' failed.') 
+
+    def _ForgetOilMemo(self, provider, thCase, oilName=None, assayName=None, memo=None):
+        """drop the memoised oil work of a thermo case, or only of an oil or an assay"""
+        for key in self._oilMemo.keys():
+            if key[1:3] == (provider, thCase) and oilName in (None, key[3]) and \
+               assayName in (None, key[4]) and memo in (None, key[0]):
+                del self._oilMemo[key]
+
+    def _InstalledFromCut(self, provider, thCase, assayObj):
+        """
+        memoised result of installing assayObj if it is still installed
+        from the same cut, else None
+        """
+        oilName, assayName = assayObj.parentObj.name, assayObj.name
+        cut = self._oilMemo.get((CUT_MEMO, provider, thCase, oilName, assayName), None)
+        installed = self._oilMemo.get((INSTALL_MEMO, provider, thCase, oilName, assayName), None)
+        if cut == None or installed == None or installed[0] != cut[0]:
+            return None
+        pseudos, result = installed[1]
+        selCmps = self.GetSelectedCompoundNames(provider, thCase)
+        for cmp in pseudos:
+            if not cmp in selCmps:
+                return None
+        return result
+
+    def _MemoiseInstall(self, provider, thCase, assayObj, result):
+        oilName, assayName = assayObj.parentObj.name, assayObj.name
+        key = (INSTALL_MEMO, provider, thCase, oilName, assayName)
+        cut = self._oilMemo.get((CUT_MEMO, provider, thCase, oilName, assayName), None)
+        if cut == None:
+            if self._oilMemo.has_key(key):
+                del self._oilMemo[key]
+            return
+        pseudos = self.thDict[provider].PseudoList(thCase, assayObj) or []
+        self._oilMemo[key] = (cut[0], (pseudos, result))
  
     def InstallOil(self, provider, thCase, assayObj):
+        # Nothing to do if the pseudo's of the same cut are installed
+        result = self._InstalledFromCut(provider, thCase, assayObj)
+        if result != None:
+            return result
         # First delete the pseudo's associated with this installed assay
         self.DeletePseudos(provider, thCase, assayObj)
         # count the number of existing compounds
@@ -413,9 +513,11 @@ class ThermoAdmin(object):
                             cmpCount += 1
                         except:
                             self.InfoMessage('ErrNotifyChangeCmp', (uo.GetPath(),), MessageHandler.errorMessage)
+        self._MemoiseInstall(provider, thCase, assayObj, result)
         return result
 
     def DeletePseudos(self, provider, thCase, assayObj):
+        self._ForgetOilMemo(provider, thCase, assayObj.parentObj.name, assayObj.name, INSTALL_MEMO)
         # Get the pseudo list
         pesudoList = self.thDict[provider].PseudoList(thCase, assayObj)
         if pesudoList:
@@ -423,18 +525,89 @@ class ThermoAdmin(object):
                 self.DeleteCompound(provider, thCase, cmp)
 
     def UpdateOil(self, provider, thCase, assayObj):
-        return self.thDict[provider].UpdateOil(thCase, assayObj)
+        result = self._InstalledFromCut(provider, thCase, assayObj)
+        if result != None:
+            return result
+        result = self.thDict[provider].UpdateOil(thCase, assayObj)
+        self._MemoiseInstall(provider, thCase, assayObj, result)
+        return result
 
     def CutAssay(self, provider, thCase, assayObj):
-        return self.thDict[provider].CutAssay(thCase, assayObj)
+        """
+        cut assayObj, passing all its data in one call to providers with
+        CutAssayData and the object itself to the others.
+        The cut is skipped if the data did not change since the last one
+        """
+        thProv = self.thDict[provider]
+        if not hasattr(thProv, 'CutAssayData'):
+            return thProv.CutAssay(thCase, assayObj)
+        oilName, assayName = assayObj.parentObj.name, assayObj.name
+        data = assayObj.GetAssayData()
+        inputs = ThermoRecorder.FrozenKey(data)
+        key = (CUT_MEMO, provider, thCase, oilName, assayName)
+        memo = self._oilMemo.get(key, None)
+        if memo != None and memo[0] == inputs:
+            return memo[1]
+        result = thProv.CutAssayData(thCase, oilName, assayName, data)
+        if result and result[0] == 0:
+            self._oilMemo[key] = (inputs, result)
+        elif memo != None:
+            del self._oilMemo[key]
+        return result
 
     def BlendAssay(self, provider, thCase, blend):
-        return self.thDict[provider].BlendAssay(thCase, blend)
-    
+        """
+        blend the assays of blend. Providers with BlendAssayData return the
+        data of the blend as well, which is loaded into blend.
+        The blend is reused if its assays were not cut again since the last one
+        """
+        thProv = self.thDict[provider]
+        if not hasattr(thProv, 'BlendAssayData'):
+            return thProv.BlendAssay(thCase, blend)
+        oilName = blend.parentObj.name
+        assayNames = [assay.name for assay in blend.assays]
+        inputs = [tuple(assayNames)]
+        for assayName in assayNames:
+            cut = self._oilMemo.get((CUT_MEMO, provider, thCase, oilName, assayName), None)
+            if cut == None:
+                inputs = None
+                break
+            inputs.append(cut[0])
+        key = (CUT_MEMO, provider, thCase, oilName, blend.name)
+        memo = self._oilMemo.get(key, None)
+        if inputs != None and memo != None and memo[0] == inputs:
+            result, data = memo[1]
+        else:
+            result, data = thProv.BlendAssayData(thCase, oilName, blend.name, assayNames)
+            if inputs != None and data != None:
+                self._oilMemo[key] = (inputs, (result, data))
+            elif memo != None:
+                del self._oilMemo[key]
+        if data != None:
+            blend.SetBlendData(data)
+        return result
+
+    def GetPseudoProperties(self, provider, thCase, assayObj, propNames):
+        """
+        properties of the pseudo components of the installed assayObj
+        returns (names, values) with a list of the values of propNames for
+        every pseudo component
+        """
+        thProv = self.thDict[provider]
+        oilName, assayName = assayObj.parentObj.name, assayObj.name
+        if hasattr(thProv, 'GetPseudoPropertyTable'):
+            return thProv.GetPseudoPropertyTable(thCase, oilName, assayName, propNames)
+        names = thProv.PseudoList(thCase, assayObj) or []
+        return names, [thProv.GetCompoundProperties(thCase, name, propNames) for name in names]
+
     def SetAssayParameterValue(self, provider, thCase, paramObj):
+        owner = paramObj.parentObj
+        if owner != None and owner.parentObj != None:
+            self._ForgetOilMemo(provider, thCase, owner.parentObj.name, owner.name, CUT_MEMO)
         return self.thDict[provider].SetAssayParameterValue(thCase, paramObj)
 
     def DeleteOilObject(self, provider, thCase, obj):
+        self._ForgetOilMemo(provider, thCase)
         return self.thDict[provider].DeleteOilObject(thCase, obj)
 
     def GetOilComposition(self, provider, thCase, obj):
@@ -627,8 +800,23 @@ class ThermoAdmin(object):
         inputData contains any necessary info requiered to calculate the required prop
         frac is just the composition
         """
+        Counters.Count(Counters.THERMO_CALLS)
         return self.thDict[provider].GetSpecialProperty(thName, inputData, frac, prop, nuPoints)
     
+    def GetSpecialArrayProperty(self, provider, thName, inputData, frac, prop, nuPoints=None):
+        """
+        Same as GetSpecialProperty but returns the values as a one dimensional
+        array of floats instead of a whitespace separated string.
+        Providers that implement GetSpecialArrayProperty can hand over the values
+        in binary form, otherwise the string is converted here
+        """
+        Counters.Count(Counters.THERMO_CALLS)
+        thermo = self.thDict[provider]
+        if hasattr(thermo, 'GetSpecialArrayProperty'):
+            return thermo.GetSpecialArrayProperty(thName, inputData, frac, prop, nuPoints)
+        value, status = thermo.GetSpecialProperty(thName, inputData, frac, prop, nuPoints)
+        return StringToFloatArray(value), status
+    
     def GetProperties(self, provider, thName, prop1, prop2, phase, frac, propList):
         """
         Return a list of properties corresponding to the types in propList.
@@ -641,8 +829,41 @@ class ThermoAdmin(object):
         array with one composition per row, then the return value will be a 2 dim
         Numeric.array
         """
+        Counters.Count(Counters.THERMO_CALLS)
         return self.thDict[provider].GetProperties(thName, prop1, prop2, phase, frac, propList)
 
+    def GetApproxProperties(self, provider, thName, prop1, prop2, phase, frac, propList):
+        """
+        Same as GetProperties but the values may come from an interpolating surrogate
+        registered for the thermo case (see RegisterSurrogate). Meant for early
+        iterations where an approximate value is good enough.
+        Falls back to GetProperties when no surrogate can answer
+        """
+        for obj in self._surrogates.get((provider, thName), []):
+            surrogate = obj.GetSurrogate()
+            if surrogate:
+                vals = surrogate.GetProperties(prop1, prop2, phase, frac, propList)
+                if vals != None:
+                    return vals
+        return self.GetProperties(provider, thName, prop1, prop2, phase, frac, propList)
+
+    def RegisterSurrogate(self, provider, thName, obj):
+        """
+        obj must have a GetSurrogate method returning None or an object with
+        a GetProperties(prop1, prop2, phase, frac, propList) method that returns None
+        for anything it can not interpolate
+        """
+        surrogates = self._surrogates.setdefault((provider, thName), [])
+        if not obj in surrogates:
+            surrogates.append(obj)
+
+    def UnregisterSurrogate(self, provider, thName, obj):
+        surrogates = self._surrogates.get((provider, thName), [])
+        if obj in surrogates:
+            surrogates.remove(obj)
+            if not surrogates:
+                del self._surrogates[(provider, thName)]
+
     def GetArrayProperty(self, provider, thName, prop1, prop2, phase, frac, property):
         """
         return a Numeric array containing properties of the type 'property'
@@ -656,10 +877,12 @@ class ThermoAdmin(object):
         must be a composition.  In this case a 2d Numeric array will be returned with
         one set of results per row
         """
+        Counters.Count(Counters.THERMO_CALLS)
         return self.thDict[provider].GetArrayProperty(thName, prop1, prop2, phase, frac, property)
     
     def GetIdealKValues(self, provider, thName, temperature, pressure):
         """return array of estimated K values based on just temperature and pressure"""
+        Counters.Count(Counters.THERMO_CALLS)
         return self.thDict[provider].GetIdealKValues(thName, temperature, pressure)
     
     def GetMolecularWeightValues(self, provider, thName):
@@ -701,6 +924,8 @@ class ThermoAdmin(object):
 
         return results object
         """        
+        Counters.Count(Counters.THERMO_CALLS)
+        Counters.Count(Counters.FLASHES)
         return self.thDict[provider].Flash(thName, cmps, properties, liqPhases, propList, self, nuSolids, stdVolRefT)
 ####################################################################################################
 
@@ -838,6 +1063,20 @@ class ThermoAdmin(object):
 ##The following are wrapper objects to interact with the CLI ########################################
     
             
+def _IsQueryCommand(cmd):
+    """True for custom commands that only get information (e.g. Oil.GetInputCurve...)"""
+    for token in cmd.split('.')[:2]:
+        if token[:3] == 'Get':
+            return True
+    return False
+
+def StringToFloatArray(value):
+    """Whitespace separated numbers to a one dimensional array of floats"""
+    if value == None:
+        return None
+    return numpy.fromstring(value, Float, sep=' ')
+
+
 class ThermoProvider(object):
     """Just wraps up thermo provider"""
     def __init__(self, unitOp, thermoAdmin, case, provider, pkgName):
@@ -0,0 +1,348 @@
+"""Recording and replay stand-ins for thermo providers
+
+Classes:
+RecordingInterface -- Wraps a thermo provider and logs every call
+ReplayInterface -- Serves the calls logged by RecordingInterface
+
+Remarks:
+The log is a gzip file with a stream of binary pickles, one record per
+call: (provider, method, structure, numbers, outcome, result). The
+arguments of a call are split in the floats (numbers) and everything
+else (structure) so the replay can look for the nearest recorded call
+with the same structure, within a relative tolerance.
+This makes command scripts deterministic, solver only benchmarks that
+run without the thermo provider.
+
+Set SIM42_THERMO_RECORD (or SIM42_THERMO_REPLAY) to a file name and every
+provider added with ThermoAdmin.SetNewThermoProvider is recorded (or
+replayed). SIM42_THERMO_REPLAY_TOL changes the replay tolerance.
+
+"""
+
+import os, gzip, atexit, copy
+import cPickle
+import numpy
+from sim.solver.Variables import CANFLASH_PROP
+from sim.solver.Error import SimError
+
+RECORD_ENV = 'SIM42_THERMO_RECORD'
+REPLAY_ENV = 'SIM42_THERMO_REPLAY'
+REPLAY_TOL_ENV = 'SIM42_THERMO_REPLAY_TOL'
+
+RECORDER_VERSION = 1
+DEFAULT_TOL = 1.0e-6
+
+#Outcome of a recorded call
+RETURNED = 0
+RAISED = 1
+
+#Calls that are about the object itself and never recorded
+_localMethods = ('SetParent', 'GetParent', 'SetName', 'GetName', 'GetPath', 'CleanUp',
+                 'GetContents', 'GetObject', 'DeleteObject', 'MergeProvider')
+
+_writers = {}       #file name: open gzip file shared by all the recorders
+_logs = {}          #file name: {provider: {(method, structure): [(numbers, outcome, result)]}}
+
+
+def _Freeze(obj, numbers):
+    """
+    Hashable structure of obj; the floats go to the list numbers and leave
+    a place holder behind
+    """
+    if isinstance(obj, (float, numpy.floating)):
+        numbers.append(float(obj))
+        return '#f'
+    if isinstance(obj, numpy.integer):
+        return int(obj)
+    if isinstance(obj, numpy.ndarray):
+        if obj.dtype.kind == 'f':
+            numbers.extend(obj.ravel().tolist())
+            return ('#a', obj.shape)
+        return ('#i', obj.shape, tuple(obj.ravel().tolist()))
+    if isinstance(obj, (list, tuple)):
+        return tuple([_Freeze(i, numbers) for i in obj])
+    if isinstance(obj, dict):
+        items = obj.items()
+        items.sort()
+        return tuple([(k, _Freeze(v, numbers)) for k, v in items])
+    if obj == None or isinstance(obj, (int, long, str, unicode)):
+        return obj
+    #Anything else (unit ops, assays, ...) only counts by its class
+    return '#' + obj.__class__.__name__
+
+
+def FrozenKey(obj):
+    """Hashable key of obj, equal for objects with equal values"""
+    numbers = []
+    structure = _Freeze(obj, numbers)
+    return structure, tuple(numbers)
+
+
+def _FlashArgs(thName, cmps, properties, liqPhCount, propList=None, thThermoAdmin=None,
+               nuSolids=0, stdVolRefT=None):
+    """The values a flash depends on, instead of the port objects"""
+    fixed = properties.GetNamesOfKnownFixedVars(CANFLASH_PROP)
+    calc = properties.GetNamesOfKnownCalcVars(CANFLASH_PROP)
+    spec = []
+    for name in fixed:
+        spec.append((name, 1, properties[name].GetValue()))
+    for name in calc:
+        spec.append((name, 0, properties[name].GetValue()))
+    spec.sort()
+    return (thName, cmps.GetValues(), spec, liqPhCount, propList, nuSolids, stdVolRefT)
+
+
+def _CallKey(method, args, kw):
+    if method == 'Flash':
+        args = _FlashArgs(*args, **kw)
+    elif kw:
+        args = (args, kw)
+    numbers = []
+    structure = _Freeze(args, numbers)
+    return structure, numpy.array(numbers, 'd')
+
+
+def _Identity(obj):
+    return obj
+
+
+def _CloseWriters():
+    for f in _writers.values():
+        f.close()
+    _writers.clear()
+
+atexit.register(_CloseWriters)
+
+
+def _Writer(fileName):
+    f = _writers.get(fileName, None)
+    if f == None:
+        f = gzip.open(fileName, 'wb')
+        cPickle.dump(('ThermoRecorder', RECORDER_VERSION), f, 2)
+        _writers[fileName] = f
+    return f
+
+
+def StopRecording(fileName):
+    """Close the log so it can be replayed"""
+    f = _writers.get(fileName, None)
+    if f != None:
+        f.close()
+        del _writers[fileName]
+
+
+def LoadLog(fileName):
+    """Calls of a log grouped by provider, method and structure"""
+    log = _logs.get(fileName, None)
+    if log != None:
+        return log
+    log = {}
+    f = gzip.open(fileName, 'rb')
+    try:
+        header = cPickle.load(f)
+        if header[0] != 'ThermoRecorder':
+            raise SimError('ErrorValue', '%s is not a thermo recording' % fileName)
+        while 1:
+            try:
+                provider, method, structure, numbers, outcome, result = cPickle.load(f)
+            except (EOFError, IOError):
+                #A log of a run that did not finish is still good up to here
+                break
+            calls = log.setdefault(provider, {}).setdefault((method, structure), [])
+            calls.append((numbers, outcome, result))
+    finally:
+        f.close()
+    _logs[fileName] = log
+    return log
+
+
+def IsRecorded(fileName, name):
+    """True if the log has calls to the provider name"""
+    return LoadLog(fileName).has_key(name)
+
+
+class RecordingInterface(object):
+    """Thermo provider that logs every call to the provider it wraps"""
+    def __init__(self, provider, fileName, name=None):
+        self._provider = provider
+        self._fileName = fileName
+        self._name = name or provider.GetName()
+
+    def __reduce__(self):
+        """Cases are stored with the wrapped provider, not the recorder"""
+        return (_Identity, (self._provider,))
+
+    def GetWrappedProvider(self):
+        return self._provider
+
+    def SetName(self, name):
+        self._name = name
+        self._provider.SetName(name)
+
+    def __getattr__(self, method):
+        if method[:2] == '__':
+            raise AttributeError(method)
+        attr = getattr(self._provider, method)
+        if method in _localMethods or not callable(attr):
+            return attr
+        def Call(*args, **kw):
+            return self._Call(method, attr, args, kw)
+        return Call
+
+    def _Call(self, method, attr, args, kw):
+        structure, numbers = _CallKey(method, args, kw)
+        try:
+            result = attr(*args, **kw)
+        except SimError, e:
+            self._Write(method, structure, numbers, RAISED, (e.messageKey, e.extraData))
+            raise
+        if method == 'AddPkgFromName':
+            #The thermo case object is rebuilt by the replay
+            self._Write(method, structure, numbers, RETURNED, None)
+        else:
+            self._Write(method, structure, numbers, RETURNED, result)
+        return result
+
+    def _Write(self, method, structure, numbers, outcome, result):
+        try:
+            record = cPickle.dumps((self._name, method, structure, numbers, outcome, result), 2)
+        except (cPickle.PicklingError, TypeError):
+            record = cPickle.dumps((self._name, method, structure, numbers, outcome, None), 2)
+        _Writer(self._fileName).write(record)
+
+
+class ReplayInterface(object):
+    """Thermo provider that answers with the results of a recording"""
+    def __init__(self, fileName, name, tol=None):
+        self._fileName = fileName
+        self._name = name
+        if tol == None:
+            tol = float(os.environ.get(REPLAY_TOL_ENV, DEFAULT_TOL))
+        self.tol = tol
+        self.parent = None
+        self.cases = {}         #thName: (pkgName, ThermoCase)
+        self._matrices = {}     #(method, structure): numbers of every recorded call as rows
+        self._cursors = {}      #(method, structure): next call without numbers to replay
+        self.stats = {'hits': 0, 'misses': 0}
+        self._calls = LoadLog(fileName).get(name, {})
+
+    def __getstate__(self):
+        return (self._fileName, self._name, self.tol, self.parent, self.cases)
+
+    def __setstate__(self, state):
+        fileName, name, tol, parent, cases = state
+        self.__init__(fileName, name, tol)
+        self.parent = parent
+        self.cases = cases
+
+    def SetParent(self, parent):
+        from ThermoAdmin import ThermoCase
+        if self.parent != parent:
+            for thName, (pkgName, thCaseObj) in self.cases.items():
+                self.cases[thName] = (pkgName, ThermoCase(parent, self._name, thName, pkgName))
+        self.parent = parent
+
+    def GetParent(self):
+        return self.parent
+
+    def SetName(self, name):
+        self._name = name
+
+    def GetName(self):
+        return self._name
+
+    def GetPath(self):
+        if self.parent:
+            return self.parent.GetPath() + '.' + self._name
+        return None
+
+    def CleanUp(self):
+        for pkgName, thCaseObj in self.cases.values():
+            if thCaseObj: thCaseObj.CleanUp()
+        self.cases = {}
+        self.parent = None
+
+    def GetContents(self):
+        return [(thName, thCaseObj) for thName, (pkgName, thCaseObj) in self.cases.items()]
+
+    def GetObject(self, desc):
+        if self.cases.has_key(desc):
+            return self.cases[desc][1]
+        return None
+
+    def DeleteObject(self, obj):
+        if obj.thermoAdmin == self.parent and self.cases.has_key(obj.case):
+            for uo in obj.GetUnitOps():
+                uo.thCaseObj = None
+            self.parent.DeleteThermoCase(self._name, obj.case)
+
+    def MergeProvider(self, fProv):
+        self.cases.update(fProv.cases)
+
+    def GetReplayStats(self):
+        """Dictionary with the number of calls found (hits) and not found (misses)"""
+        return dict(self.stats)
+
+    def AddPkgFromName(self, thName, pkgName):
+        from ThermoAdmin import ThermoCase
+        self._Replay('AddPkgFromName', (thName, pkgName), {})
+        thCaseObj = None
+        if self.parent:
+            thCaseObj = ThermoCase(self.parent, self._name, thName, pkgName)
+        self.cases[thName] = (pkgName, thCaseObj)
+        return thCaseObj
+
+    def DeleteThermoCase(self, thName):
+        self._Replay('DeleteThermoCase', (thName,), {})
+        if self.cases.has_key(thName):
+            del self.cases[thName]
+
+    def ChangeThermoCaseName(self, oldThName, newThName):
+        self._Replay('ChangeThermoCaseName', (oldThName, newThName), {})
+        if self.cases.has_key(oldThName) and not self.cases.has_key(newThName):
+            self.cases[newThName] = self.cases[oldThName]
+            del self.cases[oldThName]
+
+    def __getattr__(self, method):
+        if method[:2] == '__' or method[0] == '_':
+            raise AttributeError(method)
+        def Call(*args, **kw):
+            return self._Replay(method, args, kw)
+        return Call
+
+    def _Matrix(self, key, calls):
+        matrix = self._matrices.get(key, None)
+        if matrix is None:
+            matrix = numpy.array([numbers for numbers, outcome, result in calls], 'd')
+            self._matrices[key] = matrix
+        return matrix
+
+    def _Replay(self, method, args, kw):
+        structure, numbers = _CallKey(method, args, kw)
+        key = (method, structure)
+        calls = self._calls.get(key, None)
+        if not calls:
+            self.stats['misses'] += 1
+            if len(numbers):
+                raise SimError('ErrorValue', 'No recorded thermo call %s.%s like this one' % (self._name, method))
+            return None
+
+        if len(numbers):
+            matrix = self._Matrix(key, calls)
+            err = numpy.absolute(matrix - numbers)/(numpy.absolute(numbers) + 1.0)
+            err = err.max(axis=1)
+            idx = err.argmin()
+            if err[idx] > self.tol:
+                self.stats['misses'] += 1
+                raise SimError('ErrorValue', 'No recorded thermo call %s.%s within %g' % (self._name, method, self.tol))
+        else:
+            #In the recorded order, to follow the state of the provider
+            idx = min(self._cursors.get(key, 0), len(calls) - 1)
+            self._cursors[key] = idx + 1
+
+        self.stats['hits'] += 1
+        numbers, outcome, result = calls[idx]
+        if outcome == RAISED:
+            raise SimError(result[0], result[1])
+        #Callers are free to change what they get, as with a real provider
+        return copy.deepcopy(result)
@@ -907,6 +907,14 @@ class ThermoInterface(object):
                 pass
         return outputData, status
         
+    def GetSpecialArrayProperty(self, thName, inputData, frac, prop, nuPoints=None):
+        """
+        Same as GetSpecialProperty but returns a one dimensional array of floats
+        """
+        outputData, status = self.GetSpecialProperty(thName, inputData, frac, prop, nuPoints)
+        if outputData == None:
+            return None, status
+        return numpy.fromstring(outputData, Float, sep=' '), status
     
     
     def GetProperties(self, thName, inProp1, inProp2, phase, frac, propList):
@@ -945,29 +953,20 @@ class ThermoInterface(object):
 
 
         
-        needsFlash = 0
-        if phase == OVERALL_PHASE:
-            needsFlash = 1
-            
         phase = self.propHandler.PhaseNameFromSimToVmg(phase)
-        
-##        feed = vmg.RegisterObject(hnd, 'feed')
         propIDs = self.propHandler.PropNamesFromSimToVmg(propList)
-        
-        if (phase == OVERALL_PHASE) or \
-           (not T_VAR in (inProp1[0], inProp2[0])) or \
-           (not P_VAR in (inProp1[0], inProp2[0])):
-            needsFlash = 1
-##        if needsFlash:
-##            vap = vmg.RegisterObject(hnd, 'vap')
-##            liq0 = vmg.RegisterObject(hnd, 'liq0')
-##            liq1 = vmg.RegisterObject(hnd, 'liq1')
-            
         prop1Type, prop2Type = self.propHandler.PropNamesFromSimToVmg((inProp1[0], inProp2[0]))
         prop1 = inProp1[1]
         prop2 = inProp2[1]
+
+        needsFlash = numpy.sometrue(numpy.equal(phase, OVERALL_PHASE)) or \
+                     (not T_VAR in (inProp1[0], inProp2[0])) or \
+                     (not P_VAR in (inProp1[0], inProp2[0]))
+        liqPhases, phasesOut, phasesFracs = 2, [vap, liq0, liq1], []
+        if needsFlash:
+            flType, props = self.DecideTypeOfFlash((inProp1[0], inProp2[0]), ())
         
-        if type(prop1) != type(Numeric.array(())):
+        if not isinstance(prop1, numpy.ndarray):
             vmg.SetMultipleObjectDoubleValues(hnd, feed, (prop1Type, prop2Type, seaPhaseType),
                                               (prop1, prop2, phase))
 
@@ -977,8 +976,6 @@ class ThermoInterface(object):
                 
             else:
                 #Do a flash calculation
-                flType, props = self.DecideTypeOfFlash((inProp1[0], inProp2[0]), ())
-                liqPhases, phasesOut, phasesFracs = 2, [vap, liq0, liq1], []
                 phasesFracs = vmg.EquilibriumObjectFlash(hnd, 0, flType, liqPhases, 0, 0, feed, phasesOut, phasesFracs)
                 if phase == OVERALL_PHASE:
                     values =  vmg.MultipleBulkObjectDoubleValues(hnd, liqPhases, 0, 0, feed, phasesOut, phasesFracs, propIDs, seaSeapp)
@@ -988,39 +985,27 @@ class ThermoInterface(object):
                     values = vmg.GetMultipleObjectDoubleValues(hnd, liq0, propIDs)
 
         else:
-            valueArrays = []#zeros((len(prop1), len(propIDs)), Float)
-            
-            if needsFlash:
-                flType, props = self.DecideTypeOfFlash((inProp1[0], inProp2[0]), ())
-                liqPhases, phasesOut, phasesFracs = 2, [vap, liq0, liq1], []
-            
-                
-            if not needsFlash:
-                self._hnd = hnd
-                self._feed = feed
-                self._prop1Type = prop1Type
-                self._prop2Type = prop2Type
-                self._propIDs = propIDs
-                valueArrays = map(self._PropertiesForIter, prop1, prop2, phase, frac)
-            else:
-                
-                for i in range(len(prop1)):
-                    vmg.SetMultipleObjectDoubleValues(hnd, feed, (prop1Type, prop2Type, seaPhaseType),
-                                                      (prop1[i], prop2[i], phase[i]))
-                    vmg.SetObjectDoubleArrayValues(hnd, feed, seaComposition, frac[i])
-                    if not needsFlash:
-                        valueArrays.append(vmg.GetMultipleObjectDoubleValues(hnd, feed, propIDs))
-                    else:
-                        #Do a flash calculation
-                        phasesFracs = vmg.EquilibriumObjectFlash(hnd, 0, flType, liqPhases, 0, 0, feed, phasesOut, phasesFracs)
-                        if phase[i] == OVERALL_PHASE:
-                            valueArrays.append(vmg.MultipleBulkObjectDoubleValues(hnd, liqPhases, 0, 0, feed, phasesOut, phasesFracs, propIDs, seaSeapp))
-                        elif phase[i] == VAPOUR_PHASE: 
-                            valueArrays.append(vmg.GetMultipleObjectDoubleValues(hnd, vap, propIDs))
-                        elif phase[i] == LIQUID_PHASE: 
-                            valueArrays.append(vmg.GetMultipleObjectDoubleValues(hnd, liq0, propIDs))
-                
-            values = Numeric.array(valueArrays)
+            #One row per stage/segment. The result is allocated once and
+            #filled row by row
+            nuRows = len(prop1)
+            values = zeros((nuRows, len(propIDs)), Float)
+            phase = numpy.resize(phase, (nuRows,))
+            
+            for i in range(nuRows):
+                vmg.SetMultipleObjectDoubleValues(hnd, feed, (prop1Type, prop2Type, seaPhaseType),
+                                                  (prop1[i], prop2[i], phase[i]))
+                vmg.SetObjectDoubleArrayValues(hnd, feed, seaComposition, frac[i])
+                if not needsFlash:
+                    values[i] = vmg.GetMultipleObjectDoubleValues(hnd, feed, propIDs)
+                else:
+                    #Do a flash calculation
+                    phasesFracs = vmg.EquilibriumObjectFlash(hnd, 0, flType, liqPhases, 0, 0, feed, phasesOut, phasesFracs)
+                    if phase[i] == OVERALL_PHASE:
+                        values[i] = vmg.MultipleBulkObjectDoubleValues(hnd, liqPhases, 0, 0, feed, phasesOut, phasesFracs, propIDs, seaSeapp)
+                    elif phase[i] == VAPOUR_PHASE: 
+                        values[i] = vmg.GetMultipleObjectDoubleValues(hnd, vap, propIDs)
+                    elif phase[i] == LIQUID_PHASE: 
+                        values[i] = vmg.GetMultipleObjectDoubleValues(hnd, liq0, propIDs)
             
         return values
         
@@ -1052,7 +1037,7 @@ class ThermoInterface(object):
         prop1 = inProp1[1]
         prop2 = inProp2[1]
 
-        if type(prop1) != type(Numeric.array(())):
+        if not isinstance(prop1, numpy.ndarray):
             vmg.SetMultipleObjectDoubleValues(hnd, feed,
                                               (prop1Type, prop2Type, seaPhaseType),
                                               (prop1, prop2, phase))
@@ -1080,7 +1065,7 @@ class ThermoInterface(object):
                     #vmg.SetObjectDoubleArrayValues(hnd, feed, seaComposition, frac[i])
                     #valueArrays.append(vmg.GetObjectDoubleArrayValues(hnd, feed, propID, 0))
                 
-            values = Numeric.array(valueArrays)
+            values = array(valueArrays)
        
         return values        
         
@@ -1101,7 +1086,7 @@ class ThermoInterface(object):
         
 ##        feed = vmg.RegisterObject(hnd, 'feed')
         
-        if type(t) != type(Numeric.array(())):
+        if not isinstance(t, numpy.ndarray):
             vmg.SetMultipleObjectDoubleValues(hnd, feed, (seaTemperature, seaPressure, seaPhaseType), (t, p, seaVapourPhase))
             kvalues = vmg.GetObjectDoubleArrayValues(hnd, feed, seaIdealKValue, 0)
         else:
@@ -1111,7 +1096,7 @@ class ThermoInterface(object):
                                                   (t[i], p[i], seaVapourPhase))
                 kArrays.append(vmg.GetObjectDoubleArrayValues(hnd, feed, seaIdealKValue, 0))
                 
-            kvalues = Numeric.array(kArrays)
+            kvalues = array(kArrays)
        
 ##        vmg.UnregisterObject(hnd, feed)
         return kvalues
@@ -1135,13 +1120,6 @@ class ThermoInterface(object):
         #return vmg.SelectedCompoundDoubleProperty(self._hnd, cmpNo, 'MolecularWeight', 1)
     
     
-    def _PropertiesForIter(self, prop1, prop2, phase, frac):
-        feed = self._feed
-        hnd = self._hnd
-        vmg.SetMultipleObjectDoubleValues(hnd, feed, (self._prop1Type, self._prop2Type, seaPhaseType), (prop1, prop2, phase))
-        vmg.SetObjectDoubleArrayValues(hnd, feed, seaComposition, frac)
-        return  vmg.GetMultipleObjectDoubleValues(hnd, feed, self._propIDs)
-        
     def _ArrPropertiesForIter(self, prop1, prop2, phase, frac):
         feed = self._feed
         hnd = self._hnd
@@ -1905,8 +1883,9 @@ class ThermoInterface(object):
         return self.CustomCommand(thCase, cmd)
 
     def PseudoList(self, thCase, assayObj):
-        oilName = assayObj.parentObj.name
-        assayName = assayObj.name        
+        return self._PseudoList(thCase, assayObj.parentObj.name, assayObj.name)
+
+    def _PseudoList(self, thCase, oilName, assayName):
         hnd = self.gPkgHandles[thCase][0]
         if self._AssayExists(hnd, oilName, assayName) == 1:
             cmd = 'Oil.PseudoList.' + oilName + '.' + assayName
@@ -1915,6 +1894,11 @@ class ThermoInterface(object):
         else:
             return None
 
+    def GetPseudoPropertyTable(self, thCase, oilName, assayName, propNames):
+        """(names, values) of propNames of the pseudo components of an installed assay"""
+        names = filter(None, self._PseudoList(thCase, oilName, assayName) or [])
+        return names, [self.GetCompoundProperties(thCase, name, propNames) for name in names]
+
     def UpdateOil(self, thCase, assayObj):
         assayName = assayObj.parentObj.name + '.' + assayObj.name
         cmd = 'Oil.UpdateOil.' + assayName
@@ -1931,22 +1915,22 @@ class ThermoInterface(object):
         return cmp
 
 
-    def BlendAssay(self, thCase, blend):
+    def BlendAssayData(self, thCase, oilName, blendName, assayNames):
+        """
+        blend the assays assayNames of oilName into blendName
+        returns (result, data) with the data of the blend (see Oils.Assay.GetAssayData),
+        None if it failed
+        """
         hnd = self.gPkgHandles[thCase][0]
-        nAssay = len(blend.assayNames)
-        oilName = blend.parentObj.name
-        cmd = 'Blend ' + blend.name + ' ' + oilName + ' ' + str(nAssay)
-        # count number of assays
-        for assay in blend.assays:
-            cmd = cmd + ' ' + assay.name
+        cmd = 'Blend ' + blendName + ' ' + oilName + ' ' + str(len(assayNames))
+        for assayName in assayNames:
+            cmd = cmd + ' ' + assayName
             
         result = self._VMGCommand(hnd, 'Oil', cmd)
         if result[0] == 0:
             #ok, retrieve the blend info (light ends, curves) data
-            self.UpdateAssayPropertiesFromPkg(thCase, blend)
-            blend.IsUpToDate(1)
-            blend.state = Oils.AssayStateCut
-        return result
+            return result, self.GetAssayData(thCase, oilName, blendName)
+        return result, None
 
     def SetAssayParameterValue(self, thCase, paramObj):
         assayObj = paramObj.parentObj
@@ -1961,20 +1945,19 @@ class ThermoInterface(object):
                     result = self._VMGCommand(hnd, "Oil", cmd)
                     return result                
 
-    def CutAssay(self, thCase, assayObj):
+    def CutAssayData(self, thCase, oilName, assayName, data):
+        """
+        create the assay assayName of oilName from data (see Oils.Assay.GetAssayData)
+        and cut it
+        """
         hnd = self.gPkgHandles[thCase][0]
-
-        oilName = assayObj.parentObj.name
-        assayName = assayObj.name
-        assayPath = oilName + ' ' + assayObj.name
+        assayPath = oilName + ' ' + assayName
 
         # If oil do not exist, create it.
-        result = self._VMGCommand(hnd, 'Oil', 'GetOilNames')
-        names = string.replace(result[1], ' ', '')
-        names = string.split(names, ';')
-        if oilName in names:
+        if oilName in self._OilNames(hnd):
             # Delete the existing assay, if it exists
-            self._DeleteAssay(hnd, oilName, assayName)
+            if assayName in self._AssayNames(hnd, oilName):
+                self._VMGCommand(hnd, 'Oil', 'DeleteAssay ' + assayPath)
         else:
             result = self._VMGCommand(hnd, 'Oil', 'AddOil ' + oilName)
 
@@ -1983,49 +1966,45 @@ class ThermoInterface(object):
 
         # Assay now exists but empty
         # First set all parameters
-        exptType = ''
-        for key in assayObj.parameters.keys():
-            value = assayObj.parameters[key].GetValue()
-            if value and str(value) != '':
-                if key == 'EXPERIMENT':
-                    exptType = value
-                cmd = "AssayBulkValue " + assayPath + " " + key + " " +  str(value)
-                result = self._VMGCommand(hnd, "Oil", cmd)
-                if result[0] < 0:
-                    return result
+        params = data[Oils.ASSAY_PARAMETERS]
+        exptType = params.get(Oils.EXPERIMENT_PARAM, '')
+        for key in params.keys():
+            cmd = "AssayBulkValue " + assayPath + " " + key + " " +  str(params[key])
+            result = self._VMGCommand(hnd, "Oil", cmd)
+            if result[0] < 0:
+                return result
 
         # Next, add the required distillation curve, optional MW and density curves
         #if exptType == '', the default experiment type, TBP,  shall be used
         #    return [-1, 'Experiment type not specified']
+        curves = data[Oils.ASSAY_CURVES]
         if exptType == 'CHROMATOGRAPH':
-            if assayObj.chromatograph == None:
+            if not curves.has_key(Oils.EXPERIMENT_CHROMATOGRAPH):
                 return [-1, 'Missing chromatograph data']
             else:
-                result = self._SpecifyOilExperiment(hnd, 'AddChromoPoint ' + assayPath, assayObj.chromatograph)
-        elif assayObj.distCurve == None:
+                result = self._SpecifyOilCurve(hnd, 'AddChromoPoint ' + assayPath, curves[Oils.EXPERIMENT_CHROMATOGRAPH])
+        elif not curves.has_key(Oils.EXPERIMENT_DIST):
             return [-1, 'Missing distillation Curve']
         else:
-            result = self._SpecifyOilExperiment(hnd, 'AddDistillationCurve ' + assayPath, assayObj.distCurve)
+            result = self._SpecifyOilCurve(hnd, 'AddDistillationCurve ' + assayPath, curves[Oils.EXPERIMENT_DIST])
         if result[0] < 0:
             return result
-        if assayObj.MWCurve != None:
-            result = self._SpecifyOilExperiment(hnd, 'AddMolecularWeightCurve ' + assayPath, assayObj.MWCurve)
+        if curves.has_key(Oils.EXPERIMENT_MW):
+            result = self._SpecifyOilCurve(hnd, 'AddMolecularWeightCurve ' + assayPath, curves[Oils.EXPERIMENT_MW])
             if result[0] < 0:
                 return result
-        if assayObj.denCurve != None:
-            result = self._SpecifyOilExperiment(hnd, 'AddLiquidDensityCurve ' + assayPath, assayObj.denCurve)
+        if curves.has_key(Oils.EXPERIMENT_DEN):
+            result = self._SpecifyOilCurve(hnd, 'AddLiquidDensityCurve ' + assayPath, curves[Oils.EXPERIMENT_DEN])
             if result[0] < 0:
                 return result
 
         # Add light ends if exists
-        lightEnds = assayObj.lightEnds.lightEndDict    
+        lightEnds = data[Oils.ASSAY_LIGHTENDS]
         for key in lightEnds.keys():
-            value = lightEnds[key].GetValue()
-            if value > 0.0:
-                cmd = 'AddLightEnds ' + assayPath + ' ' + key + ' ' + str(value)
-                result = self._VMGCommand(hnd, "Oil", cmd)
-                if result[0] < 0:
-                    return result
+            cmd = 'AddLightEnds ' + assayPath + ' ' + key + ' ' + str(lightEnds[key])
+            result = self._VMGCommand(hnd, "Oil", cmd)
+            if result[0] < 0:
+                return result
             
         # cut the assay
         cmd = 'Cut ' + assayPath
@@ -2041,96 +2020,84 @@ class ThermoInterface(object):
         elif isinstance(obj, Oils.Oil):
             self._DeleteOil (hnd, obj.name)
    
-    def UndateLightEndsFromPkg(self, hnd, assayObj, path):
-        cmd = 'GetInputCurve LightEnds ' + path
-        response = self._VMGCommand(hnd, 'Oil', cmd)
+    def _GetInputCurve(self, hnd, exptType, path):
+        """list of the values of the input curve exptType, None if not there"""
+        response = self._VMGCommand(hnd, 'Oil', 'GetInputCurve ' + exptType + ' ' + path)
         if response[0] == 0:
-            var = string.split(response[1], ' ')
-            for i in range(0, len(var), 2):
-                if var and var[i] != '':
-                    name = string.strip(var[i])
-                    frac = float(var[i+1])
-                    if frac > 0.0:
-                        assayObj.lightEnds.AddObject(frac, name)
-    
-    def UndateExperimentFromPkg(self, exptType, hnd, assayObj, path):
-        cmd = 'GetInputCurve ' + exptType + ' ' + path
-        response = self._VMGCommand(hnd, 'Oil', cmd)
-        if response[0] == 0:
-            # create the experiment
-            curve = Oils.OilExperiment(exptType)
-            # give the experiment to the assay
-            assayObj.AddObject(curve, exptType)
-            # assign the value
-            data = string.split(response[1], ' ')
-            x = []
-            y = []
-            for i in range(0,len(data), 2):
-                if data[i] and data[i] != '':
-                    x.append(float(data[i]))
-                    y.append(float(data[i+1]))
-            curve.GetObject('Series0').SetValues(x)
-            curve.GetObject('Series1').SetValues(y)
+            return string.split(response[1], ' ')
+        return None
 
-    def UpdateAssayPropertiesFromPkg(self, thCase, assayObj):
+    def GetAssayData(self, thCase, oilName, assayName):
+        """
+        the assay assayName of oilName as in the package, in the form of
+        Oils.Assay.GetAssayData
+        """
         hnd = -1
         if thCase:
             hnd = self.gPkgHandles[thCase][0]
-        oilName = assayObj.parentObj.name
-        assayName = assayObj.name
         path = oilName + ' ' + assayName
         # get all the assay parameters
-        cmd = 'GetAssayBulkProperty ' + path
-        paramStr = self._VMGCommand(hnd, 'Oil', cmd)
-        params = string.split(paramStr[1], ';')
-        for par in params:
-            # create the oil parameters
+        params = {}
+        paramStr = self._VMGCommand(hnd, 'Oil', 'GetAssayBulkProperty ' + path)
+        for par in string.split(paramStr[1], ';'):
             var = string.split(par,':')
-            addData = 1
             try:
                 val = float(var[1])
                 if val == VMGUnknown:
-                    addData = 0
+                    continue
             except ValueError:
                 val = str(var[1])  # leave it as string
-            if addData == 1:
-                parName = string.strip(var[0])
-                paramObj = Oils.OilParameter(GENERIC_VAR, val)
-                paramObj.parentObj = assayObj
-                paramObj.name = parName
-                assayObj.parameters[parName] = paramObj
+            params[string.strip(var[0])] = val
+
         # get the light ends
-        self.UndateLightEndsFromPkg(hnd, assayObj, path)
-        # get the density curve
-        self.UndateExperimentFromPkg('DensityCurve', hnd, assayObj, path)        
-        # get the MW curve
-        self.UndateExperimentFromPkg('MWCurve', hnd, assayObj, path)        
-        # get the distillation curve
-        self.UndateExperimentFromPkg('DistillationCurve', hnd, assayObj, path)        
+        lightEnds = {}
+        var = self._GetInputCurve(hnd, 'LightEnds', path)
+        if var != None:
+            for i in range(0, len(var), 2):
+                if var and var[i] != '':
+                    frac = float(var[i+1])
+                    if frac > 0.0:
+                        lightEnds[string.strip(var[i])] = frac
+
+        # get the density, MW and distillation curves
+        curves = {}
+        for exptType in (Oils.EXPERIMENT_DEN, Oils.EXPERIMENT_MW, Oils.EXPERIMENT_DIST):
+            data = self._GetInputCurve(hnd, exptType, path)
+            if data != None:
+                x = []
+                y = []
+                for i in range(0,len(data), 2):
+                    if data[i] and data[i] != '':
+                        x.append(float(data[i]))
+                        y.append(float(data[i+1]))
+                curves[exptType] = (x, y)
+                
+        return {Oils.ASSAY_PARAMETERS: params, Oils.ASSAY_CURVES: curves, Oils.ASSAY_LIGHTENDS: lightEnds}
+
+    def UpdateAssayPropertiesFromPkg(self, thCase, assayObj):
+        assayObj.SetAssayData(self.GetAssayData(thCase, assayObj.parentObj.name, assayObj.name))
         return 1       
                          
             
-    def _AssayExists(self, hnd, oilName, assayName):
-        # Check if the oil exists
+    def _OilNames(self, hnd):
         result = self._VMGCommand(hnd, 'Oil', 'GetOilNames')
-        names = string.replace(result[1], ' ', '')
-        names = string.split(names, ';')
-        if oilName in names:        
-            #Check if the assay exists
-            result = self._VMGCommand(hnd, 'Oil', 'GetAssayNames ' + oilName)
-            names = string.replace(result[1], ' ', '')
-            names = string.split(names, ';')
-            if assayName in names:
+        return string.split(string.replace(result[1], ' ', ''), ';')
+
+    def _AssayNames(self, hnd, oilName):
+        result = self._VMGCommand(hnd, 'Oil', 'GetAssayNames ' + oilName)
+        return string.split(string.replace(result[1], ' ', ''), ';')
+
+    def _AssayExists(self, hnd, oilName, assayName):
+        # Check if the oil and then the assay exist
+        if oilName in self._OilNames(hnd):
+            if assayName in self._AssayNames(hnd, oilName):
                 return 1
         return 0
 
 
     def _DeleteOil(self, hnd, oilName):
         # Delete the oil if it exists
-        result = self._VMGCommand(hnd, 'Oil', 'GetOilNames')
-        names = string.replace(result[1], ' ', '')
-        names = string.split(names, ';')
-        if oilName in names:
+        if oilName in self._OilNames(hnd):
             self._VMGCommand(hnd, 'Oil', 'DeleteOil ' + oilName)
 
     def _DeleteAssay(self, hnd, oilName, assayName):
@@ -2160,20 +2127,15 @@ class ThermoInterface(object):
             self.GetParent().InfoMessage('ErrorValue', result[1])
         return result
 
-    def _SpecifyOilExperiment(self, hnd, key, tbl):
-        x = tbl.GetSeries(0)
-        y = tbl.GetSeries(1)
+    def _SpecifyOilCurve(self, hnd, key, points):
+        # points are the (x, y) lists of Oils.OilExperiment.GetPoints
         result = (0,'OK')
-        if x and y:
-            nx = x.GetLen()
-            ny = y.GetLen()
-            if nx == ny:
-                for i in range(nx):
-                    if y.GetDataPoint(i) != None and x.GetDataPoint(i) != None:
-                        cmd = key + ' ' + str(x.GetDataPoint(i)) + ' ' + str(y.GetDataPoint(i))
-                        result = self._VMGCommand(hnd, "Oil", cmd)
-                        if result[0] < 0:
-                            return result
+        x, y = points
+        for i in range(len(x)):
+            cmd = key + ' ' + str(x[i]) + ' ' + str(y[i])
+            result = self._VMGCommand(hnd, "Oil", cmd)
+            if result[0] < 0:
+                return result
         return result
 
     def _ConvertStringToDict(self, str, separator):
@@ -15,6 +15,30 @@ S_MAT = 'Mat'
 S_ENE = 'Ene'
 BALANCETYPE_PAR = 'BalanceType'
 
+MIN_DETERMINANT = 0.0001
+
+
+def _FractionsArray(ports):
+    """mole fractions of ports as the rows of an array, nan where unknown"""
+    return numpy.array([[x is None and numpy.nan or x for x in port.GetCompositionValues()]
+                        for port in ports], numpy.float64)
+
+def _IndependentRows(a, b, nuRows):
+    """
+    the first nuRows rows of a (with their rhs in b) that are linearly
+    independent of the rows before them
+    """
+    if len(a) >= nuRows and abs(determinant(array(a[:nuRows]))) >= MIN_DETERMINANT:
+        return a[:nuRows], b[:nuRows]
+    rows, rhs = [], []
+    for i in range(len(a)):
+        if numpy.linalg.matrix_rank(array(rows + [a[i]])) == len(rows) + 1:
+            rows.append(a[i])
+            rhs.append(b[i])
+            if len(rows) == nuRows:
+                break
+    return rows, rhs
+
 class Balance:
     def __init__(self, type):
         self.type = type
@@ -276,6 +300,7 @@ class Balance:
                     for i in range(len(myPortLst)-1):
                         myPortLst[i].SharePropWith(myPortLst[i+1], H_VAR)
 
+        fracs = None   # fractions of inlets and outlets, read once
         nuMissing = len(missing)
         if nuMissing == 0:
             # all flows known, but do consistency check
@@ -352,51 +377,31 @@ class Balance:
                         b.append(sumq * 3.6)
                         a.append(row)
                         
-            # look for mole fractions to use
-            for cmpNo in range(len(aPort.GetCompounds())):
-                if len(a) == nuMissing:
-                    break  # have enough equations
-                
-                # see if all missing ports have mole fractions
-                row = []
-                for i in missing:
-                    (port, isIn) = i
-                    x = port.GetCompounds()[cmpNo].GetValue()
-                    if x == None:
-                        break  # need them all
-                    if isIn: row.append(x)
-                    else: row.append(-x)
-                
-                if len(row) != nuMissing:
-                    continue
-                sumN = 0.0
-                nuMissingN = 0
-                for port in self._matIn:
-                    flow = port.GetPropValue(MOLEFLOW_VAR)
-                    x = port.GetCompounds()[cmpNo].GetValue()
-                    if flow == None or x == None:
-                        nuMissingN += 1
-                    else:
-                        sumN -= x * flow
-                            
-                for port in self._matOut:
-                    flow = port.GetPropValue(MOLEFLOW_VAR)
-                    x = port.GetCompounds()[cmpNo].GetValue()
-                    if flow == None or x == None:
-                        nuMissingN += 1
-                    else:
-                        sumN += x * flow
-                       
-                if nuMissingN == nuMissing:
-                    b.append(sumN)
-                    a.append(row)
-                        
-                        
-            if len(a) != nuMissing:
-                return balanced # not enough info
-            
+            # look for mole fractions to use, all the compounds at once
+            ports = self._matIn + self._matOut
+            signs = array([1.0]*nuPortsIn + [-1.0]*nuPortsOut)
+            fracs = _FractionsArray(ports)
+            flows = array([port.GetPropValue(MOLEFLOW_VAR) for port in ports], Float)
+            known = ~numpy.isnan(fracs) & ~numpy.isnan(flows)[:, numpy.newaxis]
+            sumN = -numpy.sum(numpy.where(known, (signs*flows)[:, numpy.newaxis]*fracs, 0.0), 0)
+            nuMissingN = numpy.sum(~known, 0)
+
+            portIdx = {}
+            for i in range(totPorts):
+                portIdx[id(ports[i])] = i
+            missingIdx = [portIdx[id(port)] for port, isIn in missing]
+            rows = signs[missingIdx][:, numpy.newaxis]*fracs[missingIdx]
+            useful = ~numpy.isnan(rows).any(0) & (nuMissingN == nuMissing)
+            for cmpNo in numpy.nonzero(useful)[0]:
+                a.append(list(rows[:, cmpNo]))
+                b.append(sumN[cmpNo])
+
             try:
-                if abs(determinant(array(a))) < 0.0001:
+                # keep only rows that add information
+                a, b = _IndependentRows(a, b, nuMissing)
+                if len(a) != nuMissing:
+                    return balanced # not enough info
+                if abs(determinant(array(a))) < MIN_DETERMINANT:
                     return balanced
                 
                 flows = solve_linear_equations(array(a),array(b))
@@ -409,67 +414,57 @@ class Balance:
                 
         # flows are now known - do components
         cmps = aPort.GetCompounds()
-        
-        #iterate through components
-        missing = None
-        for cmpNo in range(len(cmps)):
-            sum = 0.0
-            # inlets
-            for port in self._matIn:
-                flow = port.GetPropValue(MOLEFLOW_VAR)
-                if flow == None:
-                    return balanced          # should not happen
-                if flow != 0.0:
-                    x = port.GetCompounds()[cmpNo].GetValue()
-                    if x != None:
-                        if missing and missing is port:
-                            return  balanced # all components must be missing
-                        sum += x * flow
-                    elif missing and not port is missing:
-                        return balanced      # all missing compositions must be in same port
-                    else:
-                        missing = port
-                        missingInlet = 1
-
-            # outlets
-            for port in self._matOut:
-                flow = port.GetPropValue(MOLEFLOW_VAR)
-                if flow == None:
-                    return balanced          # shouldn't happen
-
-                if flow != 0.0:                    
-                    x = port.GetCompounds()[cmpNo].GetValue()
-                    if x != None:
-                        if missing and missing is port:
-                            return  balanced # all components must be missing
-                        sum -= x * flow
-                    elif missing and not port is missing:
-                        return  balanced # all missing compositions must be in same port
-                    else:
-                        missing = port
-                        missingInlet = 0
-                   
-            #It balanced
-            if missing:
-                flow = missing.GetPropValue(MOLEFLOW_VAR)
-                if flow == 0:
-                    return balanced
-                if missingInlet:
-                    sum = -sum
-                missing.GetCompounds()[cmpNo].SetValue(sum/flow, calcStatus)
-                missing.CalcFlows()
-            else:
+        nuCmps = len(cmps)
+        if nuCmps:
+            ports = self._matIn + self._matOut
+            flows = [port.GetPropValue(MOLEFLOW_VAR) for port in ports]
+            if None in flows:
+                return balanced          # should not happen
+            if fracs is None:
+                fracs = _FractionsArray(ports)
+            active = [i for i in range(totPorts) if flows[i] != 0.0]
+            ports = [ports[i] for i in active]
+            flows = array(flows, Float)[active]
+            signs = array([1.0]*nuPortsIn + [-1.0]*nuPortsOut)[active]
+
+            # sum of inlets - outlets of every compound over the known fractions
+            fracs = fracs[active]
+            unknown = numpy.isnan(fracs)
+            sums = numpy.sum(numpy.where(unknown, 0.0, (signs*flows)[:, numpy.newaxis]*fracs), 0)
+            nuUnknown = numpy.sum(unknown, 0)
+
+            # compounds before the first one with unknowns are checked for consistency
+            firstMissing = nuCmps
+            if nuUnknown.any():
+                firstMissing = numpy.nonzero(nuUnknown)[0][0]
+            if firstMissing:
                 flow = aPort.GetPropValue(MOLEFLOW_VAR)
                 if flow == 0:
                     flow = 1000.0   # arbitrary scaling
-                x = abs(sum)/flow
-                
                 scaleFactor = PropTypes[FRAC_VAR].scaleFactor
                 if scaleFactor:
                     tolerance = aPort.GetParentOp().GetTolerance()
-                    if x/scaleFactor > tolerance:
-                        prop = aPort.GetCompounds()[cmpNo]
-                        aPort.GetParentOp().PushConsistencyError(prop, x)
+                    errors = abs(sums[:firstMissing])/flow
+                    for cmpNo in numpy.nonzero(errors/scaleFactor > tolerance)[0]:
+                        aPort.GetParentOp().PushConsistencyError(cmps[cmpNo], float(errors[cmpNo]))
+
+            if firstMissing < nuCmps:
+                # all missing compositions must be in the same port and that
+                # port must be missing all the compounds from there on
+                if nuUnknown[firstMissing] != 1:
+                    return balanced
+                m = numpy.nonzero(unknown[:, firstMissing])[0][0]
+                solvable = (nuUnknown == 1) & unknown[m]
+                lastMissing = nuCmps
+                if not solvable[firstMissing:].all():
+                    lastMissing = firstMissing + numpy.nonzero(~solvable[firstMissing:])[0][0]
+                missing = ports[m]
+                missingCmps = missing.GetCompounds()
+                for cmpNo in range(firstMissing, lastMissing):
+                    missingCmps[cmpNo].SetValue(float(-signs[m]*sums[cmpNo]/flows[m]), calcStatus)
+                    missing.CalcFlows()
+                if lastMissing < nuCmps:
+                    return balanced
                 
         #If it made it all the way here, then  it must be balanced
         balanced = 1
@@ -794,6 +789,8 @@ class Balance:
         
 class BalanceOp(UnitOperations.UnitOperation):
     """Class for the balance unit op. Inherits from UnitOperation"""
+    dontClone = ("_balance",)
+
     def __init__(self, initScript = None):
         """Init the balance
 
@@ -884,15 +881,4 @@ class BalanceOp(UnitOperations.UnitOperation):
         if self.FlashAllPorts() and self._balance:
             self._balance.DoBalance()
 
-    def _CloneParameters(self, clone, attrNamesToClone):
-        """Update the number of ports and balance obj right here"""
-        attrNamesToClone = super(BalanceOp, self)._CloneParameters(clone, attrNamesToClone)
-            
-        #Remove these attributes from the clone list
-        dontClone = ["_balance"]
-        for name in dontClone:
-            if name in attrNamesToClone:
-                attrNamesToClone.remove(name)
-        
-        return attrNamesToClone
     
\ No newline at end of file
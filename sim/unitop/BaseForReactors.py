@@ -66,6 +66,10 @@ class ReactionDisplay(object):
           
 class Reaction(UnitOperations.UnitOperation):
     """ class for a reaction """
+    #This is not really needed as the algorithm should end up not cloning it
+    #but lets keep this here for clarity
+    dontClone = ("display",)
+
     def __init__(self, initScript=None):
         super(Reaction, self).__init__(initScript)
         self.rxnName = 'Unknown'
@@ -293,24 +297,12 @@ class Reaction(UnitOperations.UnitOperation):
         
 
 
-    def _RemoveFromCloneList(self, clone, attrNamesToClone):
-        """Default attributes that should not be cloned"""
-        attrNamesToClone = super(Reaction, self)._RemoveFromCloneList(clone, attrNamesToClone)
-        #This is not really needed as the algorithm should end up not cloning it 
-        #but lets keep this here for clarity
-        dontClone = ["display"]
-        
-        for name in dontClone:
-            if name in attrNamesToClone:
-                attrNamesToClone.remove(name)
-        
-        return attrNamesToClone
     
     def _CloneParameters(self, clone, attrNamesToClone):
         #Clone parameters
         for paramName in self.parameters:
             #Do a copy just in case
-            clone.parameters[paramName] = copy.deepcopy(self.parameters[paramName])
+            clone.parameters[paramName] = UnitOperations._CloneValue(self.parameters[paramName])
             
         for paramName in self.parameterPropertyTypes:
             #Can safely point to the same thing as they are global types
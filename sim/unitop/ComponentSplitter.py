@@ -36,6 +36,8 @@ class SimpleComponentSplitter(UnitOperations.UnitOperation):
     Also has a FractionList which has signal ports containing mole fraction of
     inlet component moles going into first outlet
     """
+    dontClone = ("splits", "_balance", "borrowedSplits")
+
     def __init__(self, initScript = None):
         """
         create the ports and init the balance
@@ -267,16 +269,6 @@ class SimpleComponentSplitter(UnitOperations.UnitOperation):
         while self.FlashAllPorts():
             self._balance.DoBalance()
 
-    def _RemoveFromCloneList(self, clone, attrNamesToClone):
-        """Default attributes that should not be cloned"""
-        attrNamesToClone = super(SimpleComponentSplitter, self)._RemoveFromCloneList(clone, attrNamesToClone)
-        dontClone = ["splits", "_balance", "borrowedSplits"]
-        
-        for name in dontClone:
-            if name in attrNamesToClone:
-                attrNamesToClone.remove(name)
-        
-        return attrNamesToClone
 
 class ComponentSplitter(UnitOperations.UnitOperation):
     """
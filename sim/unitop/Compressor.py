@@ -129,7 +129,7 @@ class IdealCompressorExpander(UnitOperations.UnitOperation):
                     min, max = PIn.GetValue()/10.0, PIn.GetValue()
                 converged = 0
                 try:
-                    val, converged = UnitOperations.CalculateNonSupportedFlash(unitOp, frac, knownTargetProp, knownFlashProp, iterProp, self.lastPOut, min, max)
+                    val, converged = UnitOperations.CalculateNonSupportedFlash(unitOp, frac, knownTargetProp, knownFlashProp, iterProp, self.lastPOut, min, max, OUT_PORT)
                 finally:
                     if converged:
                         self.lastPOut = val
@@ -154,7 +154,7 @@ class IdealCompressorExpander(UnitOperations.UnitOperation):
                     min, max = POut.GetValue(), 10.0*POut.GetValue()
                 converged = 0
                 try:
-                    val, converged = UnitOperations.CalculateNonSupportedFlash(unitOp, frac, knownTargetProp, knownFlashProp, iterProp, self.lastPIn, min, max)
+                    val, converged = UnitOperations.CalculateNonSupportedFlash(unitOp, frac, knownTargetProp, knownFlashProp, iterProp, self.lastPIn, min, max, IN_PORT)
                 finally:
                     if converged:
                         self.lastPIn = val
@@ -91,6 +91,8 @@ class Controller(UnitOperations.UnitOperation):
         MINIMUM_PORT  - smallest allowable value for the controlled variable
         MAXIMUM_PORT  - largest allowable value for the controlled variable
     """
+    dontClone = ("haveAdded",)
+
     def __init__(self, initScript = None):
         """Init the controller"""          
         super(Controller, self).__init__(initScript)
@@ -308,16 +310,6 @@ class Controller(UnitOperations.UnitOperation):
 
         return True
         
-        
-    def _RemoveFromCloneList(self, clone, attrNamesToClone):
-        """Default attributes that should not be cloned"""
-        dontClone = ["haveAdded"]
-        
-        for name in dontClone:
-            if name in attrNamesToClone:
-                attrNamesToClone.remove(name)
-        
-        return attrNamesToClone
     
 class ControllerSolver(object):
     """used by flowsheet solver to solve the controllers it contains"""
@@ -306,7 +306,7 @@ class ConversionReaction(UnitOperations.UnitOperation):
         #Clone parameters
         for paramName in self.parameters:
             #Do a copy just in case
-            clone.parameters[paramName] = copy.deepcopy(self.parameters[paramName])
+            clone.parameters[paramName] = UnitOperations._CloneValue(self.parameters[paramName])
             
         for paramName in self.parameterPropertyTypes:
             #Can safely point to the same thing as they are global types
@@ -286,6 +286,7 @@ class Equation(UnitOperations.UnitOperation):
     implement a flowsheet of basic operators to calculate the equation
     given in EQUATION_PAR
     """
+    dontClone = ("installedOps", "operatorStack", "operandStack", "opCount")
     
     def __init__(self, initScript = None):
         """
@@ -477,13 +478,3 @@ class Equation(UnitOperations.UnitOperation):
                 
        
                
-    def _RemoveFromCloneList(self, clone, attrNamesToClone):
-        """Default attributes that should not be cloned"""
-        attrNamesToClone = super(Equation, self)._RemoveFromCloneList(clone, attrNamesToClone)
-        dontClone = ["installedOps", "operatorStack", "operandStack", "opCount"]
-        
-        for name in dontClone:
-            if name in attrNamesToClone:
-                attrNamesToClone.remove(name)
-        
-        return attrNamesToClone
\ No newline at end of file
@@ -24,6 +24,8 @@ KEY_CMP_PAR = "KeyCmp"
 
 class SimpleFlash(UnitOperations.UnitOperation):
     """Class for the simple flash. Inherits from UnitOperation"""
+    dontClone = ("balance", "nuLPorts", "nuSPorts")
+
     def __init__(self, initScript = None):
         """
         Init the flash
@@ -351,12 +353,6 @@ class SimpleFlash(UnitOperations.UnitOperation):
         #This should recreate a number of attributes
         clone.UpdatePortsOut()
         
-        #Remove these attributes from the clone list
-        dontClone = ["balance", "nuLPorts", "nuSPorts"]
-        for name in dontClone:
-            if name in attrNamesToClone:
-                attrNamesToClone.remove(name)
-        
         return attrNamesToClone
     
     
@@ -62,6 +62,8 @@ LOCALEMPTY_VAL = 1.0E-100
 
 class HeaterCooler(UnitOperations.UnitOperation):
     """Base class for the heater and cooler. Inherits from UnitOperation"""
+    dontClone = ("balance",)
+
     def __init__(self, isHeater, initScript = None):
         """If isHeater is true, then it is heater, else it is cooler
 
@@ -376,16 +378,6 @@ class HeaterCooler(UnitOperations.UnitOperation):
             clone = self.__class__(0)
         return clone
 
-    def _RemoveFromCloneList(self, clone, attrNamesToClone):
-        """Default attributes that should not be cloned"""
-        attrNamesToClone = super(HeaterCooler, self)._RemoveFromCloneList(clone, attrNamesToClone)
-        dontClone = ["balance"]
-        
-        for name in dontClone:
-            if name in attrNamesToClone:
-                attrNamesToClone.remove(name)
-        
-        return attrNamesToClone
 
 class Heater(HeaterCooler):
     """Heater - unit operation having in and out material ports
@@ -2064,7 +2056,7 @@ class _Side(EquationSolver.EquationBasedOp):
         #Clone parameters
         for paramName in self.parameters:
             #Do a copy just in case
-            clone.parameters[paramName] = copy.deepcopy(self.parameters[paramName])
+            clone.parameters[paramName] = UnitOperations._CloneValue(self.parameters[paramName])
             
         for paramName in self.parameterPropertyTypes:
             #Can safely point to the same thing as they are global types
@@ -2709,7 +2701,7 @@ class _HeatTransfer(EquationSolver.EquationBasedOp):
         #Clone parameters
         for paramName in self.parameters:
             #Do a copy just in case
-            clone.parameters[paramName] = copy.deepcopy(self.parameters[paramName])
+            clone.parameters[paramName] = UnitOperations._CloneValue(self.parameters[paramName])
             
             
         for paramName in self.parameterPropertyTypes:
@@ -2723,6 +2715,10 @@ class _HeatTransfer(EquationSolver.EquationBasedOp):
     
     
 class MultiSidedHeatExchangerOp(EquationSolver.EquationBasedOp):
+    dontClone = ("_sides", "_hTransfer", "_hTransferList", "_balance", "_matBalances",
+                 "portSpecs", "activeSpecs", "inactiveSpecs", "hComposite", "cComposite",
+                 "customSolver")
+
     def __init__(self, initScript=None):
         super(MultiSidedHeatExchangerOp, self).__init__(initScript)
 
@@ -3256,6 +3252,12 @@ class MultiSidedHeatExchangerOp(EquationSolver.EquationBasedOp):
     ##########################################################################################
     
     ## SOLVE METHODS #########################################################################
+    def ForgetsBySolving(self):
+        """A custom solver has to be solved on forget passes too"""
+        if getattr(self, 'customSolver', None) != None:
+            return 1
+        return super(MultiSidedHeatExchangerOp, self).ForgetsBySolving()
+        
     def Solve(self):
         
         self.unitOpMessage = ('NoMessage', )
@@ -5096,25 +5098,12 @@ class MultiSidedHeatExchangerOp(EquationSolver.EquationBasedOp):
     
     
     ## CLONING ##############################################################
-    def _RemoveFromCloneList(self, clone, attrNamesToClone):
-        """Default attributes that should not be cloned"""
-        attrNamesToClone = super(MultiSidedHeatExchangerOp, self)._RemoveFromCloneList(clone, attrNamesToClone)
-        
-        dontClone = ["_sides", "_hTransfer", "_hTransferList", "_balance", "_matBalances",
-                     "portSpecs", "activeSpecs", "inactiveSpecs", "hComposite",
-                     "cComposite", "customSolver"]
-        
-        for name in dontClone:
-            if name in attrNamesToClone:
-                attrNamesToClone.remove(name)
-        
-        return attrNamesToClone
     
     def _CloneParameters(self, clone, attrNamesToClone):
         #Clone parameters
         for paramName in self.parameters:
             #Do a copy just in case
-            clone.parameters[paramName] = copy.deepcopy(self.parameters[paramName])
+            clone.parameters[paramName] = UnitOperations._CloneValue(self.parameters[paramName])
             
             
         for paramName in self.parameterPropertyTypes:
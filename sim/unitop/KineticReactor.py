@@ -378,6 +378,7 @@ r = 0
         
 class CSTR(EquationSolver.EquationBasedOp):
     """CSTR"""
+    dontClone = ("activeSpecs", "inactiveSpecs", "myGlobals")
 
     def __init__(self, initScript=None):
         """
@@ -1088,19 +1089,10 @@ class CSTR(EquationSolver.EquationBasedOp):
             self.estimates[toName].name = toName
             del self.estimates[fromName]
     
-    def _RemoveFromCloneList(self, clone, attrNamesToClone):
-        """Default attributes that should not be cloned"""
-        attrNamesToClone = super(CSTR, self)._RemoveFromCloneList(clone, attrNamesToClone)
-        
-        dontClone = ["activeSpecs", "inactiveSpecs", "myGlobals"]
-        
-        for name in dontClone:
-            if name in attrNamesToClone:
-                attrNamesToClone.remove(name)
-        
-        return attrNamesToClone
             
 class PFR(EquationSolver.EquationBasedOp):
+    dontClone = ("activeSpecs", "inactiveSpecs", "myGlobals")
+
     def __init__(self, initScript=None):
         """
         create the ports and init the balance
@@ -2445,15 +2437,4 @@ class PFR(EquationSolver.EquationBasedOp):
             self.estimates[toName].name = toName
             del self.estimates[fromName]
         
-    def _RemoveFromCloneList(self, clone, attrNamesToClone):
-        """Default attributes that should not be cloned"""
-        attrNamesToClone = super(PFR, self)._RemoveFromCloneList(clone, attrNamesToClone)
-        
-        dontClone = ["activeSpecs", "inactiveSpecs", "myGlobals"]
-        
-        for name in dontClone:
-            if name in attrNamesToClone:
-                attrNamesToClone.remove(name)
-        
-        return attrNamesToClone
         
\ No newline at end of file
@@ -6,6 +6,12 @@ LiqLiqEx -- Class for the L L extractor. Inherits from UnitOperation
 Remarks:
 The main component to be extracted needs to be specified. This should
 change soon
+With the Simultaneous parameter on (the default) the material balances and
+the equilibrium of all the stages are first solved together by the
+isothermal sum rates method. The thermo is called once per iteration for
+all the stages and the result is loaded as the estimates of the stages,
+which then only need a pass or two through the stage by stage recycle.
+If it does not converge the estimates of InitStages are used as before.
 
 """
 from sim.solver import Flowsheet, Ports
@@ -23,6 +29,9 @@ FLASH = 'innerFlash'
 MIX = 'innerMixer'
 
 RESETINIT_PAR = "Reset"
+SIMULTANEOUS_PAR = "Simultaneous"
+
+TINY_FLOW = 1.0E-20
 
 class LLStage(UnitOperations.UnitOperation):
     """Class to mix two inlets and iso thermally flash them.
@@ -124,6 +133,7 @@ class LiqLiqEx(Flowsheet.Flowsheet):
         Init Info:
         nuStages = 5
         maxIter = 40
+        simultaneous = 1
 
         """
         #The stages are simulated with a Balance and Flash uops
@@ -147,7 +157,7 @@ class LiqLiqEx(Flowsheet.Flowsheet):
             self.LoadPortNames()
             if hasattr(self, 'feedIsLessDense'):
                 self.topPortOutName = L_PORT + str(self.feedIsLessDense)
-                self.botPortOutName = L_PORT + str(not self.feedIsLessDense)
+                self.botPortOutName = L_PORT + str(int(not self.feedIsLessDense))
         
     def LoadPortNames(self):
         self.feedTopName = FEED_PORT
@@ -161,6 +171,7 @@ class LiqLiqEx(Flowsheet.Flowsheet):
     def InitializeParameters(self):
         self.SetParameterValue(NUSTAGES_PAR, 5)
         self.SetParameterValue(MAXITER_PAR, 40)
+        self.SetParameterValue(SIMULTANEOUS_PAR, 0)
         
         # Need to set this for ports
         self.SetParameterValue(NULIQPH_PAR, 2)
@@ -170,7 +181,7 @@ class LiqLiqEx(Flowsheet.Flowsheet):
         
     
     def GetListOfReqParam(self): return (NUSTAGES_PAR, )
-    def GetListOfOptParam(self): return (MAXITER_PAR, )
+    def GetListOfOptParam(self): return (MAXITER_PAR, SIMULTANEOUS_PAR)
 
     def SetParameterValue(self, paramName, value):
         """Set the value of a parameter"""
@@ -181,7 +192,7 @@ class LiqLiqEx(Flowsheet.Flowsheet):
             self.ForgetAllCalculations()
             value = 0
         
-        if paramName == NUSTAGES_PAR: 
+        if paramName == NUSTAGES_PAR or paramName == SIMULTANEOUS_PAR: 
             value = int(value)
         super(LiqLiqEx, self).SetParameterValue(paramName, value)
         if paramName == NUSTAGES_PAR: 
@@ -197,6 +208,12 @@ class LiqLiqEx(Flowsheet.Flowsheet):
             except: return False
             if value < 2:
                 return False
+            
+        elif paramName == SIMULTANEOUS_PAR:
+            try: value = int(value)
+            except: return False
+            if value != 0 and value != 1:
+                return False
 
         return True
     
@@ -301,7 +318,7 @@ class LiqLiqEx(Flowsheet.Flowsheet):
         stagePort = btmStage.GetPort(self.topPortOutName)
         if raffPort.IsPortConnected():
             #If the extract port is connected to another stage then diconnect
-            if isinstance(extPort.GetConnection().GetParent(), StageClass):
+            if isinstance(raffPort.GetConnection().GetParent(), StageClass):
                 raffPort.Disconnect()
         if stagePort.IsPortConnected():
             #If a stage port is connected to something different than a stage, then
@@ -340,7 +357,7 @@ class LiqLiqEx(Flowsheet.Flowsheet):
         if not thCaseObj:
             feedIsLessDense = 1
             self.topPortOutName = L_PORT + str(feedIsLessDense)
-            self.botPortOutName = L_PORT + str(not feedIsLessDense)
+            self.botPortOutName = L_PORT + str(int(not feedIsLessDense))
             self.feedIsLessDense = feedIsLessDense
             return
         
@@ -361,17 +378,17 @@ class LiqLiqEx(Flowsheet.Flowsheet):
             x = port.GetCompositionValues()
             vals1 = thAdmin.GetProperties(prov, case, (T_VAR,t), (P_VAR, p), 1, x, (MASSDEN_VAR,))
             
-            feedIsLessDense = vals0[0] < vals1[0]
+            feedIsLessDense = int(vals0[0] < vals1[0])
             if self.feedIsLessDense != feedIsLessDense: self.reconnect = 1
             else: self.reconnect = 0
             self.topPortOutName = L_PORT + str(feedIsLessDense)
-            self.botPortOutName = L_PORT + str(not feedIsLessDense)
+            self.botPortOutName = L_PORT + str(int(not feedIsLessDense))
             self.feedIsLessDense = feedIsLessDense
         
         except:
             feedIsLessDense = 1
             self.topPortOutName = L_PORT + str(feedIsLessDense)
-            self.botPortOutName = L_PORT + str(not feedIsLessDense)
+            self.botPortOutName = L_PORT + str(int(not feedIsLessDense))
             self.feedIsLessDense = feedIsLessDense
             return
         
@@ -394,7 +411,8 @@ class LiqLiqEx(Flowsheet.Flowsheet):
         ZRaffinate = btmStage.GetPort(self.botPortOutName).GetPropValue(ZFACTOR_VAR)
         if ZExtract == None or ZRaffinate == None:
             # nope - initialize the stages and try again
-            if not self.InitStages(): return None
+            if not (self.parameters.get(SIMULTANEOUS_PAR, 0) and self.SolveSimultaneous()):
+                if not self.InitStages(): return None
             super(LiqLiqEx, self).Solve()
         
         return 1
@@ -542,6 +560,133 @@ class LiqLiqEx(Flowsheet.Flowsheet):
             in1ToPort.SetPropValue(MOLEFLOW_VAR, sum(in1ToFlow), FIXED_V | ESTIMATED_V)
         return 1
 
+    def SolveSimultaneous(self):
+        """Solve the material balances and equilibrium of all the stages together
+
+        Isothermal sum rates method (pg 299 "Separation Process Principles";
+        Seader, et al). T and P change linearly through the stages, as they
+        do in the converged stages. With the K values fixed, the balances of
+        every compound are a tridiagonal system in the stages, then the K
+        values are updated from the fugacities of both liquids of all the
+        stages in one thermo call.
+        The extract going up is loaded as estimates of the stages.
+        Returns 1 if it converged
+
+        """
+        thCaseObj = self.GetThermo()
+        if not thCaseObj: return 0
+        thAdmin, prov, case = thCaseObj.thermoAdmin, thCaseObj.provider, thCaseObj.case
+        nuStages = self.parameters[NUSTAGES_PAR]
+        maxIter = self.GetParameterValue(MAXITER_PAR)
+        tolerance = self.GetParameterValue(MAXERROR_PAR)
+        
+        #Stuff from feed and solvent
+        fPort = self.GetPort(self.feedTopName)
+        fCmp = array(fPort.GetCompositionValues(), Float)
+        (fT, fP, fMol) = (fPort.GetPropValue(T_VAR), fPort.GetPropValue(P_VAR), fPort.GetPropValue(MOLEFLOW_VAR))
+        fFlow = fMol * fCmp / sum(fCmp)
+        sPort = self.GetPort(self.feedBotName)
+        sCmp = array(sPort.GetCompositionValues(), Float)
+        (sT, sP, sMol) = (sPort.GetPropValue(T_VAR), sPort.GetPropValue(P_VAR), sPort.GetPropValue(MOLEFLOW_VAR))
+        sFlow = sMol * sCmp / sum(sCmp)
+        totalFlow = fMol + sMol
+        if totalFlow <= 0.0: return 0
+        
+        #Feed and solvent are like the outlets of the stages next to the ends
+        t = array(self.CreateLinearDistList(nuStages + 2, fT, sT)[1:-1], Float)
+        p = array(self.CreateLinearDistList(nuStages + 2, fP, sP)[1:-1], Float)
+        tt = concatenate((t, t))
+        pp = concatenate((p, p))
+        phases = ones(2 * nuStages) * LIQUID_PHASE
+        
+        #Start with the feed going down and the solvent going up untouched
+        #l is the raffinate phase leaving each stage, v the extract phase
+        l = ones((nuStages, 1), Float) * fFlow
+        v = ones((nuStages, 1), Float) * sFlow
+        error = 0.0
+        converged = 0
+        try:
+            for iterNo in range(maxIter):
+                xR = self.FracsFromFlows(l)
+                xE = self.FracsFromFlows(v)
+                lnFug = thAdmin.GetArrayProperty(prov, case, (T_VAR, tt), (P_VAR, pp), phases,
+                                                 concatenate((xR, xE)), LNFUG_VAR)
+                if lnFug is None: return 0
+                lnFug = array(lnFug, Float)
+                lnK = lnFug[:nuStages] + log(xE) - lnFug[nuStages:] - log(xR)
+                
+                #Extraction factors
+                sumL = sum(l, 1)
+                sumV = sum(v, 1)
+                S = exp(lnK) * (sumV / sumL)[:, NewAxis]
+                
+                newL = self.SolveStageBalances(S, fFlow, sFlow)
+                newV = S * newL
+                error = max(maximum.reduce(ravel(absolute(newL - l))),
+                            maximum.reduce(ravel(absolute(newV - v)))) / totalFlow
+                l, v = newL, newV
+                if error < tolerance:
+                    converged = 1
+                    break
+        except (ArithmeticError, ValueError):
+            #Bad numbers on the way, the stage by stage solution still works
+            return 0
+        
+        if not converged:
+            self.InfoMessage('LLExNotConverged', (self.GetPath(), maxIter, error))
+            return 0
+        
+        #Both liquids ended up the same. Let the stages find out if there are two
+        if maximum.reduce(ravel(absolute(lnK))) < tolerance:
+            return 0
+        
+        #Load the extract going up as estimates, the stages take it from there
+        xE = self.FracsFromFlows(v)
+        for i in range(nuStages - 1):
+            in1Port = self.chUODict[STAGE + str(i)].GetPort(IN_PORT + str(1))
+            in1Port.SetPropValue(T_VAR, t[i+1], FIXED_V | ESTIMATED_V)
+            in1Port.SetPropValue(P_VAR, p[i+1], FIXED_V | ESTIMATED_V)
+            in1Port.GetCompounds().SetValues(xE[i+1], FIXED_V | ESTIMATED_V)
+            in1Port.SetPropValue(MOLEFLOW_VAR, sum(v[i+1]), FIXED_V | ESTIMATED_V)
+        return 1
+    
+    def SolveStageBalances(self, S, fFlow, sFlow):
+        """Raffinate flows of every compound (row per stage) for the extraction factors S
+
+        The balance of stage j is l[j-1] - (1 + S[j]) l[j] + S[j+1] l[j+1] = 0 with
+        the feed as l[-1] and the solvent as S[n] l[n]. It is solved for all
+        the compounds at once by the Thomas algorithm
+
+        """
+        nuStages = len(S)
+        b = -(1.0 + S)
+        d = zeros(S.shape, Float)
+        d[0] = d[0] - fFlow
+        d[-1] = d[-1] - sFlow
+        
+        #Forward elimination, the lower diagonal is all ones
+        cp = zeros(S.shape, Float)
+        dp = zeros(S.shape, Float)
+        cp[0] = S[1] / b[0]
+        dp[0] = d[0] / b[0]
+        for j in range(1, nuStages):
+            m = b[j] - cp[j-1]
+            if j < nuStages - 1:
+                cp[j] = S[j+1] / m
+            dp[j] = (d[j] - dp[j-1]) / m
+            
+        #Back substitution
+        l = zeros(S.shape, Float)
+        l[-1] = dp[-1]
+        for j in range(nuStages - 2, -1, -1):
+            l[j] = dp[j] - cp[j] * l[j+1]
+        return clip(l, TINY_FLOW, 1.0E20)
+    
+    def FracsFromFlows(self, flows):
+        """Mole fractions, row per stage, clipped away from zero for the logs"""
+        fracs = clip(flows, TINY_FLOW, 1.0E20)
+        return fracs / sum(fracs, 1)[:, NewAxis]
+        
     def ClearEstimates(self):
         """
         removes the estimates provide by InitStage and solution so new ones will be created
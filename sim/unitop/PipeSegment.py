@@ -62,6 +62,8 @@ CALC_FLOW_MODE = 'SolveForFlow'
 class PipeSegment(EquationSolver.EquationBasedOp):
     """PipeSegment - unit operation having in and out material ports
     and pipe properties ports"""
+    dontClone = ("_localMatDict", "_localCmpList", "liveProfiles", "balance", "_thCaseObj",
+                 "_fracs", "solveMethods")
 
     def __init__(self, initScript=None):
         """
@@ -1572,17 +1574,6 @@ class PipeSegment(EquationSolver.EquationBasedOp):
         
         
         
-    def _RemoveFromCloneList(self, clone, attrNamesToClone):
-        """Default attributes that should not be cloned"""
-        attrNamesToClone = super(PipeSegment, self)._RemoveFromCloneList(clone, attrNamesToClone)
-        dontClone = ["_localMatDict", "_localCmpList", "liveProfiles", "balance", "_thCaseObj",
-                     "_fracs", "solveMethods"]
-        
-        for name in dontClone:
-            if name in attrNamesToClone:
-                attrNamesToClone.remove(name)
-        
-        return attrNamesToClone
     
     
         
@@ -662,6 +662,48 @@ AVAIPHASE_STATUS = (BULK_OPT, L_OPT, V_OPT, L2_OPT)
 AVAIPHASE_STATUS = ' '.join(AVAIPHASE_STATUS)
 
 
+#Property names used by the table surrogate for the dependent props
+ZAXIS_PROP_VARS = {MASSDEN_OPT: MASSDEN_VAR,
+                   VIS_OPT: VISCOSITY_VAR,
+                   SPEEDSOUND_OPT: SPEEDOFSOUND_VAR,
+                   MW_OPT: MOLE_WT,
+                   ZFAC_OPT: ZFACTOR_VAR,
+                   VOL_OPT: molarV_VAR,
+                   P_OPT: P_VAR,
+                   T_OPT: T_VAR,
+                   VPFRAC_OPT: VPFRAC_VAR,
+                   ENTHALPY_OPT: H_VAR,
+                   ENTROPY_OPT: S_VAR,
+                   CP_OPT: CP_VAR,
+                   CV_OPT: CV_VAR,
+                   IGENTHALPY_OPT: IDEALGASENTHALPY_VAR,
+                   IGENTROPY_OPT: IDEALGASENTROPY_VAR,
+                   IGCP_OPT: IDEALGASCP_VAR,
+                   RESIDUALENTHALPY_OPT: RESIDUALENTHALPY_VAR,
+                   RESIDUALENTROPY_OPT: RESIDUALENTROPY_VAR,
+                   RESIDUALCP_OPT: RESIDUALCP_VAR,
+                   RESIDUALCV_OPT: RESIDUALCV_VAR,
+                   THERMALCONDUCTIVITY_OPT: THERMOCONDUCTIVITY_VAR,
+                   SURFACETENSION_OPT: SURFACETENSION_VAR,
+                   ISOCOMPRESSIBILITY_OPT: ISOTHERMALCOMPRESSIBILITY_VAR,
+                   DPDVT_OPT: DPDVT_VAR,
+                   IGFORMATION_OPT: IDEALGASFORMATION_VAR,
+                   IGGIBBS_OPT: IDEALGASGIBBS_VAR,
+                   MECHANICALZ_OPT: MECHANICALZFACTOR_VAR,
+                   KINEMATICVISCOSITY_OPT: KINEMATICVISCOSITY_VAR}
+
+#Phase of the table as known by the thermo provider
+SURROGATE_PHASES = {BULK_OPT: OVERALL_PHASE,
+                    V_OPT: VAPOUR_PHASE,
+                    L_OPT: LIQUID_PHASE}
+
+#Surrogate interpolation options
+BILINEAR_OPT = 'Bilinear'
+BICUBIC_OPT = 'Bicubic'
+
+#Largest difference in mole fractions for the surrogate to be used
+SURROGATE_FRAC_TOL = 1.0e-8
+
 #Parameters
 AVAIXAXISPROPS_PAR = 'AvailableXAxisProps'
 AVAIYAXISPROPS_PAR = 'AvailableYAxisProps'
@@ -673,6 +715,7 @@ XPROP_PAR = 'XProperty'
 YPROP_PAR = 'YProperty'
 ZPROP_PAR = 'ZProperty'
 PHASE_PAR = 'Phase'
+SURROGATE_PAR = 'Surrogate'     #None (default), BILINEAR_OPT or BICUBIC_OPT
 
 #Ports
 MINVX_PORT = 'XMin'
@@ -727,8 +770,21 @@ class PropertyTable(UnitOperations.UnitOperation):
         
         self.tableXY = None
         self.tableXYZ = None
+        self.fullArray = None
+        self.fullArrayFracs = None
+        self._surrogate = None
         
        
+    def __getstate__(self):
+        """the surrogate is rebuilt from the full array when needed"""
+        state = self.__dict__.copy()
+        if state.has_key('_surrogate'):
+            del state['_surrogate']
+        return state
+
+    def __setstate__(self, oldState):
+        self.__dict__ = oldState
+        self._surrogate = None
 
     def SetParameterValue(self, paramName, value):
         super(PropertyTable, self).SetParameterValue(paramName, value)
@@ -791,6 +847,10 @@ class PropertyTable(UnitOperations.UnitOperation):
             if value not in XAXIS_PROPS and value != None:
                 return False
         
+        if paramName == SURROGATE_PAR:
+            if value not in (BILINEAR_OPT, BICUBIC_OPT, None):
+                return False
+        
         return True                
 
     def GetContents(self):
@@ -859,6 +919,7 @@ class PropertyTable(UnitOperations.UnitOperation):
         self.fullArray = None
         self.tableXY = None
         self.tableXYZ = None
+        self._surrogate = None
         
         
         #Get thermo
@@ -898,12 +959,10 @@ class PropertyTable(UnitOperations.UnitOperation):
         option = "%s %s %s END %s GRID %s %s %s %s %s %s DEFAULT XY" %(propX, propY, propZ, phase, str(xMin), str(xMax), str(pointX), str(yMin), str(yMax), str(pointY))
         #Pass the number of points so the string buffer can be dinamically created
         nuPoints = (5 + nuZProps) * (pointX * pointY)
-        value, status = thAdmin.GetSpecialProperty(prov, case, option, fracs, PROPERTYTABLE_MATRIX, nuPoints)
+        value, status = thAdmin.GetSpecialArrayProperty(prov, case, option, fracs, PROPERTYTABLE_MATRIX, nuPoints)
         statusOut = ''
         try:
-            valsList = value.split()
-            valsList = map(float, valsList)
-            fullArray = Numeric.reshape(valsList, (len(valsList)/(5+nuZProps), (5+nuZProps)))
+            fullArray = numpy.reshape(value, (len(value)/(5+nuZProps), (5+nuZProps)))
             
             #Full array now looks like this:
             #X0 Y0 Z0 Z1 ... ZnuZProps VapFrac Liq0Frac Liq1Frac
@@ -927,6 +986,7 @@ class PropertyTable(UnitOperations.UnitOperation):
             #XpointX YpointY Z0 Z1 ... ZnuZProps VapFrac Liq0Frac Liq1Frac
             
             self.fullArray = fullArray
+            self.fullArrayFracs = fracs
             self.tableXY = TableXY(self, TABLEXY_KEY, fullArray, pointX, pointY, nuZProps)
             self.tableXYZ = []
             for i in range(nuZProps):
@@ -946,6 +1006,34 @@ class PropertyTable(UnitOperations.UnitOperation):
         else:
             self.unitOpMessage = ('ThermoProviderMsg', (statusOut,))
             self.InfoMessage('ThermoProviderMsg', (self.GetPath(), statusOut))
+            
+        if self.GetParameterValue(SURROGATE_PAR):
+            thAdmin.RegisterSurrogate(prov, case, self)
+        else:
+            thAdmin.UnregisterSurrogate(prov, case, self)
+
+    def GetSurrogate(self):
+        """
+        Interpolating surrogate of the last calculated grid if the Surrogate parameter
+        is set. Used by ThermoAdmin.GetApproxProperties
+        """
+        method = self.GetParameterValue(SURROGATE_PAR)
+        fullArray = getattr(self, 'fullArray', None)
+        fracs = getattr(self, 'fullArrayFracs', None)
+        if not method or fullArray is None or fracs == None:
+            return None
+        if getattr(self, '_surrogate', None) == None:
+            pointX = self.GetParameterValue(POINTSX_PAR)
+            pointY = self.GetParameterValue(POINTSY_PAR)
+            if pointX < 2 or pointY < 2:
+                return None
+            self._surrogate = TableSurrogate(fullArray, pointX, pointY,
+                                             self.GetParameterValue(XPROP_PAR),
+                                             self.GetParameterValue(YPROP_PAR),
+                                             self.GetParameterValue(ZPROP_PAR).split(),
+                                             self.GetParameterValue(PHASE_PAR),
+                                             fracs, method)
+        return self._surrogate
 
     def AdjustOldCase(self, version):
         
@@ -974,6 +1062,13 @@ class PropertyTable(UnitOperations.UnitOperation):
         except:
             pass
     def CleanUp(self):
+        try:
+            thCaseObj = self.GetThermo()
+            if thCaseObj:
+                thCaseObj.thermoAdmin.UnregisterSurrogate(thCaseObj.provider, thCaseObj.case, self)
+        except:
+            pass
+        self._surrogate = None
         try:
             if self.tableXY != None:
                 self.tableXY.CleanUp()
@@ -1184,7 +1279,7 @@ class TableXYZ(Table):
             z = self.z
             self.zUnits.append(None)
             
-        self.convTable[1:,1:] = Numeric.reshape(z, (self.pointX, self.pointY))
+        self.convTable[1:,1:] = numpy.reshape(z, (self.pointX, self.pointY))
         self.convTable[0,1:] = y
         self.convTable[1:,0] = x
 
@@ -1194,3 +1289,126 @@ class TableXYZ(Table):
         f = UnitOperations._SafeClone
         clone = self.__class__(None, self.name, f(self.table), f(self.pointX), f(self.pointY), f(self.zPropIdx))
         return clone
+
+
+class TableSurrogate(object):
+    """
+    Interpolates the grid of a PropertyTable to stand in for the thermo provider.
+    GetProperties only answers for the same independent properties, phase and
+    composition as the grid and for values inside of it, otherwise it returns None
+    """
+    def __init__(self, fullArray, pointX, pointY, propX, propY, propZLst, phase, fracs, method=BILINEAR_OPT):
+        self.xVar = XAXIS_PROP_TYPES[XAXIS_PROPS.index(propX)]
+        self.yVar = YAXIS_PROP_TYPES[YAXIS_PROPS.index(propY)]
+        self.phase = SURROGATE_PHASES.get(phase, None)
+        self.fracs = array(fracs, Float)
+        self.method = method
+        
+        x = fullArray[0::pointY, 0]
+        y = fullArray[0:pointY, 1]
+        nuZProps = len(propZLst)
+        
+        #One pointX by pointY grid per property.
+        #Skip the ones with points that could not be calculated
+        cols = {}
+        for i in range(nuZProps):
+            propName = ZAXIS_PROP_VARS.get(propZLst[i], None)
+            if propName:
+                cols[propName] = fullArray[:, 2 + i]
+        if not cols.has_key(VPFRAC_VAR):
+            cols[VPFRAC_VAR] = fullArray[:, 2 + nuZProps]
+        self.grids = {}
+        for propName, col in cols.items():
+            if not numpy.sometrue(numpy.equal(col, EMPTY_VAL)):
+                self.grids[propName] = numpy.reshape(col, (pointX, pointY))
+        
+        #Axes must be ascending for searchsorted
+        if x[-1] < x[0]:
+            x = x[::-1]
+            for propName in self.grids.keys():
+                self.grids[propName] = self.grids[propName][::-1, :]
+        if y[-1] < y[0]:
+            y = y[::-1]
+            for propName in self.grids.keys():
+                self.grids[propName] = self.grids[propName][:, ::-1]
+        self.x = array(x, Float)
+        self.y = array(y, Float)
+        
+    def GetProperties(self, prop1, prop2, phase, frac, propList):
+        """Same as the thermo provider method. None if it can not be interpolated"""
+        if phase != self.phase:
+            return None
+        if (prop1[0], prop2[0]) == (self.xVar, self.yVar):
+            xVals, yVals = prop1[1], prop2[1]
+        elif (prop2[0], prop1[0]) == (self.xVar, self.yVar):
+            xVals, yVals = prop2[1], prop1[1]
+        else:
+            return None
+        for propName in propList:
+            if not self.grids.has_key(propName):
+                return None
+            
+        frac = array(frac, Float)
+        if frac.shape[-1] != len(self.fracs):
+            return None
+        if numpy.maximum.reduce(numpy.ravel(numpy.absolute(frac - self.fracs))) > SURROGATE_FRAC_TOL:
+            return None
+        
+        isArray = not isinstance(xVals, (int, float))
+        xVals = numpy.ravel(array(xVals, Float))
+        yVals = numpy.ravel(array(yVals, Float))
+        if numpy.minimum.reduce(xVals) < self.x[0] or numpy.maximum.reduce(xVals) > self.x[-1]:
+            return None
+        if numpy.minimum.reduce(yVals) < self.y[0] or numpy.maximum.reduce(yVals) > self.y[-1]:
+            return None
+        
+        ix, tx = self._Locate(self.x, xVals)
+        iy, ty = self._Locate(self.y, yVals)
+        results = []
+        for propName in propList:
+            if self.method == BICUBIC_OPT:
+                results.append(self._Bicubic(self.grids[propName], ix, tx, iy, ty))
+            else:
+                results.append(self._Bilinear(self.grids[propName], ix, tx, iy, ty))
+                
+        if isArray:
+            #One row per point
+            return numpy.transpose(array(results, Float))
+        return [float(vals[0]) for vals in results]
+
+    def _Locate(self, axis, vals):
+        """Index of the lower point of the interval and the fraction into it"""
+        idx = numpy.clip(numpy.searchsorted(axis, vals) - 1, 0, len(axis) - 2)
+        return idx, (vals - numpy.take(axis, idx)) / (numpy.take(axis, idx + 1) - numpy.take(axis, idx))
+
+    def _Bilinear(self, grid, ix, tx, iy, ty):
+        return (grid[ix, iy] * (1.0 - tx) * (1.0 - ty) + grid[ix + 1, iy] * tx * (1.0 - ty) +
+                grid[ix, iy + 1] * (1.0 - tx) * ty + grid[ix + 1, iy + 1] * tx * ty)
+
+    def _Bicubic(self, grid, ix, tx, iy, ty):
+        """Catmull-Rom in both directions over the grid padded by _Pad"""
+        grid = self._Pad(grid)
+        wx = self._CubicWeights(tx)
+        wy = self._CubicWeights(ty)
+        result = numpy.zeros(len(tx), Float)
+        for a in range(4):
+            for b in range(4):
+                result = result + wx[a] * wy[b] * grid[ix + a, iy + b]
+        return result
+
+    def _Pad(self, grid):
+        """
+        Grid with one extra point on every side extrapolated along the edge slopes
+        so the cubic stays exact for linear data up to the edges
+        """
+        grid = numpy.concatenate((2.0 * grid[:1] - grid[1:2], grid, 2.0 * grid[-1:] - grid[-2:-1]), 0)
+        return numpy.concatenate((2.0 * grid[:, :1] - grid[:, 1:2], grid,
+                                  2.0 * grid[:, -1:] - grid[:, -2:-1]), 1)
+
+    def _CubicWeights(self, t):
+        t2 = t * t
+        t3 = t2 * t
+        return (0.5 * (-t3 + 2.0 * t2 - t),
+                0.5 * (3.0 * t3 - 5.0 * t2 + 2.0),
+                0.5 * (-3.0 * t3 + 4.0 * t2 + t),
+                0.5 * (t3 - t2))
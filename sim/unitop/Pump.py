@@ -38,6 +38,7 @@ NUMBSERIES_PAR = 'NumberSeries'
 TABLETAGTYPE_PAR = 'TableType'
 SERIESTYPE_PAR = 'SeriesType'
 EXTRAPOLATE_PAR = 'Extrapolate'
+INTERPOLATION_PAR = 'Interpolation'     # LINEAR_INTERP (default) or PCHIP_INTERP
 SPEC_TAG_PORT = 'SpecTagValue'
 
 PUMPSPEED_PORT = 'PumpSpeed'
@@ -50,6 +51,8 @@ TRANSFORM_EQT_PAR = 'Equation'
 
 
 class EquationUnit(UnitOperations.UnitOperation):
+    dontClone = ("_Funcs", "_FuncsDefs")
+
     def __init__(self, initScript=None):
         super(EquationUnit, self).__init__(initScript)
         self._FuncExpression = None #This shouldn't be here
@@ -150,17 +153,6 @@ class EquationUnit(UnitOperations.UnitOperation):
                     self._FuncsDefs[k] = self.GetParameterValue(k)
             
             
-    def _RemoveFromCloneList(self, clone, attrNamesToClone):
-        """Default attributes that should not be cloned"""
-        attrNamesToClone = super(EquationUnit, self)._RemoveFromCloneList(clone, attrNamesToClone)
-  
-        dontClone = ["_Funcs", "_FuncsDefs"]
-        
-        for name in dontClone:
-            if name in attrNamesToClone:
-                attrNamesToClone.remove(name)
-        
-        return attrNamesToClone
 
 
 class LookupTable(UnitOperations.UnitOperation):
@@ -282,15 +274,18 @@ class LookupTable(UnitOperations.UnitOperation):
             tbl = self._Tables[tblName]
             tbl.SetTagType(typeName)
 
-    def LookupFromTable(self, tble0, tble1 = None, factor = 0.0):
-        # Factor is to faciltate interpolation between tables
-        # it is the factor between the existing value and the new value
+    def LookupFromTables(self, tables, tagSpec = None):
+        # The tables are interpolated in 2-D, first along the series,
+        # then between the tables using the tag (e.g. the speed)
         nSeries = self.GetParameterValue(NUMBSERIES_PAR)
-        if (tble0 == None): return
+        if not tables: return
+        method = self.GetParameterValue(INTERPOLATION_PAR)
+        if method != PCHIP_INTERP:
+            method = LINEAR_INTERP
 
         # search for first availeble value for lookup
         # search for the last lookup value first
-        fromIdx = None
+        fromVal = None
         rSeries = range(nSeries)
         iSeries = self.lookupFromPort
         if iSeries and iSeries < nSeries:
@@ -301,30 +296,27 @@ class LookupTable(UnitOperations.UnitOperation):
             port = self.GetPort(SIG_PORT + str(i))
             if (port != None):
                 val = port.GetValue()
-                if (val != None):
+                # When the series is missing, it can not be used for the lookup
+                if (val != None and tables[0].GetSeries(i).GetLen() > 0):
                     iSeries = i
-                    fromIdx = tble0._Series[SERIES_OBJ + str(i)].GetDataIndex(val)
-                    # When the series is missing, fromIdx = None
-                    if (fromIdx != None):
-                        if (tble1 != None):
-                            fromIdx1 = tble1._Series[SERIES_OBJ + str(i)].GetDataIndex(val)
-                        break;
-        if (fromIdx == None): return
-
-        # lookup the table
+                    fromVal = val
+                    break;
+        if (fromVal == None): return
+
+        # lookup the tables
         self.lookupFromPort = iSeries
         for i in range(nSeries):
             if i == iSeries: continue
             allowExtrap = self.GetParameterValue(EXTRAPOLATE_PAR + str(i))
-            val = tble0._Series[SERIES_OBJ + str(i)].GetDataValue(fromIdx, allowExtrap)
-            if tble1 != None and factor != 0.0:                
-                val1 = tble1._Series[SERIES_OBJ + str(i)].GetDataValue(fromIdx1, allowExtrap)
-                if val != None and val1 != None:
-                    val = (1.0 - factor) * val + factor * val1
+            val = InterpolateTables(tables, tagSpec, iSeries, i, fromVal, method, allowExtrap)
             # When the series is missing, val = None
             if val != None:
                 self.GetPort(SIG_PORT + str(i)).SetValue(val, CALCULATED_V)
 
+    def ForgetsBySolving(self):
+        """The forget pass has to clear the series looked up from"""
+        return 1
+
     def Solve(self):
         if self.IsForgetting():
             self.lookupFromPort = None
@@ -337,32 +329,11 @@ class LookupTable(UnitOperations.UnitOperation):
             # if i have more than one table, the tag value must be specified
             return
         elif (n == 1):
-            tbl0 = self._Tables[TABLE_OBJ + '0']
-            self.LookupFromTable(tbl0)
+            self.LookupFromTables([self._Tables[TABLE_OBJ + '0']], tagSpec)
         else:
-            # locate the 2 tables where their tag brackets the spec tag
-            tbl0 = None
-            tbl1 = None
-            for tblName in self._Tables.keys():
-                tbl = self._Tables[tblName]
-                #ignore tables with no series
-                if tbl.GetLen() > 0:
-                    diff = tbl.TagValue() - tagSpec
-                    if (diff <= 0):
-                        if (tbl0 == None or diff  > tbl0.TagValue() - tagSpec):
-                            tbl0 = tbl
-                    if (diff >= 0):
-                        if (tbl1 == None or diff < tbl1.TagValue() - tagSpec):
-                            tbl1 = tbl
-            if (tbl1 == None):
-                self.LookupFromTable(tbl0)
-            elif (tbl0 == None):
-                self.LookupFromTable(tbl1)
-            elif (tbl1 == tbl0):
-                self.LookupFromTable(tbl1)
-            else:
-                factor = (tagSpec - tbl0.TagValue()) / (tbl1.TagValue() - tbl0.TagValue())
-                self.LookupFromTable(tbl0, tbl1, factor)
+            #ignore tables with no series
+            tables = [tbl for tbl in self._Tables.values() if tbl.GetLen() > 0]
+            self.LookupFromTables(tables, tagSpec)
                  
                 
     #def _CloneParameters(self, clone, attrNamesToClone):
@@ -452,7 +423,7 @@ class IdealPump(UnitOperations.UnitOperation):
                 min, max = PIn.GetValue(), 10.0*PIn.GetValue()
                 converged = 0
                 try:
-                    val, converged = UnitOperations.CalculateNonSupportedFlash(unitOp, frac, knownTargetProp, knownFlashProp, iterProp, self.lastPOut, min, max)
+                    val, converged = UnitOperations.CalculateNonSupportedFlash(unitOp, frac, knownTargetProp, knownFlashProp, iterProp, self.lastPOut, min, max, OUT_PORT)
                 finally:
                     if converged:
                         self.lastPOut = val
@@ -474,7 +445,7 @@ class IdealPump(UnitOperations.UnitOperation):
                 min, max = POut.GetValue()/10.0, POut.GetValue()
                 converged = 0
                 try:
-                    val, converged = UnitOperations.CalculateNonSupportedFlash(unitOp, frac, knownTargetProp, knownFlashProp, iterProp, self.lastPIn, min, max)
+                    val, converged = UnitOperations.CalculateNonSupportedFlash(unitOp, frac, knownTargetProp, knownFlashProp, iterProp, self.lastPIn, min, max, IN_PORT)
                 finally:
                     if converged:
                         self.lastPIn = val
@@ -12,6 +12,7 @@ FLOWFRAC_PAR = 'FlowFraction'
 
 class Splitter(UnitOperations.UnitOperation):
     """ simple stream splitting class"""
+    dontClone = ("fracPortList", "matPortList", "_balance")
 
     def __init__(self, initScript = None):
         """Init the splitter
@@ -205,13 +206,3 @@ class Splitter(UnitOperations.UnitOperation):
             
         return 1
 
-    def _RemoveFromCloneList(self, clone, attrNamesToClone):
-        """Default attributes that should not be cloned"""
-        attrNamesToClone = super(Splitter, self)._RemoveFromCloneList(clone, attrNamesToClone)
-        dontClone = ["fracPortList", "matPortList", "_balance"]
-        
-        for name in dontClone:
-            if name in attrNamesToClone:
-                attrNamesToClone.remove(name)
-        
-        return attrNamesToClone
\ No newline at end of file
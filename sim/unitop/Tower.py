@@ -4289,6 +4289,8 @@ class PortMoleFracSpec(object):
     
 class Tower(UnitOperations.UnitOperation):
     """inside/out distillation tower operation"""
+    dontClone = ("initTowerObj", "draws", "stages", "waterDraws", "pProfile", "feeds", "converged")
+
     def __init__(self, initScript = None):
         """Init the Tower
 
@@ -4961,6 +4963,10 @@ class Tower(UnitOperations.UnitOperation):
         super(Tower, self).Forget()
         self.pProfile.Forget()
     
+    def ForgetsBySolving(self):
+        """The forget pass has to reset the convergence of the tower"""
+        return 1
+    
     def Solve(self):
         
         #Get rid of all the previously requested profiles
@@ -6277,16 +6283,6 @@ class Tower(UnitOperations.UnitOperation):
             return prof
         
 
-    def _RemoveFromCloneList(self, clone, attrNamesToClone):
-        """Default attributes that should not be cloned"""
-        attrNamesToClone = super(Tower, self)._RemoveFromCloneList(clone, attrNamesToClone)
-        dontClone = ['initTowerObj', 'draws', 'stages', 'waterDraws', 'pProfile', 'feeds', 'converged']
-        
-        for name in dontClone:
-            if name in attrNamesToClone:
-                attrNamesToClone.remove(name)
-        
-        return attrNamesToClone
     
 
     def _CloneCreate(self):
@@ -2,6 +2,8 @@
 
 Classes:
 UnitOperationDict -- Dict with instances of UnitOperation
+SolverContext -- Solver state shared by all the unit operations of a tree
+OpDependencies -- What an op used and calculated in its last solve
 UnitOperation -- Base class for all unit operations
 
 """
@@ -11,6 +13,7 @@ from sim.solver.Variables import *
 from sim.solver import Variables
 from sim.solver import Error
 from sim.solver.Messages import MessageHandler
+from sim.solver import Counters
 
 from sim.thermo.ThermoAdmin import ThermoCase, ThermoAdmin
 
@@ -26,24 +29,92 @@ TH_CASE_KEYWORD = 'ThCase'
 
 PARAMS_DONOTTRIGGER_SOLVE = ['RecycleDetails']
 PARAMS_IGNORE_IFEQUAL = [NULIQPH_PAR, NUSOLPH_PAR, STDVOLREFT_PAR]
+
+_cloneSchemas = {}   #class -> dictionary of the attribute names it does not clone
     
-class UnitOperationDict(dict):
-    """Dictionary of unit operations. Inherits from UserDict
+class UnitOperationDict(Ports.ObjectDict):
+    """Dictionary of unit operations. Inherits from Ports.ObjectDict
 
     keys -- Name of the unit operation
     values -- Instance of UnitOperation
 
     """
-    def __init__(self):
-        """Init an empty dictionary"""        
-        dict.__init__(self)
-
     def __setitem__(self, key, item):
-        """Only unit operations, no repetitions of values"""
+        """Only unit operations, no repetitions of keys or values"""
         if not isinstance(item, UnitOperation): return
         if self.has_key(key): return
-        if item in self.values(): return
-        dict.__setitem__(self, key, item)
+        Ports.ObjectDict.__setitem__(self, key, item)
+
+
+class SolverContext(object):
+    """
+    Solver state of the root of a tree of unit operations. Every op of the
+    tree holds the same instance, handed down as ops are added, so checking
+    the state is an attribute read instead of a walk up the parents
+    """
+    def __init__(self):
+        self.isForgetting = 0
+        self.isSolving = 0
+        self.solver = None      #root flowsheet, found when first needed
+
+    def __reduce__(self):
+        """Nothing is stored, a recalled tree starts idle"""
+        return (SolverContext, ())
+
+
+class OpDependencies(object):
+    """
+    Port properties of an op with their values after its last solve, and
+    whether the op calculated them. While none of them changes the op would
+    calculate the same values again, so a forget pass has nothing to take
+    from it. Nothing is stored, a recalled op records again when it solves
+    """
+    def __init__(self, op=None):
+        self.ports = []     #(port, connection, [(prop, value, calculated)...])
+        if op != None:
+            self.Record(op)
+
+    def __reduce__(self):
+        return (OpDependencies, ())
+
+    def Record(self, op):
+        """keep the port properties of op as they are now"""
+        ports = []
+        for port in op.GetPorts():
+            values = []
+            for prop in port.GetAllProperties():
+                values.append((prop, prop._value, prop._calcStatus & CALCULATED_V))
+            ports.append((port, port._connection, values))
+        self.ports = ports
+
+    def IsRecorded(self):
+        return len(self.ports) > 0
+
+    def Changed(self, op):
+        """
+        True if the ports of op, their connections or the values of their
+        properties changed since the record. A fixed value that is new
+        counts as changed, as it is unknown for the forget pass
+        """
+        if len(op.GetPorts()) != len(self.ports):
+            return 1
+        for port, connection, values in self.ports:
+            if port._parentOp is not op or port._connection is not connection:
+                return 1
+            props = port.GetAllProperties()
+            if len(props) != len(values):
+                return 1
+            for i in range(len(values)):
+                prop, value, calculated = values[i]
+                status = prop._calcStatus
+                if props[i] is not prop or prop._value != value:
+                    return 1
+                if calculated:
+                    if not status & CALCULATED_V:
+                        return 1
+                elif status & NEW_V and status & FIXED_V:
+                    return 1
+        return 0
 
 
 class UnitOperation(object):
@@ -61,6 +132,12 @@ class UnitOperation(object):
 
     """
     
+    #Attributes a clone does not get from the original. Every class declares
+    #its own, they add up over the base classes (see _CloneSchema)
+    dontClone = ("initScript", "parentUO", "name", "_unsentMsgStack", "_stackStatus",
+                 "_pushBlocked", "_solverContext", "_dependencies", "creationTime", "designObjects", "associatedObjs",
+                 "creationNumber", "unitOpMessage", "nonSuppFlashCache")
+    
     def __init__(self, initScript = None):
         """
         Init port, parameters, thermo and connections with no info
@@ -90,6 +167,8 @@ class UnitOperation(object):
 
         self._stackStatus = 0  # keeps track of when on stack
         self._pushBlocked = 0  # set to prevent being put on solver stacks
+        self._solverContext = SolverContext()
+        self._dependencies = OpDependencies()
         self.creationTime = time.time()
         self.info = SimInfoDict(SIMINFO, self)
 
@@ -101,6 +180,7 @@ class UnitOperation(object):
         #to attempt the change in compositions more consistant
         self._tempCmpNames = None
         self._tempMapCmps = None
+        Ports.MarkChanged(self)
         
 
     def __str__(self):
@@ -193,6 +273,7 @@ class UnitOperation(object):
         elif name == TH_CASE_KEYWORD and not isinstance(obj, ThermoCase):
             raise SimError('CantAddObject', (name, self.name))
         
+        Ports.MarkChanged(self)
         #Add it
         if isinstance(obj, UnitOperation):
             self.AddUnitOperation(obj, name)
@@ -226,6 +307,7 @@ class UnitOperation(object):
         """
         try to delete the object obj as appropriate
         """
+        Ports.MarkChanged(self)
         if isinstance(obj, Ports.Port):
             self.DeletePort(obj)
         elif isinstance(obj, UnitOperation):
@@ -321,6 +403,7 @@ class UnitOperation(object):
     
             self.parameters.clear()
             self._unsentMsgStack = None
+            self._dependencies = OpDependencies()
             
             #If I own the thermo, the unlink all the children as well
             if self.thCaseObj:
@@ -365,6 +448,7 @@ class UnitOperation(object):
         if self.GetPort(name):
             raise Error.SimError('CreatePortTypeError', (name, self.GetPath()))
         
+        Ports.MarkChanged(self)
         if portType & MAT:
             port = Ports.Port_Material(portType, self, name)
             if portType & IN:
@@ -422,6 +506,7 @@ class UnitOperation(object):
 
         ptype = port.GetPortType()
         portName = port.GetName()
+        Ports.MarkChanged(self)
         
         needFullForget = 1
         if port.GetParentOp() == self:
@@ -501,6 +586,7 @@ class UnitOperation(object):
         if self.GetPort(toName):
             raise Error.SimError('RenamePortNameExists', (toName, fromName))
             
+        Ports.MarkChanged(self)
         port = self.GetPort(fromName)
         ptype = port.GetPortType()
         if ptype & MAT:
@@ -770,11 +856,10 @@ class UnitOperation(object):
             """
             return path of port in portDict or None if not there
             """
-            try:
-                i = portDict.values().index(port)
-                return self.GetPath() + '.' + portDict.keys()[i]
-            except ValueError:
+            name = portDict.KeyOf(port)
+            if name is None:
                 return None
+            return self.GetPath() + '.' + name
             
         portType = port.GetPortType()
         if portType & MAT:
@@ -963,6 +1048,8 @@ class UnitOperation(object):
 
         uOp.AddedToParent(self, name)
         self.chUODict[name] = uOp
+        uOp.SetSolverContext(self.SolverContext())
+        Ports.MarkChanged(self)
         self.PushSolveOp(uOp)
 
         thCaseObj = self.GetThermo()
@@ -1007,9 +1094,8 @@ class UnitOperation(object):
         self.creationNumber = len(parentUO.chUODict)
         
     def GetChildName(self, child):
-        """ return the name of the child - iterative for now"""
-        for name in self.chUODict.keys():
-            if self.chUODict[name] is child: return name
+        """ return the name of the child"""
+        return self.chUODict.KeyOf(child)
             
     def GetChildUONames(self):
         """Names of the child uos"""
@@ -1032,6 +1118,7 @@ class UnitOperation(object):
         if not self.chUODict.has_key(name): return
         self.chUODict[name].CleanUp()
         del self.chUODict[name]
+        Ports.MarkChanged(self)
 
 
     #Thermo
@@ -1247,6 +1334,7 @@ class UnitOperation(object):
                     return
         
         self.parameters[paramName] = value
+        Ports.MarkChanged(self)
         if not paramName in PARAMS_DONOTTRIGGER_SOLVE:
             self.ForgetAllCalculations()
         
@@ -1346,6 +1434,38 @@ class UnitOperation(object):
     def Solver(self):
         """return the flowsheet solver for this op"""
         if self.parentUO: return self.parentUO.Solver()
+
+    def SolverContext(self):
+        """the SolverContext shared with the whole tree"""
+        try:
+            return self._solverContext
+        except AttributeError:
+            #Recalled from a case older than the context
+            root = self
+            while root.parentUO:
+                root = root.parentUO
+            context = root.__dict__.get('_solverContext', None)
+            if context is None:
+                context = SolverContext()
+            root.SetSolverContext(context)
+            return context
+
+    def SetSolverContext(self, context):
+        """share context with this op and all its children"""
+        self._solverContext = context
+        for uo in self.chUODict.values():
+            uo.SetSolverContext(context)
+
+    def RootSolver(self):
+        """the flowsheet solver at the root of the tree"""
+        context = self.SolverContext()
+        solver = context.solver
+        if solver is None:
+            root = self
+            while root.parentUO:
+                root = root.parentUO
+            solver = context.solver = root.Solver()
+        return solver
         
     def GetTolerance(self):
         if self.parameters.has_key(MAXERROR_PAR):
@@ -1444,9 +1564,19 @@ class UnitOperation(object):
         return self._pushBlocked
     
     def IsForgetting(self):
-        if self.parentUO: return self.parentUO.IsForgetting()
+        try:
+            return self._solverContext.isForgetting
+        except AttributeError:
+            return self.SolverContext().isForgetting
     def IsSolving(self):
-        if self.parentUO: return self.parentUO.IsSolving()
+        """Indicate if the tree is solving, given that it is not forgetting"""
+        try:
+            context = self._solverContext
+        except AttributeError:
+            context = self.SolverContext()
+        if context.isForgetting:
+            return 0
+        return context.isSolving
     def Forget(self):
         """ called on a forget pass to get rid of any newly calculated values"""
 
@@ -1456,6 +1586,28 @@ class UnitOperation(object):
             else:
                 port.Forget(PARENT_V)   # only forget what I calculated on borrowed ports
 
+    def ForgetsBySolving(self):
+        """
+        True if a forget pass has to solve the op in forget mode even when
+        nothing at its ports changed (see NothingToForget)
+        """
+        return len(self.chUODict) > 0
+
+    def RecordDependencies(self):
+        """Keep what the op used and calculated, called after it solved"""
+        if not self.ForgetsBySolving():
+            self._dependencies = OpDependencies(self)
+
+    def NothingToForget(self):
+        """
+        True if nothing at the ports of the op changed since it recorded
+        its last solve, so a forget pass does not have to solve it
+        """
+        dependencies = self.__dict__.get('_dependencies', None)
+        if dependencies == None or not dependencies.IsRecorded() or self.ForgetsBySolving():
+            return 0
+        return not dependencies.Changed(self)
+
     def ForgetAllCalculations(self):
         """ called to for the forgetting of all calculated values"""
         # if there are contained unit ops, have them forget
@@ -1484,6 +1636,13 @@ class UnitOperation(object):
         reply = None
         if addToUnitOpMsg:
             self.unitOpMessage = (message, args)
+            Ports.MarkChanged(self)
+        if (message != None and not MessageHandler.IsIgnored(message) and
+            MessageHandler.IsUnderLevel(message, msgType)):
+            #No callback would show it, do not bother going up to the root.
+            #Ignored messages (notifications) always go up, callbacks act on them
+            MessageHandler.CountSuppressed(message)
+            return
         if self.infoCallBack:
             reply = self.infoCallBack.handleMessage(message, args, msgType)
         elif self.parentUO:
@@ -1742,23 +1901,31 @@ class UnitOperation(object):
         return clone
     
     
+    def _CloneSchema(self):
+        """
+        Dictionary with the names in dontClone of the class of the op and of
+        all its base classes. Built once per class
+        """
+        cls = self.__class__
+        schema = _cloneSchemas.get(cls, None)
+        if schema == None:
+            schema = {}
+            for base in cls.__mro__:
+                for name in base.__dict__.get('dontClone', ()):
+                    schema[name] = 1
+            _cloneSchemas[cls] = schema
+        return schema
+    
     def _RemoveFromCloneList(self, clone, attrNamesToClone):
-        """Default attributes that should not be cloned"""
-        dontClone = ["initScript", "parentUO", "name", "_unsentMsgStack", "_stackStatus",
-                     "_pushBlocked", "creationTime", "designObjects", "associatedObjs",
-                     "creationNumber", "unitOpMessage"]
-        
-        for name in dontClone:
-            if name in attrNamesToClone:
-                attrNamesToClone.remove(name)
-        
-        return attrNamesToClone
+        """Attributes that should not be cloned, as declared in dontClone"""
+        dontClone = self._CloneSchema()
+        return [name for name in attrNamesToClone if not dontClone.has_key(name)]
     
     def _CloneParameters(self, clone, attrNamesToClone):
         #Clone parameters
         for paramName in self.parameters:
             #Do a copy just in case
-            clone.SetParameterValue(paramName, copy.deepcopy(self.parameters[paramName]))
+            clone.SetParameterValue(paramName, _CloneValue(self.parameters[paramName]))
             
         for paramName in self.parameterPropertyTypes:
             #Can safely point to the same thing as they are global types
@@ -2172,10 +2339,21 @@ def _FindMatchingChildOp(uOp, uOpClone, childToFind, startAtTopLevel=0):
                 
     return None
 
+_IMMUTABLE_TYPES = (float, int, long, complex, str, unicode, bool, type(None))
+
+def _CloneValue(value):
+    """Deep copy of value, but shared if it can not be changed"""
+    if type(value) in _IMMUTABLE_TYPES:
+        return value
+    return copy.deepcopy(value)
+
 def _SafeClone(item):
     """Only clone known Python objcts"""
     
-    if isinstance(item, float):
+    if type(item) in (float, int, complex, str, unicode):
+        #Nothing to copy, the clone can share it
+        return item
+    elif isinstance(item, float):
         return float(item)
     elif isinstance(item, int):
         return int(item)
@@ -2210,7 +2388,7 @@ def _SafeClone(item):
         
 
 
-def CalculateNonSupportedFlash(unitOp, frac, knownTargetProp, knownFlashProp, iterProp, lastSoln=None, min=None, max=None):
+def CalculateNonSupportedFlash(unitOp, frac, knownTargetProp, knownFlashProp, iterProp, lastSoln=None, min=None, max=None, portName=None):
     """Complementary method that attempts to calculate flashes that are not supported by the prop pkg
     by iterating with supported flashes
 
@@ -2220,145 +2398,218 @@ def CalculateNonSupportedFlash(unitOp, frac, knownTargetProp, knownFlashProp, it
     knownFlashProp - Tuple with (PropType, PropValue, ScaleFactor). This property will be used with iterProp to calc flashes
     iterProp - Tuple with (PropType, PropEstimatedValue, ScaleFactor). This is the property that needs to be found
     lastSoln - Value of the last converged solution if available
+    min, max - Range used to look for a bracket when the secant steps can not find one
+    portName - If given, the solution and the slope are kept in the unit op under this name
+               and used as a warm start in the next call
 
     returns - Tuple with (LastPropValue, ConvergedBoolean)
 
     """
+    Counters.Count(Counters.NONSUPP_FLASHES)
+    result = _SolveNonSupportedFlash(unitOp, frac, knownTargetProp, knownFlashProp, iterProp, lastSoln, min, max, portName)
+    if not result[1]:
+        Counters.Count(Counters.NONSUPP_FAILURES)
+    return result
+
+def _SolveNonSupportedFlash(unitOp, frac, knownTargetProp, knownFlashProp, iterProp, lastSoln, min, max, portName):
+    """Secant steps and then Brent's method for CalculateNonSupportedFlash"""
 
     #Main convergence parameters    
     tolerance = 0.00001 #unitOp.GetParameterValue(MAXERROR_PAR)
     maxIter   = 40
-    maxStep = 1
     minStep = 0.0001
-
+    
     #Load variables in a convenient way
     thCaseObj = unitOp.GetThermo()
     thAdmin, prov, case = thCaseObj.thermoAdmin, thCaseObj.provider, thCaseObj.case
-    lstIterProp = list(iterProp)
+    iterType, estimate, iterScale = iterProp[0], iterProp[1], iterProp[2]
     propList, target, scaleFactor = [knownTargetProp[0]], knownTargetProp[1], knownTargetProp[2]
+    def Error(x):
+        """Scaled error in the target property, None if the flash failed"""
+        try:
+            vals = thAdmin.GetProperties(prov, case, knownFlashProp, [iterType, x, iterScale], OVERALL_PHASE, frac, propList)
+            return (vals[0] - target) / scaleFactor
+        except:
+            return None
 
-    #See if last converged value is better than the estimate
-    tempError = None
-    try:
-        if lastSoln !=None:
-            tempLstIterProp = list(lstIterProp)
-            tempLstIterProp[1] = lastSoln
-            tempVals = thAdmin.GetProperties(prov, case, knownFlashProp, tempLstIterProp, OVERALL_PHASE, frac, propList)
-            tempError = (tempVals[0] - target) / scaleFactor
-    except:
-        tempError = None
-
-    couldInit = 0
-    #Calculate the targetProp with the given initial estimate
-    try:
-        vals = thAdmin.GetProperties(prov, case, knownFlashProp, lstIterProp, OVERALL_PHASE, frac, propList)
-        couldInit = 1
-    except:
-        couldInit = 0
+    #Warm start from the last solution of this unit op and port
+    cache, cached = None, None
+    if portName != None:
+        cache = getattr(unitOp, 'nonSuppFlashCache', None)
+        if cache == None:
+            cache = unitOp.nonSuppFlashCache = {}
+        cacheKey = (portName, iterType, knownFlashProp[0], knownTargetProp[0])
+        cached = cache.get(cacheKey, None)
+
+    def Converged(x, slope):
+        if cache != None and slope:
+            cache[cacheKey] = (x, slope)
+        return x, 1
+
+    #First point. The last solutions are usually better than the estimate
+    starts = []
+    for x in (lastSoln, cached and cached[0], estimate):
+        if x != None and x not in starts:
+            starts.append(x)
+    x0 = f0 = None
+    while starts:
+        x = starts.pop(0)
+        f = Error(x)
+        if f != None:
+            x0, f0 = x, f
+            break
+
+    if f0 == None and min != None and max != None:
+        #Nothing worked, look for any point that can be flashed
         step = (max-min)/20.0
-        lstIterProp[1] = min
-        while lstIterProp[1] < max:
-            lstIterProp[1] += step
-            try:
-                vals = thAdmin.GetProperties(prov, case, knownFlashProp, lstIterProp, OVERALL_PHASE, frac, propList)
-                couldInit = 1
+        x = min
+        while x < max:
+            x += step
+            f = Error(x)
+            if f != None:
+                x0, f0 = x, f
                 break
-            except:
-                pass
-            
-
-    if not couldInit: 
+    
+    if f0 == None:
         return None, 0
-            
-    #Check for errors
-    error = (vals[0] - target) / scaleFactor
-    if tempError != None:
-        if abs(tempError) < abs(error):
-            vals = tempVals
-            error = tempError
-            lstIterProp[1] = lastSoln
-        
-    if abs(error/tolerance) <= 1.0:
-        return lstIterProp[1], 1
-
-    # calculate rate of change. The jacobian Jr :)
-    delta = 0.05
-    sign = 1
-    couldInit = 0
-    newLstIterProp = list(lstIterProp)
-    while abs(delta) > minStep:
-        try:
-            newLstIterProp[1] = lstIterProp[1]+lstIterProp[2]*sign*delta
-            newVals = thAdmin.GetProperties(prov, case, knownFlashProp, newLstIterProp, OVERALL_PHASE, frac, propList)
-            couldInit = 1
+    if abs(f0/tolerance) <= 1.0:
+        return Converged(x0, cached and cached[1])
+
+    #Second point. Use the cached slope, the next start point or a small perturbation
+    if cached and cached[1]:
+        dx = -f0 / cached[1]
+    elif starts:
+        dx = starts[0] - x0
+    else:
+        dx = 0.05*iterScale
+    x1 = f1 = None
+    while abs(dx) > minStep*iterScale:
+        f = Error(x0 + dx)
+        if f != None:
+            x1, f1 = x0 + dx, f
             break
-        except:
-            sign *= -1
-            delta /= 2.0
-        
-    if not couldInit: 
+        dx /= -2.0
+    if f1 == None:
         return None, 0
-    
-    
-    newError = (newVals[0] - target) / scaleFactor
-    dF_dx = (newError - error) / (sign*delta)
-    dx_dF = 1.0 / dF_dx
 
+    #Secant steps until converged or bracketed
     iter = 0
-    while iter < maxIter:
+    while iter < maxIter and f0 * f1 > 0.0:
         iter += 1
-        adjustment = -error * dx_dF
-        stepLength = 2.0
+        Counters.Count(Counters.NONSUPP_ITERATIONS)
+        if abs(f1/tolerance) <= 1.0:
+            return Converged(x1, (f1 - f0) / (x1 - x0))
+        if f1 == f0:
+            break
+        dx = -f1 * (x1 - x0) / (f1 - f0)
+        stepLength = 1.0
+        x2 = f2 = None
+        while stepLength > minStep:
+            f = Error(x1 + stepLength * dx)
+            if f != None:
+                x2, f2 = x1 + stepLength * dx, f
+                break
+            stepLength /= 4.0
+        if f2 == None:
+            break
+        if abs(f2) >= abs(f1) and f2 * f1 > 0.0:
+            #Not going anywhere, look for a bracket instead
+            if abs(f2) < abs(f0):
+                x0, f0 = x2, f2
+            break
+        x0, f0, x1, f1 = x1, f1, x2, f2
 
-        #print 'iter', iter
+    if abs(f1/tolerance) <= 1.0:
+        return Converged(x1, f0 != f1 and (f1 - f0) / (x1 - x0))
 
-        #Loop until the new iter value leads to a reduction in the error
-        while 1:
-            actualAdjustment = stepLength * adjustment
-            newLstIterProp[1] = lstIterProp[1]+lstIterProp[2]*actualAdjustment
-            try:
-                newVals = thAdmin.GetProperties(prov, case, knownFlashProp, newLstIterProp, OVERALL_PHASE, frac, propList)
-                newError = (newVals[0] - target) / scaleFactor
-    
-                if abs(newError) < abs(error):
+    if f0 * f1 > 0.0:
+        #Try to bracket the solution in the given range
+        if abs(f0) < abs(f1):
+            x0, f0, x1, f1 = x1, f1, x0, f0
+        if min == None or max == None:
+            return x1, 0
+        step = (max-min)/20.0
+        x = min
+        while x <= max:
+            f = Error(x)
+            if f != None:
+                if f * f1 <= 0.0:
+                    x0, f0 = x, f
                     break
+            x += step
+        else:
+            return x1, 0
 
-            except:
-                pass
-            
-            # errors did not go down - back down step size
-            if stepLength < minStep:
-                # step size too small - bail
-                break
-
-            stepLength /= 4.0
-            
-        if abs(newError/tolerance) <= 1.0:
-            return newLstIterProp[1], 1
+    #Brent's method on the bracket
+    x, fx, slope, nIter = _BrentSolve(Error, x0, f0, x1, f1, tolerance, 1.0e-10*iterScale, maxIter - iter)
+    Counters.Count(Counters.NONSUPP_ITERATIONS, nIter)
+    if abs(fx/tolerance) <= 1.0:
+        return Converged(x, slope)
 
-        if abs(newError) > abs(error):
-            #Don't get fancy. Just leave 
+    #Just return the last value used flagged as not converged.
+    #Do not raise any errors or messages
+    return x, 0
+
+def _BrentSolve(func, a, fa, b, fb, tolerance, xTol, maxIter):
+    """Brent's root finder on the bracket (a, b). func returns None if it can not be evaluated
+    returns (x, fx, slope, iterations)"""
+    c, fc = b, fb
+    d = e = b - a
+    slope = None
+    iter = 0
+    while iter < maxIter:
+        iter += 1
+        if fb * fc > 0.0:
+            c, fc = a, fa
+            d = e = b - a
+        if abs(fc) < abs(fb):
+            a, b, c = b, c, b
+            fa, fb, fc = fb, fc, fb
+        tol1 = 2.0e-16 * abs(b) + 0.5 * xTol
+        xm = 0.5 * (c - b)
+        if abs(fb/tolerance) <= 1.0 or abs(xm) <= tol1:
             break
+        if abs(e) >= tol1 and abs(fa) > abs(fb):
+            # inverse quadratic interpolation or secant
+            s = fb / fa
+            if a == c:
+                p = 2.0 * xm * s
+                q = 1.0 - s
+            else:
+                q = fa / fc
+                r = fb / fc
+                p = s * (2.0 * xm * q * (q - r) - (b - a) * (r - 1.0))
+                q = (q - 1.0) * (r - 1.0) * (s - 1.0)
+            if p > 0.0: q = -q
+            p = abs(p)
+            min1 = 3.0 * xm * q - abs(tol1 * q)
+            min2 = abs(e * q)
+            if 2.0 * p < min(min1, min2):
+                e = d
+                d = p / q
+            else:
+                d = e = xm
         else:
-            # update rate of change
-            dF = newError-error
-            dx = actualAdjustment
-            try:
-                dx_dF = dx / dF
-            except:
+            d = e = xm
+        a, fa = b, fb
+        if abs(d) > tol1:
+            x = b + d
+        elif xm > 0.0:
+            x = b + tol1
+        else:
+            x = b - tol1
+        fx = func(x)
+        if fx == None:
+            # bisect when the interpolated point can not be flashed
+            d = e = xm
+            x = b + xm
+            fx = func(x)
+            if fx == None:
                 break
-            #dx2_dF = (dx * dx_dF)
-            #dx2 = dx2_dF * dF
-            #if abs(dx2) < 1.e-100:
-            #    pass
-            #else:
-            #    dx_dF += ((dx - dF * dx_dF)  *  dx2_dF) / dx2
-        error = newError
-        lstIterProp = list(newLstIterProp)
-                
-    #Just return the last value used flagged as not converged.
-    #Do not raise any errors or messages
-    return newLstIterProp[1], 0
+        b, fb = x, fx
+        if a != b:
+            slope = (fb - fa) / (b - a)
+    return b, fb, slope, iter
 
 
 def test():
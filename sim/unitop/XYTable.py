@@ -3,11 +3,19 @@ Classes:
 DataSeries - an array of data
 ATable - class containning multiple DataSeries
 
+Functions:
+InterpolateTables - 2-D lookup over a set of tables (e.g. multi speed curves)
+
 """
+import bisect
 from sim.solver.Variables import *
 SERIES_OBJ = 'Series'
 TABLETAG_VAR = 'TagValue'
 
+# interpolation methods
+LINEAR_INTERP = 'Linear'
+PCHIP_INTERP = 'PCHIP'
+
 
 class DataSeries(object):
     def __init__(self, typeName = GENERIC_VAR):
@@ -18,6 +26,28 @@ class DataSeries(object):
         self._myType = PropTypes.get(typeName, PropTypes[GENERIC_VAR])
         self.unitOpParent = None
         self.name = ''
+        self._InitCache()
+
+    def __getstate__(self):
+        """do not store the lookup caches, they are rebuilt on demand"""
+        state = self.__dict__.copy()
+        for key in ('_sortedData', '_version', '_pchipSlopes'):
+            if state.has_key(key):
+                del state[key]
+        return state
+
+    def __setstate__(self, oldState):
+        self.__dict__ = oldState
+        self._InitCache()
+
+    def _InitCache(self):
+        # _sortedData is None when it has to be rebuilt, () when the data is not
+        # strictly monotonic (or not numeric) and the linear scan has to be used.
+        # _version is bumped on every data change so that owners of derived
+        # data (e.g. the PCHIP slopes in ATable) know when to recalculate
+        self._sortedData = None
+        self._pchipSlopes = None
+        self._version = getattr(self, '_version', 0) + 1
         
     def CleanUp(self):
         self.unitOpParent = None
@@ -52,6 +82,7 @@ class DataSeries(object):
                     except:
                         # string data support
                         self._myData.append(vals[i])
+        self._InitCache()
         if self.unitOpParent:
             self.unitOpParent.ForgetAllCalculations()
 
@@ -96,6 +127,21 @@ class DataSeries(object):
             return None
         elif (n == 1):
             return 0
+        sortedData = self.GetSortedData()
+        if sortedData:
+            # monotonic data, bisect instead of scanning
+            data = self._myData
+            if data[n-1] < data[0]:
+                key = -val
+            else:
+                key = val
+            if key <= sortedData[0]:
+                return 0
+            elif key >= sortedData[n-1]:
+                return n-1
+            i = bisect.bisect_right(sortedData, key) - 1
+            return i + (val - data[i]) / (data[i+1] - data[i])
+
         for i in range(n-1):
             factor = (val - self._myData[i]) * (self._myData[i+1] - val)
             if (factor >= 0 and self._myData[i+1] != self._myData[i]):
@@ -106,6 +152,62 @@ class DataSeries(object):
         else:
             return n-1
 
+    def GetDataIndices(self, vals):
+        """GetDataIndex for a sequence of values"""
+        return map(self.GetDataIndex, vals)
+
+    def GetDataValues(self, idxs, allowExtrap = 1):
+        """GetDataValue for a sequence of indices"""
+        return [self.GetDataValue(idx, allowExtrap) for idx in idxs]
+
+    def GetSortedData(self):
+        """
+        Return the data as an ascending list (negated if the series is descending)
+        suitable for bisect, or an empty tuple if the series is not strictly monotonic
+        """
+        if self._sortedData == None:
+            self._sortedData = ()
+            data = self._myData
+            n = len(data)
+            if n < 2: return self._sortedData
+            for val in data:
+                if not isinstance(val, float): return self._sortedData
+            if data[n-1] < data[0]:
+                sortedData = [-val for val in data]
+            else:
+                sortedData = list(data)
+            for i in range(n-1):
+                if sortedData[i+1] <= sortedData[i]: return self._sortedData
+            self._sortedData = sortedData
+        return self._sortedData
+
+    def IsMonotonic(self):
+        return len(self.GetSortedData()) > 0
+
+    def GetVersion(self):
+        """Counter that changes every time the data changes"""
+        return self._version
+
+    def GetPchipSlopes(self, xSeries):
+        """
+        Slopes of this series vs. the sorted data of xSeries for a monotone
+        piecewise cubic (PCHIP) interpolation.
+        Returns None if xSeries is not monotonic or the data does not match
+        """
+        key = (id(xSeries), xSeries.GetVersion(), self._version)
+        if self._pchipSlopes and self._pchipSlopes[0] == key:
+            return self._pchipSlopes[1]
+        slopes = None
+        x = xSeries.GetSortedData()
+        y = self._myData
+        if x and len(x) == len(y):
+            for val in y:
+                if not isinstance(val, float): break
+            else:
+                slopes = _PchipSlopes(x, y)
+        self._pchipSlopes = (key, slopes)
+        return slopes
+
     def GetDataPoint(self, idx):
         if idx >= 0 and idx < len(self._myData):
             return self._myData[idx]
@@ -179,6 +281,36 @@ class ATable(object):
             return self._Series[SERIES_OBJ + str(idx)]
         else:
             return None
+
+    def Interpolate(self, fromIdx, toIdx, vals, method = LINEAR_INTERP, allowExtrap = 1):
+        """
+        Look up series toIdx where series fromIdx equals vals.
+        vals can be a single value or a sequence of values, the return matches.
+        With PCHIP_INTERP a monotone cubic is used if the from series is monotonic
+        """
+        xSeries = self.GetSeries(fromIdx)
+        ySeries = self.GetSeries(toIdx)
+        isSeq = _IsSequence(vals)
+        if not isSeq: vals = (vals,)
+        if xSeries == None or ySeries == None or xSeries.GetLen() == 0:
+            result = [None] * len(vals)
+        else:
+            slopes = None
+            if method == PCHIP_INTERP:
+                slopes = ySeries.GetPchipSlopes(xSeries)
+            if slopes:
+                x = xSeries.GetSortedData()
+                y = ySeries.GetValues()
+                if xSeries.GetDataPoint(xSeries.GetLen() - 1) < xSeries.GetDataPoint(0):
+                    sign = -1.0
+                else:
+                    sign = 1.0
+                result = [_PchipEval(x, y, slopes, sign * val) for val in vals]
+            else:
+                result = ySeries.GetDataValues(xSeries.GetDataIndices(vals), allowExtrap)
+        if isSeq:
+            return result
+        return result[0]
         
     def Clone(self):
         clone = self.__class__(self._Tag._type.name)
@@ -187,4 +319,119 @@ class ATable(object):
             clone._Series[key] = value.Clone()
         clone._Tag = self._Tag.Clone()
             
-        return clone
\ No newline at end of file
+        return clone
+
+
+def InterpolateTables(tables, tagVal, fromIdx, toIdx, vals, method = LINEAR_INTERP, allowExtrap = 1):
+    """
+    2-D lookup over a list of tables (e.g. curves at different speeds).
+    Each table is interpolated where series fromIdx equals vals and the results are then
+    interpolated in the table tags, linearly between the two bracketing tables or with a
+    monotone cubic across all of them for PCHIP_INTERP.
+    Tables with no data or no tag are ignored and out of range tags use the closest table
+    """
+    tagged = []
+    for tbl in tables:
+        if tbl.GetLen() > 0:
+            tag = tbl.TagValue()
+            if tag != None: tagged.append((tag, tbl))
+    if len(tagged) == 0:
+        if len(tables) == 1:
+            return tables[0].Interpolate(fromIdx, toIdx, vals, method, allowExtrap)
+        return None
+    elif len(tagged) == 1 or tagVal == None:
+        return tagged[0][1].Interpolate(fromIdx, toIdx, vals, method, allowExtrap)
+
+    tagged.sort()
+    tags = [tag for tag, tbl in tagged]
+    n = len(tags)
+    if tagVal <= tags[0]:
+        return tagged[0][1].Interpolate(fromIdx, toIdx, vals, method, allowExtrap)
+    elif tagVal >= tags[n-1]:
+        return tagged[n-1][1].Interpolate(fromIdx, toIdx, vals, method, allowExtrap)
+
+    isSeq = _IsSequence(vals)
+    if not isSeq: vals = (vals,)
+
+    if method == PCHIP_INTERP and n > 2:
+        for i in range(n-1):
+            if tags[i+1] <= tags[i]: break
+        else:
+            cols = [tbl.Interpolate(fromIdx, toIdx, vals, method, allowExtrap) for tag, tbl in tagged]
+            result = []
+            for j in range(len(vals)):
+                y = [col[j] for col in cols]
+                if None in y:
+                    result.append(None)
+                else:
+                    result.append(_PchipEval(tags, y, _PchipSlopes(tags, y), tagVal))
+            if isSeq:
+                return result
+            return result[0]
+
+    i = bisect.bisect_right(tags, tagVal) - 1
+    factor = (tagVal - tags[i]) / (tags[i+1] - tags[i])
+    result = tagged[i][1].Interpolate(fromIdx, toIdx, vals, method, allowExtrap)
+    if factor != 0.0:
+        result1 = tagged[i+1][1].Interpolate(fromIdx, toIdx, vals, method, allowExtrap)
+        for j in range(len(vals)):
+            if result[j] != None and result1[j] != None:
+                result[j] = (1.0 - factor) * result[j] + factor * result1[j]
+    if isSeq:
+        return result
+    return result[0]
+
+
+def _IsSequence(vals):
+    """True for lists, tuples, arrays and any other sized sequence of values"""
+    if isinstance(vals, basestring):
+        return False
+    try:
+        len(vals)
+    except TypeError:
+        return False
+    return True
+
+def _PchipSlopes(x, y):
+    """Fritsch-Carlson slopes for monotone cubic interpolation. x must be ascending"""
+    n = len(x)
+    h = [x[i+1] - x[i] for i in range(n-1)]
+    delta = [(y[i+1] - y[i]) / h[i] for i in range(n-1)]
+    if n == 2:
+        return [delta[0], delta[0]]
+    d = [0.0] * n
+    for i in range(1, n-1):
+        if delta[i-1] * delta[i] > 0.0:
+            w1 = 2.0 * h[i] + h[i-1]
+            w2 = h[i] + 2.0 * h[i-1]
+            d[i] = (w1 + w2) / (w1 / delta[i-1] + w2 / delta[i])
+    d[0] = _PchipEndSlope(h[0], h[1], delta[0], delta[1])
+    d[n-1] = _PchipEndSlope(h[n-2], h[n-3], delta[n-2], delta[n-3])
+    return d
+
+def _PchipEndSlope(h0, h1, delta0, delta1):
+    """one sided three point slope, limited to keep the interpolation monotone"""
+    d = ((2.0 * h0 + h1) * delta0 - h0 * delta1) / (h0 + h1)
+    if d * delta0 <= 0.0:
+        return 0.0
+    elif delta0 * delta1 <= 0.0 and abs(d) > abs(3.0 * delta0):
+        return 3.0 * delta0
+    return d
+
+def _PchipEval(x, y, d, val):
+    """
+    Evaluate the cubic Hermite interpolant. Out of range values return the
+    end points, the same as the linear lookup through GetDataIndex
+    """
+    n = len(x)
+    if val <= x[0]:
+        return y[0]
+    elif val >= x[n-1]:
+        return y[n-1]
+    i = bisect.bisect_right(x, val) - 1
+    h = x[i+1] - x[i]
+    t = (val - x[i]) / h
+    t2 = t * t
+    t3 = t2 * t
+    return ((2.0*t3 - 3.0*t2 + 1.0) * y[i] + (t3 - 2.0*t2 + t) * h * d[i] +
+            (-2.0*t3 + 3.0*t2) * y[i+1] + (t3 - t2) * h * d[i+1])